@@ -1,7 +1,9 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, media, guests
+from app.api.v1.endpoints import auth, media, guests, jobs, uploads
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(media.router, prefix="/media", tags=["media"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
 api_router.include_router(guests.router, prefix="/guests", tags=["guests"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
@@ -1,13 +1,18 @@
 from datetime import timedelta
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
-from sqlmodel import Session, select
-from jose import jwt, JWTError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
-from app.core.db import get_session
+from app.core.db import get_async_session
+from app.core.security import TokenRejected, create_access_token, token_verifier
 from app.models.guest import Guest
+from app.services.guest_tokens import guest_tokens
+from app.services.settings_cache import settings_cache
+from app.services.rate_limit import client_ip, failed_login_limits, login_limiter, login_limits
 
 router = APIRouter()
 
@@ -21,17 +26,26 @@ class Token(BaseModel):
 class PINLogin(BaseModel):
     pin: str
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
-
-from app.models.settings import SystemSettings
+async def throttle_login(request: Request) -> None:
+    """
+    Rejects PIN guessing with 429 before any PIN is checked: every attempt counts
+    against the client's IP, and wrong PINs (see login_access_token) against the
+    global limit.
+    """
+    retry_after = await login_limiter.retry_after(failed_login_limits())
+    if not retry_after:
+        retry_after = await login_limiter.hit(login_limits(client_ip(request)))
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
-@router.post("/login", response_model=Token)
-def login_access_token(
+@router.post("/login", response_model=Token, dependencies=[Depends(throttle_login)])
+async def login_access_token(
     login_data: PINLogin,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> Any:
     """
     Login with PIN (Master or Guest)
@@ -39,8 +53,8 @@ def login_access_token(
     role = None
     sub = None
 
-    # Fetch System Settings for dynamic Admin PIN
-    sys_settings = session.exec(select(SystemSettings)).first()
+    # Dynamic Admin PIN comes from the settings cache, no query needed
+    sys_settings = await settings_cache.get()
     current_admin_pin = sys_settings.admin_pin if (sys_settings and sys_settings.admin_pin) else settings.ACCESS_PIN
 
     # Check Master PIN
@@ -50,12 +64,13 @@ def login_access_token(
     else:
         # Check Guest DB
         statement = select(Guest).where(Guest.pin == login_data.pin)
-        guest = session.exec(statement).first()
+        guest = (await session.exec(statement)).first()
         if guest and guest.is_active:
             role = "guest"
             sub = str(guest.id)
     
     if not role:
+        await login_limiter.hit(failed_login_limits())
         raise HTTPException(status_code=400, detail="Incorrect PIN")
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -67,15 +82,17 @@ def login_access_token(
         "role": role
     }
 
-def get_current_user_role(token: str = Depends(oauth2_scheme)) -> str:
+async def get_current_user_role(token: str = Depends(oauth2_scheme)) -> str:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        role: str = payload.get("role")
-        if role is None:
-            raise HTTPException(status_code=401, detail="Could not validate credentials")
-        return role
-    except JWTError:
-         raise HTTPException(status_code=401, detail="Could not validate credentials")
+        payload = token_verifier.verify(token)
+    except TokenRejected:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    role: str = payload.get("role")
+    if role is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    if role == "guest" and not await guest_tokens.accepts(payload):
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return role
 
 # Dependencies for routes
 def verify_admin(role: str = Depends(get_current_user_role)):
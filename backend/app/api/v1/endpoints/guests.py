@@ -1,23 +1,22 @@
+from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlmodel import Session, select
-from app.core.db import get_session
-from app.models.guest import Guest, GuestCreate, GuestRead
-from app.services.email import send_pin_email
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import get_async_session
+from app.models.guest import Guest, GuestCreate, GuestRead, GuestUpdate
+from app.models.outbox import EmailOutbox, EmailOutboxRead
+from app.services.guest_tokens import guest_tokens
+from app.services.outbox import email_worker, enqueue_pin_email
+from app.services.guest_import import InvalidImport, allocate_pins, import_guests, parse_guest_rows
 from app.api.v1.endpoints.auth import get_current_user_role
-import random
-import string
 
 router = APIRouter()
 
-def generate_pin(length=8):
-    return ''.join(random.choices(string.digits, k=length))
-
 @router.post("/", response_model=GuestRead)
 async def create_guest(
     guest_in: GuestCreate, 
-    background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
@@ -25,12 +24,12 @@ async def create_guest(
     
     # Check if email exists
     statement = select(Guest).where(Guest.email == guest_in.email)
-    existing_guest = session.exec(statement).first()
+    existing_guest = (await session.exec(statement)).first()
     if existing_guest:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Generate PIN
-    pin = generate_pin()
+    pin = (await allocate_pins(session, 1))[0]
     
     # Create Guest object explicitly to include PIN
     guest = Guest(
@@ -41,38 +40,113 @@ async def create_guest(
     )
     
     session.add(guest)
-    session.commit()
-    session.refresh(guest)
-    
-    # Send Email
-    background_tasks.add_task(send_pin_email, guest.email, pin, guest.name)
+    await session.flush()
+
+    # Queue the invitation in the same transaction; the email worker delivers it
+    await enqueue_pin_email(session, guest.id, guest.email, pin, guest.name)
+    await session.commit()
+    await session.refresh(guest)
+    email_worker.notify()
     
     return guest
 
+@router.post("/import")
+async def import_guest_list(
+    request: Request,
+    send_invites: bool = Query(True),
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Bulk-creates guests from a JSON array or a CSV body (columns: email, name,
+    is_active). All new guests are inserted in one transaction; rows that are
+    invalid, repeated in the file or already registered are reported and skipped.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    try:
+        rows = parse_guest_rows(await request.body(), request.headers.get("content-type", ""))
+    except InvalidImport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report = await import_guests(session, rows, send_invites=send_invites)
+    await session.commit()
+    if send_invites and report["created"]:
+        email_worker.notify()
+    return report
+
 @router.get("/", response_model=List[GuestRead])
-def read_guests(
-    session: Session = Depends(get_session),
+async def read_guests(
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    guests = session.exec(select(Guest)).all()
+    guests = (await session.exec(select(Guest))).all()
     return guests
 
 @router.delete("/{guest_id}")
-def delete_guest(
+async def delete_guest(
     guest_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    guest = session.get(Guest, guest_id)
+    guest = await session.get(Guest, guest_id)
     if not guest:
         raise HTTPException(status_code=404, detail="Guest not found")
         
-    session.delete(guest)
-    session.commit()
+    await session.delete(guest)
+    await session.exec(delete(EmailOutbox).where(EmailOutbox.guest_id == guest_id))
+    await session.commit()
+    guest_tokens.invalidate(guest_id)
     return {"ok": True}
+
+@router.get("/{guest_id}/email", response_model=List[EmailOutboxRead])
+async def read_guest_email_status(
+    guest_id: int,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Delivery status of the invitations sent to a guest, newest first.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return (await session.exec(
+        select(EmailOutbox).where(EmailOutbox.guest_id == guest_id).order_by(EmailOutbox.id.desc())
+    )).all()
+
+@router.patch("/{guest_id}", response_model=GuestRead)
+async def update_guest(
+    guest_id: int,
+    guest_in: GuestUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Renames or (de)activates a guest. Deactivating also invalidates the tokens
+    the guest already holds.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    guest = await session.get(Guest, guest_id)
+    if not guest:
+        raise HTTPException(status_code=404, detail="Guest not found")
+
+    for key, value in guest_in.model_dump(exclude_unset=True).items():
+        setattr(guest, key, value)
+    if guest_in.is_active is False:
+        # Tokens issued so far stay invalid even if the guest is reactivated later
+        guest.tokens_valid_after = datetime.utcnow()
+    session.add(guest)
+    await session.commit()
+    await session.refresh(guest)
+    guest_tokens.invalidate(guest_id)
+    return guest
@@ -0,0 +1,49 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import get_async_session
+from app.models.job import Job, JobRead
+from app.api.v1.endpoints.auth import get_current_user_role
+
+router = APIRouter()
+
+@router.get("/", response_model=List[JobRead])
+async def read_jobs(
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Background jobs, newest first, optionally filtered by type and status.
+    Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    statement = select(Job).order_by(Job.created_at.desc()).limit(limit)
+    if type:
+        statement = statement.where(Job.type == type)
+    if status:
+        statement = statement.where(Job.status == status)
+    return (await session.exec(statement)).all()
+
+@router.get("/{job_id}", response_model=JobRead)
+async def read_job(
+    job_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Status of one job: `progress` while it runs, `result` or `error` once it
+    is done or failed. Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job = await session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
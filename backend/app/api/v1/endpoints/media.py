@@ -1,166 +1,517 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from datetime import datetime
 from typing import List, Optional
+import anyio
+import base64
 import shutil
 import os
-from sqlmodel import Session, select, SQLModel
-from app.core.db import get_session
+import sys
+from sqlmodel import select, update, SQLModel, and_, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.db import get_async_session
+from app.models.job import JobRead
 from app.models.media import Media, MediaRead
 from app.api.v1.endpoints.auth import get_current_user_role
+from app.services.media_delivery import build_media_response, content_disposition
+from app.services.peaks import read_level
+from app.services.upload_pipeline import InvalidUpload, UploadTooLarge, discard, receive_upload
+from app.services import storage
+from app.services.scanner import SCAN_JOB
+from app.services import library
+from app.services.analysis import analyzer
+from app.services.genres import REINDEX_AUDIO_JOB, genre_sync_diff, propagate_genre
+from app.services.jobs import job_runner, latest_job
 
 router = APIRouter()
 
 # Storage path
-UPLOAD_DIR = "static/uploads"
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.post("/scan")
+# For peaks and thumbnails requested with their current version (?v=), which never change
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+def sanitize_filename(filename: str) -> str:
+    return filename.replace(" ", "_").replace("/", "")
+
+async def resolve_genre(session: AsyncSession, related_to_id: Optional[int], genre: Optional[str]) -> Optional[str]:
+    # Genre inheritance logic: linked media takes the parent video's genre
+    if related_to_id:
+        parent_video = await session.get(Media, related_to_id)
+        if parent_video and parent_video.genre:
+            return parent_video.genre
+    return genre
+
+@router.post("/scan", response_model=JobRead, status_code=202)
 async def scan_storage(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     """
-    Scans the storage directory for files that are not in the database and adds them.
+    Queues an incremental scan of the storage directory: new files are added,
+    rows whose files disappeared or changed are flagged. Returns the job (the
+    one already queued or running, if any); follow it at GET /jobs/{id}.
     Only accessible by admins.
     """
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    added_count = 0
-    try:
-        # Get all filenames currently in DB
-        statement = select(Media.filename)
-        existing_filenames = set(session.exec(statement).all())
-        
-        # Iterate over files in storage
-        if os.path.exists(UPLOAD_DIR):
-            for filename in os.listdir(UPLOAD_DIR):
-                if filename in existing_filenames:
-                    continue
-                
-                # Simple type detection
-                lower_name = filename.lower()
-                media_type = None
-                if lower_name.endswith(('.mp4', '.webm', '.mov', '.avi', '.mkv')):
-                    media_type = 'video'
-                elif lower_name.endswith(('.mp3', '.wav', '.ogg', '.m4a')):
-                    media_type = 'audio'
-                
-                if media_type:
-                    # Add to DB
-                    safe_filename = filename # Already on disk, assume safe or use as is
-                    url = f"/limit_static/uploads/{safe_filename}"
-                    
-                    new_media = Media(
-                        filename=safe_filename,
-                        url=url,
-                        media_type=media_type,
-                        title=safe_filename, # Default title
-                        genre="Recovered" # Default genre
-                    )
-                    session.add(new_media)
-                    added_count += 1
-            
-            if added_count > 0:
-                session.commit()
-                
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error scanning storage: {str(e)}")
-        
-    return {"message": f"Scan complete. Added {added_count} new files.", "added_count": added_count}
+    job, _ = await job_runner.enqueue(session, SCAN_JOB)
+    return job
+
+@router.get("/scan", response_model=JobRead)
+async def scan_status(
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """The most recent scan job."""
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job = await latest_job(session, SCAN_JOB)
+    if not job:
+        raise HTTPException(status_code=404, detail="No scan has run yet")
+    return job
 
 
 @router.post("/upload", response_model=MediaRead)
 async def upload_file(
-    file: UploadFile = File(...),
-    media_type: str = Form(...), # 'video' or 'audio'
-    related_to_id: Optional[int] = Form(None),
-    title: Optional[str] = Form(None),
-    genre: Optional[str] = Form(None),
-    session: Session = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
+    """
+    Multipart upload with fields `file`, `media_type` ('video' or 'audio'), and
+    optional `related_to_id`, `title`, `genre`.
+    The file is streamed to disk off the event loop, hashed and size-checked on
+    the way, and only moved to its final name once fully received.
+    """
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Generate unique filename to avoid overwrite? For now simple.
-    # sanitize filename
-    safe_filename = file.filename.replace(" ", "_").replace("/", "")
-    # Check for duplicates
-    existing = session.exec(select(Media).where(Media.filename == safe_filename)).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="File with this name already exists")
+    async def reject_duplicates(filename: str):
+        # Generate unique filename to avoid overwrite? For now simple.
+        safe_filename = sanitize_filename(filename)
+        existing = (await session.exec(select(Media.id).where(Media.filename == safe_filename))).first()
+        if existing:
+            raise HTTPException(status_code=409, detail="File with this name already exists")
 
-    file_location = os.path.join(UPLOAD_DIR, safe_filename)
-    
-    with open(file_location, "wb+") as buffer:
-        while content := await file.read(1024 * 1024): # 1MB chunks
-            buffer.write(content)
-    
-    # URL relative to static mount
-    url = f"/limit_static/uploads/{safe_filename}"
+    try:
+        fields, stored = await receive_upload(request, UPLOAD_DIR, check_filename=reject_duplicates)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = fields.get("media_type")
+    related_to_id = fields.get("related_to_id") or None
+    if not media_type or (related_to_id and not related_to_id.isdigit()):
+        await discard(stored.tmp_path)
+        raise HTTPException(status_code=422, detail="media_type is required and related_to_id must be an integer")
+
+    safe_filename = sanitize_filename(stored.filename)
+    # URL relative to static mount; points at the shared blob in the cas layout
+    try:
+        location = await storage.store_upload(session, stored, safe_filename)
+    except FileExistsError:
+        # Another upload of the same name got there between the check and now
+        await discard(stored.tmp_path)
+        raise HTTPException(status_code=409, detail="File with this name already exists")
+    related_to_id = int(related_to_id) if related_to_id else None
 
-    # Genre inheritance logic
-    final_genre = genre
-    if related_to_id:
-        parent_video = session.get(Media, related_to_id)
-        if parent_video and parent_video.genre:
-             final_genre = parent_video.genre
-    
     db_media = Media(
         filename=safe_filename,
-        url=url,
+        **location,
         media_type=media_type,
         related_to_id=related_to_id,
-        title=title,
-        genre=final_genre
+        title=fields.get("title"),
+        genre=await resolve_genre(session, related_to_id, fields.get("genre")),
+        size=stored.size,
+        sha256=stored.sha256
     )
     
     session.add(db_media)
-    session.commit()
-    session.refresh(db_media)
+    await session.commit()
+    await session.refresh(db_media)
+    analyzer.wake()
     
     return db_media
 
+# Listing / pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+LISTABLE_FIELDS = set(MediaRead.model_fields)
+
+def encode_cursor(created_at: datetime, media_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{media_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, media_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(media_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Smallest string above every string starting with `prefix`, so a prefix match
+    is the range `prefix <= title < bound` that an index can serve (LIKE can't on
+    SQLite). None if there is no such bound.
+    """
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+class MediaListQuery:
+    """
+    Query parameters shared by the media listings.
+    Pages are keyset-based on (created_at, id), newest first; the cursor for the
+    next page is returned in the X-Next-Cursor header.
+    """
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        genre: Optional[str] = None,
+        related_to_id: Optional[int] = None,
+        title_prefix: Optional[str] = Query(None, min_length=1),
+        fields: Optional[str] = Query(None, description="Comma separated list of fields to return"),
+    ):
+        self.limit = limit
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.genre = genre
+        self.related_to_id = related_to_id
+        self.title_prefix = title_prefix
+        self.fields = None
+        if fields:
+            requested = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = set(requested) - LISTABLE_FIELDS
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+            self.fields = requested
+
+async def list_media(session: AsyncSession, media_type: str, params: MediaListQuery) -> JSONResponse:
+    # Always fetch the keyset columns so the next cursor can be built
+    columns = params.fields or list(MediaRead.model_fields)
+    selected = list(dict.fromkeys(["id", "created_at", *columns]))
+    statement = select(*[getattr(Media, name) for name in selected]).where(Media.media_type == media_type)
+
+    if params.genre is not None:
+        statement = statement.where(Media.genre == params.genre)
+    if params.related_to_id is not None:
+        statement = statement.where(Media.related_to_id == params.related_to_id)
+    if params.title_prefix:
+        # Case-sensitive, by code point
+        statement = statement.where(Media.title >= params.title_prefix)
+        upper = prefix_upper_bound(params.title_prefix)
+        if upper is not None:
+            statement = statement.where(Media.title < upper)
+    if params.cursor:
+        created_at, media_id = params.cursor
+        statement = statement.where(
+            or_(
+                Media.created_at < created_at,
+                and_(Media.created_at == created_at, Media.id < media_id),
+            )
+        )
+
+    # Fetch one extra row to know whether another page exists
+    statement = statement.order_by(Media.created_at.desc(), Media.id.desc()).limit(params.limit + 1)
+    rows = [row._asdict() for row in (await session.exec(statement)).all()]
+
+    headers = {}
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    items = [{name: row[name] for name in columns} for row in rows]
+    return JSONResponse(content=jsonable_encoder(items), headers=headers)
+
 @router.get("/videos", response_model=List[MediaRead])
-async def get_videos(session: Session = Depends(get_session)):
-    statement = select(Media).where(Media.media_type == "video").order_by(Media.created_at.desc())
-    results = session.exec(statement).all()
-    return results
+async def get_videos(
+    params: MediaListQuery = Depends(),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await list_media(session, "video", params)
 
 @router.get("/audio", response_model=List[MediaRead])
-async def get_audio(session: Session = Depends(get_session)):
-    statement = select(Media).where(Media.media_type == "audio").order_by(Media.created_at.desc())
-    results = session.exec(statement).all()
-    return results
+async def get_audio(
+    params: MediaListQuery = Depends(),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await list_media(session, "audio", params)
+
+@router.get("/library")
+async def get_library(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Videos, audio and their links in one response, tagged with the library version.
+    With `since`, only rows changed and ids deleted after that version are returned
+    (falls back to a full snapshot, `full: true`, if the version is too old).
+    Revalidate with If-None-Match to get a 304 while nothing changed.
+    """
+    state = await library.get_state(session)
+    etag = f'W/"library-{state.version}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    data = await library.snapshot(session, since)
+    return JSONResponse(
+        content=jsonable_encoder(data),
+        headers={"ETag": f'W/"library-{data["version"]}"', "Cache-Control": "private, no-cache"},
+    )
+
+@router.api_route("/{media_id}/stream", methods=["GET", "HEAD"])
+async def stream_media(
+    media_id: int,
+    request: Request,
+    download: bool = False,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Serves the media file with Range / conditional GET support so players can seek
+    without re-downloading and revalidate with 304s. With object storage this
+    only redirects to a short-lived presigned URL and the store sends the bytes.
+    `download=true` asks the browser to save the file under its name.
+    """
+    media_item = await session.get(Media, media_id)
+    if not media_item:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    key = storage.media_key(media_item)
+    filename = media_item.filename if download else None
+    url = await anyio.to_thread.run_sync(storage.backend.download_url, key, filename)
+    if url:
+        # The URL expires, so the redirect itself must not be cached
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-store"})
+
+    try:
+        response = build_media_response(request, storage.backend.local_path(key), media_item.sha256)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media file missing from storage")
+    if filename:
+        response.headers["content-disposition"] = content_disposition(filename)
+    return response
+
+@router.get("/{media_id}/peaks")
+async def get_peaks(
+    media_id: int,
+    request: Request,
+    resolution: Optional[int] = Query(default=None, ge=1, le=1_000_000),
+    v: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Waveform peaks of an audio track as raw signed min/max pairs (PEAKS_BITS
+    wide). `resolution` is the number of peaks the client wants to draw; the
+    coarsest stored level with at least that many is returned. Responses for a
+    matching `v` (the track's peaks_version) never change and are cached as such.
+    """
+    media_item = await session.get(Media, media_id)
+    if not media_item:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if media_item.peaks_version is None:
+        raise HTTPException(status_code=404, detail="Peaks not available")
+
+    try:
+        level = await anyio.to_thread.run_sync(read_level, storage.peaks_path(media_item), resolution)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Peaks not available")
+
+    etag = f'"peaks-{media_item.peaks_version}-{level.samples_per_peak}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if v == media_item.peaks_version else "public, no-cache",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    headers.update({
+        "X-Peaks-Bits": str(level.bits),
+        "X-Peaks-Sample-Rate": str(level.sample_rate),
+        "X-Peaks-Samples-Per-Peak": str(level.samples_per_peak),
+    })
+    return Response(content=level.data, media_type="application/octet-stream", headers=headers)
+
+async def serve_thumbnail(request: Request, session: AsyncSession, media_id: int, kind: str, v: Optional[int]) -> Response:
+    media_item = await session.get(Media, media_id)
+    if not media_item:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if media_item.thumbnails_version is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+
+    cache_control = IMMUTABLE_CACHE if v == media_item.thumbnails_version else "public, no-cache"
+    try:
+        return build_media_response(
+            request, storage.thumbnail_path(media_item, kind), cache_control=cache_control
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+
+@router.get("/{media_id}/poster")
+async def get_poster(
+    media_id: int,
+    request: Request,
+    v: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Poster frame of a video. Cached as immutable when `v` is the current thumbnails_version."""
+    return await serve_thumbnail(request, session, media_id, "poster", v)
+
+@router.get("/{media_id}/sprite")
+async def get_sprite(
+    media_id: int,
+    request: Request,
+    v: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Hover-preview sprite sheet of a video: sprite_columns x sprite_rows frames
+    evenly spaced over its duration. Cached like the poster.
+    """
+    return await serve_thumbnail(request, session, media_id, "sprite", v)
+
+@router.get("/{media_id}/hls/{version}/{path:path}")
+async def get_hls(
+    media_id: int,
+    version: int,
+    path: str,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Master playlist (master.m3u8), variant playlists and segments of a video
+    packaged for HLS. Everything sits under the packaging version (hls_version),
+    so it never changes and is cached as immutable. Players use /stream while
+    a video has no hls_version.
+    """
+    media_item = await session.get(Media, media_id)
+    if not media_item:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if media_item.hls_version != version:
+        raise HTTPException(status_code=404, detail="HLS rendition not found")
+
+    root = storage.hls_dir(media_item, version)
+    if not os.path.isdir(root):
+        # Packaged before each version got its own directory
+        root = storage.hls_dir(media_item)
+    full_path = os.path.normpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep):
+        raise HTTPException(status_code=404, detail="HLS rendition not found")
+    try:
+        return build_media_response(request, full_path, cache_control=IMMUTABLE_CACHE)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="HLS rendition not found")
+
+@router.post("/thumbnails/backfill", status_code=202)
+async def backfill_thumbnails(
+    force: bool = False,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Queues videos for poster and sprite rendering: those without thumbnails
+    (e.g. after a failure or once ffmpeg is installed), or all of them with
+    `force`. Rendering happens in the background. Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    statement = update(Media).where(Media.media_type == "video")
+    if not force:
+        statement = statement.where(Media.thumbnails_version == None)  # noqa: E711
+    result = await session.exec(statement.values(thumbnails_at=None))
+    await session.commit()
+    analyzer.wake()
+    return {"message": f"Queued {result.rowcount} videos for thumbnails.", "queued": result.rowcount}
 
 @router.delete("/{media_id}")
 async def delete_media(
     media_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    media_item = session.get(Media, media_id)
+    media_item = await session.get(Media, media_id)
     if not media_item:
         raise HTTPException(status_code=404, detail="Media not found")
         
-    # Delete file from disk
-    # The URL is like /limit_static/uploads/filename
-    # We need to map it back to storage path "static/uploads/filename"
-    try:
-        filename = media_item.filename
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Error deleting file: {e}")
-        
-    session.delete(media_item)
-    session.commit()
+    # Blobs shared with other rows stay in storage; only unreferenced bytes are removed
+    unreferenced_key = await storage.release(session, media_item)
+    await session.delete(media_item)
+    await library.prune_tombstones(session)
+    await session.commit()
+
+    if unreferenced_key:
+        try:
+            await storage.remove(unreferenced_key)
+        except Exception as e:
+            print(f"Error deleting file: {e}")
     return {"ok": True}
 
+@router.get("/duplicates")
+async def find_duplicates(
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Reports media stored more than once with identical content, from the hashes
+    already recorded. `unhashed` counts the rows that can't be compared yet;
+    POST /duplicates/backfill queues the job that hashes them.
+    Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    duplicates, unhashed = await storage.find_duplicates(session)
+    return {
+        "groups": duplicates,
+        "reclaimable_bytes": sum(group["reclaimable_bytes"] for group in duplicates),
+        "unhashed": unhashed,
+    }
+
+@router.post("/duplicates/backfill", response_model=JobRead, status_code=202)
+async def backfill_duplicate_hashes(
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Queues reading the sizes and hashes that GET /duplicates is missing.
+    Returns the job. Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    job, _ = await job_runner.enqueue(session, storage.HASH_BACKFILL_JOB)
+    return job
+
+@router.post("/migrate-storage", response_model=JobRead, status_code=202)
+async def migrate_storage(
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Queues the conversion of the flat upload directory to the content-addressed
+    layout, in place. Returns the job. Only accessible by admins.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not storage.content_addressed():
+        raise HTTPException(status_code=400, detail="Set STORAGE_LAYOUT=cas before migrating")
+
+    job, _ = await job_runner.enqueue(session, storage.MIGRATE_CAS_JOB)
+    return job
+
 class MediaUpdate(SQLModel):
     title: Optional[str] = None
     genre: Optional[str] = None
@@ -168,45 +519,41 @@ class MediaUpdate(SQLModel):
 
 @router.post("/reindex-audio")
 async def reindex_audio(
-    session: Session = Depends(get_session),
+    dry_run: bool = False,
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     """
-    Syncs the genre of audio files with their parent video.
-    Only accessible by admins.
+    Queues a job syncing the genre of audio files with their parent video in
+    one set-based UPDATE, and returns it with 202. With dry_run=true, returns
+    the changes instead of applying them. Only accessible by admins.
     """
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Find all audios that are linked to a video
-    statement = select(Media).where(Media.media_type == "audio", Media.related_to_id != None)
-    audios = session.exec(statement).all()
-    
-    updated_count = 0
-    for audio in audios:
-        if audio.related_to_id:
-            parent = session.get(Media, audio.related_to_id)
-            if parent and parent.genre and parent.genre != audio.genre:
-                audio.genre = parent.genre
-                session.add(audio)
-                updated_count += 1
-    
-    if updated_count > 0:
-        session.commit()
-        
-    return {"message": f"Updated {updated_count} audio tracks with parent genres.", "updated_count": updated_count}
+    if dry_run:
+        changes = await genre_sync_diff(session)
+        return {
+            "message": f"{len(changes)} audio tracks would be updated.",
+            "updated_count": 0,
+            "dry_run": True,
+            "changes": changes,
+        }
+
+    job, _ = await job_runner.enqueue(session, REINDEX_AUDIO_JOB)
+    return JSONResponse(jsonable_encoder(JobRead.model_validate(job)), status_code=202)
 
 @router.put("/{media_id}", response_model=MediaRead)
 async def update_media(
     media_id: int,
     update_data: MediaUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    media_item = session.get(Media, media_id)
+    media_item = await session.get(Media, media_id)
     if not media_item:
         raise HTTPException(status_code=404, detail="Media not found")
         
@@ -218,8 +565,13 @@ async def update_media(
         # If -1 is passed, clear it? Or just allow null. 
         # For now assume explicit update.
         media_item.related_to_id = update_data.related_to_id
+        if update_data.genre is None:
+            media_item.genre = await resolve_genre(session, media_item.related_to_id, media_item.genre)
         
     session.add(media_item)
-    session.commit()
-    session.refresh(media_item)
+    if update_data.genre is not None:
+        # Linked audio follows its parent's genre, in the same transaction
+        await propagate_genre(session, media_item.id, media_item.genre)
+    await session.commit()
+    await session.refresh(media_item)
     return media_item
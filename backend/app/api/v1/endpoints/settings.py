@@ -1,39 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.core.db import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import get_async_session
+from app.models.guest import Guest
 from app.models.settings import SystemSettings
 from app.api.v1.endpoints.auth import get_current_user_role
+from app.services.settings_cache import settings_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=SystemSettings)
-def get_settings(
-    session: Session = Depends(get_session),
+async def get_settings(
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    settings = await settings_cache.get()
+    if settings:
+        return settings
+
     # Singleton pattern: Get first or create default
-    settings = session.exec(select(SystemSettings)).first()
+    settings = (await session.exec(select(SystemSettings))).first()
     if not settings:
         settings = SystemSettings()
         session.add(settings)
-        session.commit()
-        session.refresh(settings)
+        await session.commit()
+        await session.refresh(settings)
+    settings_cache.set(settings)
     
     return settings
 
 @router.post("/", response_model=SystemSettings)
-def update_settings(
+async def update_settings(
     settings_in: SystemSettings,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     role: str = Depends(get_current_user_role)
 ):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    settings = session.exec(select(SystemSettings)).first()
+    settings = (await session.exec(select(SystemSettings))).first()
     if not settings:
         settings = SystemSettings()
         session.add(settings)
@@ -49,12 +57,18 @@ def update_settings(
     
     # Only update PIN if provided (not empty)
     if settings_in.admin_pin:
+        # A guest holding it would be signed in as admin
+        if (await session.exec(select(Guest.id).where(Guest.pin == settings_in.admin_pin))).first():
+            raise HTTPException(status_code=400, detail="PIN already in use by a guest")
         settings.admin_pin = settings_in.admin_pin
         
     settings.domain = settings_in.domain
+    # Incremented in SQL so concurrent saves from other workers never share a version
+    settings.version = SystemSettings.version + 1 if settings.id else 1
     
     session.add(settings)
-    session.commit()
-    session.refresh(settings)
+    await session.commit()
+    await session.refresh(settings)
+    settings_cache.set(settings)
     
     return settings
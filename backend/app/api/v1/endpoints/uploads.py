@@ -0,0 +1,262 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import hashlib
+import os
+import time
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.db import get_async_session
+from app.core.telemetry import record_upload
+from app.models.media import Media, MediaRead
+from app.models.upload import UploadSession, UploadSessionCreate, UploadSessionRead
+from app.api.v1.endpoints.auth import get_current_user_role
+from app.api.v1.endpoints.media import UPLOAD_DIR, resolve_genre, sanitize_filename
+from app.services.upload_pipeline import StoredUpload, size_limit
+from app.services import storage
+from app.services.analysis import analyzer
+
+router = APIRouter()
+
+MEDIA_TYPES = ("video", "audio")
+
+# SHA-256 of each upload's bytes so far, as (offset, digest), fed chunk by chunk so
+# /complete needn't re-read the file. Per process: a session whose chunks went to
+# another worker, or that outlived a restart, is hashed from disk on /complete.
+_upload_digests: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+
+def part_path(upload: UploadSession) -> str:
+    # Chunks land next to the final file so finalize is a rename, not a copy
+    return os.path.join(UPLOAD_DIR, f"{upload.filename}.{upload.id}.part")
+
+def next_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+
+async def remove_part(upload: UploadSession) -> None:
+    _upload_digests.pop(upload.id, None)
+    try:
+        await anyio.to_thread.run_sync(os.remove, part_path(upload))
+    except FileNotFoundError:
+        pass
+
+async def purge_expired_uploads(session: AsyncSession) -> int:
+    """
+    Removes upload sessions that have been idle past their TTL, with their partial files.
+    """
+    expired = (await session.exec(
+        select(UploadSession).where(UploadSession.expires_at < datetime.utcnow())
+    )).all()
+    for upload in expired:
+        await remove_part(upload)
+        await session.delete(upload)
+    if expired:
+        await session.commit()
+    return len(expired)
+
+async def get_upload_or_404(session: AsyncSession, upload_id: str) -> UploadSession:
+    upload = await session.get(UploadSession, upload_id)
+    if not upload or upload.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    return upload
+
+@router.post("/", response_model=UploadSessionRead, status_code=201)
+async def create_upload(
+    upload_in: UploadSessionCreate,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Starts a resumable upload. Chunks are then PUT at increasing offsets and the
+    Media row is only created on /complete.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if upload_in.media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=422, detail="media_type must be 'video' or 'audio'")
+    if upload_in.total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive")
+    if upload_in.total_size > size_limit(upload_in.media_type):
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the {size_limit(upload_in.media_type)} byte limit",
+        )
+
+    await purge_expired_uploads(session)
+
+    safe_filename = sanitize_filename(upload_in.filename)
+    existing = (await session.exec(select(Media.id).where(Media.filename == safe_filename))).first()
+    pending = (await session.exec(
+        select(UploadSession.id).where(UploadSession.filename == safe_filename)
+    )).first()
+    if existing or pending:
+        raise HTTPException(status_code=409, detail="File with this name already exists")
+
+    upload = UploadSession(
+        **upload_in.model_dump(exclude={"filename"}),
+        filename=safe_filename,
+        expires_at=next_expiry(),
+    )
+    async with await anyio.open_file(part_path(upload), "wb"):
+        pass
+
+    session.add(upload)
+    await session.commit()
+    _upload_digests[upload.id] = (0, hashlib.sha256())
+    return upload
+
+@router.get("/{upload_id}", response_model=UploadSessionRead)
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Returns the current offset so an interrupted client knows where to resume.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    upload = await get_upload_or_404(session, upload_id)
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.put("/{upload_id}", response_model=UploadSessionRead)
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0),
+    chunk_sha256: Optional[str] = Header(None, alias="X-Chunk-SHA256"),
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    """
+    Writes the request body at `offset`. The offset only advances if the chunk's
+    SHA-256 matches X-Chunk-SHA256 (when sent), so a corrupt chunk is simply resent.
+    """
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    upload = await get_upload_or_404(session, upload_id)
+    if offset != upload.offset:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Offset mismatch, expected {upload.offset}",
+            headers={"Upload-Offset": str(upload.offset)},
+        )
+
+    remaining = upload.total_size - offset
+    digest = hashlib.sha256()
+    # Advanced on a copy, kept only once the offset moves
+    running = _upload_digests.get(upload.id)
+    upload_digest = running[1].copy() if running and running[0] == offset else None
+    written = 0
+    started = time.perf_counter()
+    async with await anyio.open_file(part_path(upload), "r+b") as buffer:
+        await buffer.seek(offset)
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            written += len(chunk)
+            if written > remaining:
+                raise HTTPException(status_code=413, detail="Chunk exceeds declared total_size")
+            digest.update(chunk)
+            if upload_digest is not None:
+                upload_digest.update(chunk)
+            await buffer.write(chunk)
+    record_upload("chunk", written, time.perf_counter() - started)
+
+    if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+        raise HTTPException(
+            status_code=422,
+            detail="Chunk checksum mismatch",
+            headers={"Upload-Offset": str(upload.offset)},
+        )
+
+    # Only advance if nobody else moved the offset meanwhile
+    result = await session.exec(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.offset == offset)
+        .values(offset=offset + written, expires_at=next_expiry())
+    )
+    await session.commit()
+    if result.rowcount != 1:
+        raise HTTPException(status_code=409, detail="Upload was modified concurrently")
+    if upload_digest is not None:
+        _upload_digests[upload.id] = (offset + written, upload_digest)
+    else:
+        _upload_digests.pop(upload.id, None)
+
+    await session.refresh(upload)
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.post("/{upload_id}/complete", response_model=MediaRead)
+async def complete_upload(
+    upload_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    upload = await get_upload_or_404(session, upload_id)
+    if upload.offset != upload.total_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: {upload.offset} of {upload.total_size} bytes received",
+        )
+
+    existing = (await session.exec(select(Media.id).where(Media.filename == upload.filename))).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="File with this name already exists")
+
+    # Local storage renames the part file into place; S3 gets a multipart upload
+    source = part_path(upload)
+    running = _upload_digests.get(upload.id)
+    if running and running[0] == upload.total_size:
+        content_hash = running[1].hexdigest()
+    else:
+        content_hash = await anyio.to_thread.run_sync(storage.hash_file, source)
+    stored = StoredUpload(source, upload.filename, upload.total_size, content_hash)
+    try:
+        location = await storage.store_upload(session, stored, upload.filename)
+    except FileExistsError:
+        # The part file stays until the session expires
+        raise HTTPException(status_code=409, detail="File with this name already exists")
+
+    db_media = Media(
+        filename=upload.filename,
+        **location,
+        media_type=upload.media_type,
+        related_to_id=upload.related_to_id,
+        title=upload.title,
+        genre=await resolve_genre(session, upload.related_to_id, upload.genre),
+        size=upload.total_size,
+        sha256=content_hash
+    )
+    session.add(db_media)
+    await session.delete(upload)
+    await session.commit()
+    _upload_digests.pop(upload.id, None)
+    await session.refresh(db_media)
+    analyzer.wake()
+    return db_media
+
+@router.delete("/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    role: str = Depends(get_current_user_role)
+):
+    if role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    upload = await get_upload_or_404(session, upload_id)
+    await remove_part(upload)
+    await session.delete(upload)
+    await session.commit()
+    return {"ok": True}
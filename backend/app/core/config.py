@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, EmailStr
 
@@ -7,11 +7,41 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = "changethis"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 
+    # Verified tokens remembered per process to skip repeated signature checks
+    TOKEN_CACHE_SIZE: int = 4096
+    # How long a worker trusts its copy of a guest's state (active, revoked tokens);
+    # another worker's revocation takes effect here within this time
+    GUEST_TOKEN_CACHE_SECONDS: float = 5.0
     # 8-digit Master PIN
     ACCESS_PIN: str = "12345678"
+    # Login throttling per sliding window: attempts per client IP, wrong PINs overall.
+    # "database" keeps the counts in the DB so they hold across workers.
+    RATE_LIMIT_BACKEND: Literal["memory", "database"] = "memory"
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 10
+    LOGIN_RATE_LIMIT_GLOBAL: int = 200
+    RATE_LIMIT_MAX_KEYS: int = 10_000
+    # Reverse proxies (addresses or CIDR ranges) whose X-Forwarded-For names the client;
+    # without them the per-IP limit sees every request as coming from the proxy
+    TRUSTED_PROXIES: List[str] = []
+    # How often each worker checks whether another one changed the system settings
+    SETTINGS_CACHE_POLL_SECONDS: float = 2.0
     
     # Database
     DATABASE_URL: str = "sqlite:///./data/er_music.db"
+    # Optional explicit async URL; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: str | None = None
+    # "production" applies the SQLite tuning below on every new connection,
+    # "default" leaves SQLite with its stock settings
+    DB_ENGINE_PROFILE: Literal["production", "default"] = "production"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64000 # negative = KiB, i.e. ~64 MB per connection
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
 
     # SMTP
     SMTP_TLS: bool = True
@@ -21,9 +51,105 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str | None = None
     EMAILS_FROM_EMAIL: EmailStr | None = None
     EMAILS_FROM_NAME: str = "ER Music"
+    # Bulk guest import
+    GUEST_IMPORT_MAX_ROWS: int = 10_000
+
+    # Outbox delivery: SMTP connections kept open by the email worker, and retries
+    SMTP_POOL_SIZE: int = 4
+    EMAIL_BATCH_SIZE: int = 200
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    EMAIL_LEASE_SECONDS: int = 300
+
+    # Job runner for long-running admin operations (scan, reindex, storage migration).
+    # Runs in the leader worker; other workers only queue, and the runner polls for them
+    JOB_POLL_SECONDS: float = 2.0
+    JOB_LEASE_SECONDS: int = 120
+    JOB_RETRY_BASE_SECONDS: float = 10.0
+    # Finished jobs stay visible at /jobs/{id} this long
+    JOB_RETENTION_DAYS: int = 7
     
+    # Media storage: "flat" keeps files under their upload names, "cas" stores
+    # them content-addressed (blobs/ab/cd/<sha256>) so identical files are kept once
+    UPLOAD_DIR: str = "static/uploads"
+    STORAGE_LAYOUT: Literal["flat", "cas"] = "flat"
+    # Where the media bytes live: "local" (UPLOAD_DIR) or "s3" (any S3-compatible
+    # store, e.g. MinIO). With s3, uploads are still received into UPLOAD_DIR and
+    # derived files (peaks, thumbnails, HLS) stay there; playback and downloads
+    # are redirected to presigned URLs valid for S3_PRESIGN_EXPIRES_SECONDS.
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    S3_BUCKET: str | None = None
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: str | None = None  # e.g. http://minio:9000; None for AWS
+    S3_REGION: str | None = None
+    # None falls back to boto3's credential chain (env, instance role, ...)
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    # MinIO and most self-hosted stores want "path"
+    S3_ADDRESSING_STYLE: Literal["auto", "path", "virtual"] = "auto"
+    S3_PRESIGN_EXPIRES_SECONDS: int = 3600
+    # Files above the threshold go up as multipart uploads of S3_MULTIPART_CHUNK_SIZE parts
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024
+    S3_MULTIPART_CHUNK_SIZE: int = 16 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 4
+
+    # Media analysis (duration, codecs, tags): worker processes and rows per batch
+    ANALYSIS_WORKERS: int = 2
+    ANALYSIS_BATCH_SIZE: int = 64
+    # Waveform peaks for audio: decoded with ffmpeg at PEAKS_SAMPLE_RATE (mono) and
+    # stored next to the file as min/max pairs, one level per samples-per-peak value
+    FFMPEG_BINARY: str = "ffmpeg"
+    PEAKS_SAMPLE_RATE: int = 22050
+    PEAKS_LEVELS: List[int] = [256, 1024, 4096]
+    PEAKS_BITS: Literal[8, 16] = 8
+    # Video poster frame and hover-preview sprite sheet (columns x rows tiles).
+    # After changing the format, run POST /media/thumbnails/backfill?force=true
+    THUMBNAIL_FORMAT: Literal["jpg", "webp"] = "jpg"
+    POSTER_WIDTH: int = 640
+    SPRITE_TILE_WIDTH: int = 160
+    SPRITE_COLUMNS: int = 5
+    SPRITE_ROWS: int = 5
+    # Optional HLS packaging of videos: rendition height -> video bitrate (kbps).
+    # Rungs taller than the source are skipped; one video is packaged at a time
+    HLS_ENABLED: bool = False
+    HLS_LADDER: Dict[int, int] = {1080: 5000, 720: 2800, 480: 1400, 360: 800}
+    HLS_AUDIO_BITRATE_KBPS: int = 128
+    HLS_SEGMENT_SECONDS: int = 6
+    HLS_X264_PRESET: str = "veryfast"
+
+    # Media delivery
+    MEDIA_CACHE_MAX_AGE: int = 60 * 60 * 24 * 7
+    # gzip/brotli variants of the SPA files built on demand (prebuilt .gz/.br files are used as-is)
+    STATIC_COMPRESSED_CACHE_DIR: str = "data/static-cache"
+
+    # Upload size limits per media type, in bytes
+    UPLOAD_SIZE_LIMITS: Dict[str, int] = {
+        "video": 8 * 1024 ** 3,
+        "audio": 1024 ** 3,
+    }
+
+    # Deleted media are remembered this long for /media/library?since= deltas
+    LIBRARY_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Resumable uploads: abandoned sessions are purged after this idle time
+    UPLOAD_SESSION_TTL_SECONDS: int = 60 * 60 * 24
+
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
 
+    # Observability: Prometheus metrics at /metrics; traces and metrics are also
+    # pushed over OTLP/HTTP with "otlp", or kept in memory with "memory" (tests).
+    # /metrics covers one worker per scrape; use OTLP when running several
+    METRICS_ENABLED: bool = True
+    OTEL_EXPORTER: Literal["none", "otlp", "memory"] = "none"
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://localhost:4318"
+
+    # Server started by `python -m app.serve`; WORKERS=0 runs one process per available CPU
+    HOST: str = "0.0.0.0"
+    PORT: int = 13030
+    WORKERS: int = 0
+    # Held by the one worker that runs media analysis and upload purging
+    BACKGROUND_LOCK_FILE: str = "data/background.lock"
+
     model_config = SettingsConfigDict(case_sensitive=True, env_file=".env", extra="ignore")
 
 settings = Settings()
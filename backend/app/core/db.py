@@ -1,30 +1,115 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 # Import models so SQLModel knows about them for create_all
 from app.models.guest import Guest
 from app.models.media import Media
+from app.models.settings import SystemSettings
+from app.models.upload import UploadSession
+from app.models.blob import Blob
+from app.models.storage_file import StorageFile
+from app.models.library import LibraryState, MediaTombstone
+from app.models.rate_limit import RateLimitHit
+from app.models.outbox import EmailOutbox
+from app.models.job import Job
+from app.models.schema_migration import SchemaMigration
+# Registers the hooks that version every Media change
+import app.services.library
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def async_database_url(url: str) -> str:
+    """
+    Maps a sync DATABASE_URL onto its async driver:
+    sqlite -> aiosqlite, postgres -> asyncpg.
+    """
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+")[0]
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if driver in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+def is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+def sqlite_pragmas(profile: str | None = None) -> dict[str, str | int]:
+    """
+    PRAGMAs applied to every new SQLite connection for `profile` (default: the
+    configured one). WAL lets readers run alongside the upload commits instead
+    of blocking on them.
+    """
+    if (profile or settings.DB_ENGINE_PROFILE) != "production":
+        return {}
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+def install_sqlite_pragmas(sync_engine: Engine, pragmas: dict[str, str | int]) -> None:
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def engine_options(url: str, pool_size: int | None = None, max_overflow: int | None = None) -> dict:
+    """Engine keyword arguments for `url`; pool sizes default to the settings."""
+    options: dict = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    # In-memory SQLite uses a single shared connection, pool sizing doesn't apply
+    if not is_memory_sqlite(url):
+        options["pool_size"] = settings.DB_POOL_SIZE if pool_size is None else pool_size
+        options["max_overflow"] = settings.DB_MAX_OVERFLOW if max_overflow is None else max_overflow
+    return options
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+
+# Async engine used by the request handlers so queries don't block the event loop
+async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(async_url, **engine_options(async_url))
+
+if is_sqlite(settings.DATABASE_URL):
+    install_sqlite_pragmas(engine, sqlite_pragmas())
+if is_sqlite(async_url):
+    install_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
 
 def get_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    # expire_on_commit=False: attributes stay loaded after commit, no implicit IO
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    
-    # Manual Migration for 'domain' column in 'systemsettings'
-    from sqlalchemy import text
+    """Brings the schema up to date; only a version check when it already is (see core/migrations.py)."""
+    from app.core.migrations import migrate
+    migrate(engine)
+
+def optimize_db():
+    """
+    Lets SQLite refresh its query planner statistics; meant to run on shutdown.
+    """
+    if not is_sqlite(settings.DATABASE_URL):
+        return
     try:
-        with Session(engine) as session:
-            try:
-                # Check for column existence (SQLite/Postgres friendly)
-                session.exec(text("SELECT domain FROM systemsettings LIMIT 1"))
-            except Exception:
-                # Add column if missing
-                session.exec(text("ALTER TABLE systemsettings ADD COLUMN domain VARCHAR"))
-                session.commit()
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA optimize")
     except Exception as e:
-        print(f"Migration warning: {e}")
+        print(f"PRAGMA optimize failed: {e}")
@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once per database and is recorded in the schemamigration
+table. `migrate()` only reads the recorded version when the schema is current:
+no lock, no DDL. That lets every worker call it at startup. When something is pending,
+the first process to take the migration lock applies it; the others wait for
+the lock, then find nothing left to do.
+
+create_all only creates missing tables, so new columns and indexes on existing
+tables need a new migration at the end of MIGRATIONS. pysqlite does not run DDL
+inside the transaction, so a migration that dies halfway can be left partly
+applied and unrecorded. Write migrations so that running them again is safe:
+check first, as the ones below do.
+"""
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Tuple
+
+import structlog
+from sqlalchemy import Connection, Engine, func, inspect, select, text
+from sqlmodel import SQLModel
+
+from app.core.locks import FileLock
+from app.models.job import Job
+from app.models.schema_migration import SchemaMigration
+
+logger = structlog.get_logger()
+
+# Any constant works, as long as nothing else takes the same advisory lock
+POSTGRES_LOCK_KEY = 0x6572_6D75
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+# Columns added before migrations were versioned; applied by the baseline to older databases
+LEGACY_COLUMNS: List[Tuple[str, str, str]] = [
+    ("systemsettings", "domain", "VARCHAR"),
+    ("systemsettings", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("media", "size", "INTEGER"),
+    ("media", "sha256", "VARCHAR"),
+    ("media", "storage_path", "VARCHAR"),
+    ("media", "file_state", "VARCHAR"),
+    ("media", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("media", "duration", "FLOAT"),
+    ("media", "bitrate", "INTEGER"),
+    ("media", "sample_rate", "INTEGER"),
+    ("media", "channels", "INTEGER"),
+    ("media", "audio_codec", "VARCHAR"),
+    ("media", "video_codec", "VARCHAR"),
+    ("media", "artist", "VARCHAR"),
+    ("media", "album", "VARCHAR"),
+    ("media", "analyzed_at", "TIMESTAMP"),
+    ("media", "peaks_version", "INTEGER"),
+    ("media", "peaks_at", "TIMESTAMP"),
+    ("media", "thumbnails_version", "INTEGER"),
+    ("media", "sprite_columns", "INTEGER"),
+    ("media", "sprite_rows", "INTEGER"),
+    ("media", "thumbnails_at", "TIMESTAMP"),
+    ("media", "hls_version", "INTEGER"),
+    ("media", "hls_renditions", "VARCHAR"),
+    ("media", "hls_at", "TIMESTAMP"),
+]
+
+
+def add_missing_columns(connection: Connection, columns: List[Tuple[str, str, str]]) -> None:
+    inspector = inspect(connection)
+    existing = {}
+    for table, column, column_type in columns:
+        if table not in existing:
+            existing[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing[table]:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+            existing[table].add(column)
+
+
+def baseline(connection: Connection) -> None:
+    """Every table of the models, plus the columns older databases lack."""
+    SQLModel.metadata.create_all(connection)
+    add_missing_columns(connection, LEGACY_COLUMNS)
+
+
+# Spelled out rather than read from the models, so this migration keeps doing the same
+# thing when the models change later
+LISTING_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_media_media_type ON media (media_type)",
+    "CREATE INDEX IF NOT EXISTS ix_media_related_to_id ON media (related_to_id)",
+    "CREATE INDEX IF NOT EXISTS ix_media_genre ON media (genre)",
+    "CREATE INDEX IF NOT EXISTS ix_media_sha256 ON media (sha256)",
+    "CREATE INDEX IF NOT EXISTS ix_media_file_state ON media (file_state)",
+    "CREATE INDEX IF NOT EXISTS ix_media_version ON media (version)",
+    "CREATE INDEX IF NOT EXISTS ix_media_analyzed_at ON media (analyzed_at)",
+    "CREATE INDEX IF NOT EXISTS ix_media_peaks_at ON media (peaks_at)",
+    "CREATE INDEX IF NOT EXISTS ix_media_thumbnails_at ON media (thumbnails_at)",
+    "CREATE INDEX IF NOT EXISTS ix_media_hls_at ON media (hls_at)",
+    "CREATE INDEX IF NOT EXISTS ix_media_type_created_id ON media (media_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_media_type_genre_created_id ON media (media_type, genre, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_media_type_related_created_id ON media (media_type, related_to_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_media_type_title ON media (media_type, title)",
+    "CREATE INDEX IF NOT EXISTS ix_guest_email ON guest (email)",
+]
+
+
+def listing_and_login_indexes(connection: Connection) -> None:
+    """The keyset indexes behind the media listings, and the PIN index behind login."""
+    # create_all skips the indexes of tables that already existed
+    for statement in LISTING_INDEXES:
+        connection.execute(text(statement))
+    duplicate_pins = connection.execute(
+        text("SELECT pin FROM guest GROUP BY pin HAVING COUNT(*) > 1 LIMIT 1")
+    ).first()
+    if duplicate_pins:
+        # Guests sharing a PIN predate the unique index; keep login indexed all the same
+        logger.warning("Duplicate guest PINs, using a non-unique index instead of ux_guest_pin")
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_guest_pin ON guest (pin)"))
+    else:
+        connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_guest_pin ON guest (pin)"))
+
+
+def job_table(connection: Connection) -> None:
+    """The persistent queue behind the long-running admin operations."""
+    Job.__table__.create(connection, checkfirst=True)
+
+
+def guest_token_cutoff(connection: Connection) -> None:
+    """Guest revocations, kept in the database so that every worker honours them."""
+    add_missing_columns(connection, [("guest", "tokens_valid_after", "TIMESTAMP")])
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", baseline),
+    Migration(2, "listing and login indexes", listing_and_login_indexes),
+    Migration(3, "job table", job_table),
+    Migration(4, "guest token cutoff", guest_token_cutoff),
+]
+LATEST = MIGRATIONS[-1].version
+
+
+def current_version(connection: Connection) -> int:
+    if not inspect(connection).has_table(SchemaMigration.__tablename__):
+        return 0
+    return connection.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+
+
+@contextmanager
+def migration_lock(engine: Engine) -> Iterator[None]:
+    """
+    Serializes migrations across processes: a Postgres advisory lock, or a lock
+    file next to a SQLite database. In-memory SQLite is private to one process.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": POSTGRES_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": POSTGRES_LOCK_KEY})
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        with FileLock(f"{os.path.abspath(engine.url.database)}.migrate.lock"):
+            yield
+    else:
+        yield
+
+
+def migrate(engine: Engine) -> int:
+    """Applies the pending migrations; returns how many ran."""
+    with engine.connect() as connection:
+        if current_version(connection) >= LATEST:
+            return 0
+
+    with migration_lock(engine):
+        with engine.begin() as connection:
+            SchemaMigration.__table__.create(connection, checkfirst=True)
+            applied = set(connection.execute(select(SchemaMigration.version)).scalars())
+        pending = [migration for migration in MIGRATIONS if migration.version not in applied]
+        for migration in pending:
+            with engine.begin() as connection:
+                migration.apply(connection)
+                connection.execute(
+                    SchemaMigration.__table__.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    )
+                )
+            logger.info(f"Applied migration {migration.version}: {migration.name}")
+        return len(pending)
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from jose import jwt, JWTError
+
+from app.core.config import settings
+
+ALGORITHM = "HS256"
+
+
+class TokenRejected(Exception):
+    pass
+
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    to_encode = data.copy()
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+class TokenVerifier:
+    """
+    Verifies access tokens, remembering the claims of recently verified ones.
+
+    The LRU is keyed by the signature segment but stores the full token, so a
+    cache hit still requires a byte-identical token; a forged payload with a
+    reused signature misses and goes through the full decode. Expiry is checked
+    on every hit. The cache is per process; guest tokens are additionally checked
+    against the guest's row (services/guest_tokens.py).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._verified: "OrderedDict[str, Tuple[str, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> dict:
+        """Returns the token's claims or raises TokenRejected."""
+        signature = token.rpartition(".")[2]
+        with self._lock:
+            entry = self._verified.get(signature)
+            if entry and entry[0] == token:
+                self._verified.move_to_end(signature)
+                claims = entry[1]
+            else:
+                claims = None
+
+        if claims is None:
+            try:
+                # Tokens from before expiry was enforced carry neither claim and must not live forever;
+                # iat is what guest revocation compares against
+                claims = jwt.decode(
+                    token, settings.SECRET_KEY, algorithms=[ALGORITHM],
+                    options={"require_exp": True, "require_iat": True},
+                )
+            except JWTError as e:
+                raise TokenRejected(str(e))
+            if self.max_size > 0:
+                with self._lock:
+                    self._verified[signature] = (token, claims)
+                    self._verified.move_to_end(signature)
+                    while len(self._verified) > self.max_size:
+                        self._verified.popitem(last=False)
+
+        if claims["exp"] <= time.time():
+            self._forget(signature)
+            raise TokenRejected("Token expired")
+        return claims
+
+    def _forget(self, signature: str) -> None:
+        with self._lock:
+            self._verified.pop(signature, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._verified.clear()
+
+
+token_verifier = TokenVerifier(settings.TOKEN_CACHE_SIZE)
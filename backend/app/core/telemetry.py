@@ -0,0 +1,177 @@
+"""
+Tracing and metrics. `setup_telemetry(app)` installs the tracer and meter
+providers, instruments FastAPI and SQLAlchemy, and wires the exporters:
+Prometheus behind /metrics, plus OTLP/HTTP or in-memory export depending on
+OTEL_EXPORTER.
+
+/metrics is served from the memory of the worker that answers the request, so
+with several workers (app/serve.py) it shows one of them per scrape. OTLP is
+the way to collect from all of them: every worker pushes its own series,
+told apart by service.instance.id.
+
+The tracer and instruments below come from the API's proxy objects, so other
+modules can import and record into them before (or without) setup.
+"""
+import os
+import socket
+from contextvars import ContextVar
+from typing import List, Optional
+
+import structlog
+from opentelemetry import metrics, trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader, MetricReader, PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from sqlalchemy import event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.db import async_engine, engine
+
+tracer = trace.get_tracer("er_music")
+meter = metrics.get_meter("er_music")
+
+upload_bytes = meter.create_counter(
+    "upload.bytes", unit="By", description="Bytes received by uploads"
+)
+upload_throughput = meter.create_histogram(
+    "upload.throughput", unit="By/s", description="Transfer rate of each upload request"
+)
+scan_duration = meter.create_histogram(
+    "storage.scan.duration", unit="s", description="Duration of storage scans"
+)
+scan_files = meter.create_counter(
+    "storage.scan.files", unit="{file}", description="Files seen by storage scans, by outcome"
+)
+smtp_send_duration = meter.create_histogram(
+    "smtp.send.duration", unit="s", description="Latency of SMTP sends, by outcome"
+)
+job_duration = meter.create_histogram(
+    "job.duration", unit="s", description="Run time of background jobs, by type and outcome"
+)
+db_queries_per_request = meter.create_histogram(
+    "http.server.db_queries", unit="{query}", description="Database queries issued per request, by route"
+)
+
+# The SDK's default buckets are meant for milliseconds; these instruments need their own
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+BUCKETS = {
+    "upload.throughput": (1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9),
+    "storage.scan.duration": SECONDS_BUCKETS,
+    "smtp.send.duration": SECONDS_BUCKETS,
+    "job.duration": SECONDS_BUCKETS,
+    "http.server.db_queries": (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+}
+
+# Set per request by QueryCountMiddleware; a list so the DB layer can bump it in place
+_query_count: ContextVar[Optional[List[int]]] = ContextVar("db_query_count", default=None)
+
+# Filled when OTEL_EXPORTER is "memory"
+memory_span_exporter: Optional[InMemorySpanExporter] = None
+memory_metric_reader: Optional[InMemoryMetricReader] = None
+
+_configured = False
+
+
+def record_upload(kind: str, size: int, seconds: float) -> None:
+    attributes = {"upload.kind": kind}
+    upload_bytes.add(size, attributes)
+    if seconds > 0:
+        upload_throughput.record(size / seconds, attributes)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class QueryCountMiddleware:
+    """Records how many SQL statements each request ran, keyed by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        counter = [0]
+        token = _query_count.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_count.reset(token)
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                db_queries_per_request.record(
+                    counter[0], {"http.route": route, "http.request.method": scope["method"]}
+                )
+
+
+def _add_trace_context(logger, method_name, event_dict):
+    # Lets log lines be joined with the trace they were written in
+    context = trace.get_current_span().get_span_context()
+    if context.is_valid:
+        event_dict["trace_id"] = format(context.trace_id, "032x")
+        event_dict["span_id"] = format(context.span_id, "016x")
+    return event_dict
+
+
+def setup_telemetry(app) -> None:
+    """Configures providers, exporters and instrumentation once per process."""
+    global _configured, memory_span_exporter, memory_metric_reader
+    if _configured:
+        return
+    _configured = True
+
+    resource = Resource.create({
+        "service.name": settings.PROJECT_NAME,
+        "service.instance.id": f"{socket.gethostname()}-{os.getpid()}",
+    })
+    tracer_provider = TracerProvider(resource=resource)
+    readers: List[MetricReader] = []
+    if settings.METRICS_ENABLED:
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        readers.append(PrometheusMetricReader())
+
+    if settings.OTEL_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        endpoint = settings.OTEL_EXPORTER_OTLP_ENDPOINT.rstrip("/")
+        tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces")))
+        readers.append(PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=f"{endpoint}/v1/metrics")))
+    elif settings.OTEL_EXPORTER == "memory":
+        memory_span_exporter = InMemorySpanExporter()
+        memory_metric_reader = InMemoryMetricReader()
+        tracer_provider.add_span_processor(SimpleSpanProcessor(memory_span_exporter))
+        readers.append(memory_metric_reader)
+
+    views = [
+        View(instrument_name=name, aggregation=ExplicitBucketHistogramAggregation(boundaries))
+        for name, boundaries in BUCKETS.items()
+    ]
+    meter_provider = MeterProvider(resource=resource, metric_readers=readers, views=views)
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(meter_provider)
+
+    FastAPIInstrumentor.instrument_app(
+        app,
+        tracer_provider=tracer_provider,
+        meter_provider=meter_provider,
+        excluded_urls="/metrics,/health,/ready",
+    )
+    engines = [engine, async_engine.sync_engine]
+    SQLAlchemyInstrumentor().instrument(engines=engines, tracer_provider=tracer_provider)
+    for db_engine in engines:
+        event.listen(db_engine, "before_cursor_execute", _count_query)
+    app.add_middleware(QueryCountMiddleware)
+
+    structlog.configure(processors=[_add_trace_context, *structlog.get_config()["processors"]])
@@ -1,22 +1,48 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 import structlog
 import os
 from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.api.v1.endpoints import auth, media, guests
+from app.api.v1.endpoints import auth, media, guests, jobs, uploads
 from app.api.v1.endpoints import settings as settings_endpoint
-from app.core.db import init_db
+from app.core.db import init_db, optimize_db, async_engine
+from app.core.telemetry import setup_telemetry
+from app.services.settings_cache import settings_cache
+from app.services.outbox import email_worker
+from app.services.analysis import analyzer
+from app.services.jobs import job_runner
+from app.services.leader import leader
+from app.services.static_assets import INDEX_HTML, static_dir, static_index
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 logger = structlog.get_logger()
 
+async def start_background_jobs():
+    # Only in the leader worker; the email outbox is lease-based and runs in every worker
+    async with AsyncSession(async_engine) as session:
+        await uploads.purge_expired_uploads(session)
+    analyzer.start()
+    job_runner.start()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    static_index.build()
+    await settings_cache.start()
+    email_worker.start()
+    leader.start(start_background_jobs)
     yield
+    # Jobs are handed back before the leader lock goes to another worker
+    await job_runner.stop()
+    await leader.stop()
+    await analyzer.stop()
+    await email_worker.stop()
+    await settings_cache.stop()
+    optimize_db()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -24,6 +50,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+setup_telemetry(app)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -32,12 +60,15 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Peaks-Bits", "X-Peaks-Sample-Rate", "X-Peaks-Samples-Per-Peak"],
     )
 
 # Routes
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(media.router, prefix="/api/v1/media", tags=["media"])
+app.include_router(uploads.router, prefix="/api/v1/uploads", tags=["uploads"])
 app.include_router(guests.router, prefix="/api/v1/guests", tags=["guests"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
 app.include_router(settings_endpoint.router, prefix="/api/v1/settings", tags=["settings"])
 
 @app.get("/health")
@@ -48,20 +79,28 @@ async def health_check():
 async def readiness_check():
     return {"status": "ready"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Mount static files
-static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 os.makedirs(static_dir, exist_ok=True)
 if os.path.exists(static_dir):
     app.mount("/limit_static", StaticFiles(directory=static_dir), name="static")
 
-# Catch-all for SPA
-@app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+# Catch-all for SPA: files from the startup index, client-side routes get index.html
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_spa(full_path: str, request: Request):
     if full_path.startswith("api") or full_path.startswith("limit_static"):
          return {"detail": "Not Found"}
-    
-    possible_path = os.path.join(static_dir, full_path)
-    if os.path.exists(possible_path) and os.path.isfile(possible_path):
-        return FileResponse(possible_path)
 
-    return FileResponse(os.path.join(static_dir, "index.html"))
+    asset = static_index.get(full_path)
+    if asset is None:
+        full_path = INDEX_HTML
+        asset = static_index.get(full_path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Frontend not built")
+    return static_index.respond(request, full_path, asset)
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class Blob(SQLModel, table=True):
+    """
+    A content-addressed file under UPLOAD_DIR, shared by every Media row with
+    the same sha256. The file is removed when ref_count drops to zero.
+    """
+    sha256: str = Field(primary_key=True)
+    size: int
+    path: str # relative to UPLOAD_DIR
+    ref_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
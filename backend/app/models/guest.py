@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class GuestBase(SQLModel):
@@ -8,13 +9,22 @@ class GuestBase(SQLModel):
     is_active: bool = True
 
 class Guest(GuestBase, table=True):
+    # PINs identify the guest at login, so they must be unique
+    __table_args__ = (Index("ux_guest_pin", "pin", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    pin: str = Field(index=True) # The generated 8-digit PIN
+    pin: str # The generated 8-digit PIN
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Tokens issued up to this time are rejected; set when the guest is deactivated
+    tokens_valid_after: Optional[datetime] = None
 
 class GuestCreate(GuestBase):
     pass
 
+class GuestUpdate(SQLModel):
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+
 class GuestRead(GuestBase):
     id: int
     created_at: datetime
@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import JSON, Column, Index, text
+from sqlmodel import Field, SQLModel
+
+# Jobs that still hold their dedup key
+ACTIVE_JOB = text("status IN ('pending', 'running')")
+
+class JobBase(SQLModel):
+    type: str = Field(index=True)
+    # pending -> running -> done | failed; back to pending between retries
+    status: str = Field(default="pending")
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=1)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class Job(JobBase, table=True):
+    """
+    Long-running admin operation, run by the job runner (services/jobs.py).
+    While a job runs, next_attempt_at doubles as its lease: if the worker dies
+    the job becomes due again once that time passes.
+    """
+    __table_args__ = (
+        # Identical requests share the job that is already queued or running
+        Index(
+            "ux_job_active_dedup_key", "dedup_key", unique=True,
+            sqlite_where=ACTIVE_JOB, postgresql_where=ACTIVE_JOB,
+        ),
+        Index("ix_job_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    dedup_key: Optional[str] = None
+    params: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    progress: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+
+class JobRead(JobBase):
+    id: str
+    params: dict
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
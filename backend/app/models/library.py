@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class LibraryState(SQLModel, table=True):
+    """
+    Singleton row holding the library-wide version counter. Every transaction
+    that adds, changes or deletes Media bumps it once.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(default=0)
+    # Tombstones at or below this version have been pruned; older deltas need a full snapshot
+    pruned_version: int = Field(default=0)
+
+class MediaTombstone(SQLModel, table=True):
+    media_id: int = Field(primary_key=True)
+    version: int = Field(index=True)
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class MediaBase(SQLModel):
@@ -9,10 +10,52 @@ class MediaBase(SQLModel):
     related_to_id: Optional[int] = Field(default=None, index=True)
     title: Optional[str] = Field(default=None)
     genre: Optional[str] = Field(default=None, index=True)
+    size: Optional[int] = Field(default=None) # bytes
+    sha256: Optional[str] = Field(default=None, index=True)
+    # Blob path relative to UPLOAD_DIR when content-addressed, None for flat files
+    storage_path: Optional[str] = Field(default=None)
+    # Set by the storage scanner: 'missing' or 'changed', None when the file is fine
+    file_state: Optional[str] = Field(default=None, index=True)
+    # Filled in by the analysis pipeline (services/analysis.py)
+    duration: Optional[float] = Field(default=None) # seconds
+    bitrate: Optional[int] = Field(default=None) # bits per second
+    sample_rate: Optional[int] = Field(default=None)
+    channels: Optional[int] = Field(default=None)
+    audio_codec: Optional[str] = Field(default=None)
+    video_codec: Optional[str] = Field(default=None)
+    artist: Optional[str] = Field(default=None)
+    album: Optional[str] = Field(default=None)
+    # Changes whenever the waveform peaks are rewritten; None while there are none
+    peaks_version: Optional[int] = Field(default=None)
+    # Same for the video poster and sprite sheet; the sprite grid is None without a sprite
+    thumbnails_version: Optional[int] = Field(default=None)
+    sprite_columns: Optional[int] = Field(default=None)
+    sprite_rows: Optional[int] = Field(default=None)
+    # HLS packaging: version of the current rendition set and its heights ("720,480,360")
+    hls_version: Optional[int] = Field(default=None)
+    hls_renditions: Optional[str] = Field(default=None)
 
 class Media(MediaBase, table=True):
+    # Composite indexes backing the keyset-paginated listings
+    __table_args__ = (
+        Index("ix_media_type_created_id", "media_type", "created_at", "id"),
+        Index("ix_media_type_genre_created_id", "media_type", "genre", "created_at", "id"),
+        Index("ix_media_type_related_created_id", "media_type", "related_to_id", "created_at", "id"),
+        Index("ix_media_type_title", "media_type", "title"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Library version of the last change to this row (see services/library.py)
+    version: int = Field(default=0, index=True)
+    # None until the analysis pipeline has looked at the file
+    analyzed_at: Optional[datetime] = Field(default=None, index=True)
+    # None until waveform peaks have been computed (or attempted) for an audio file
+    peaks_at: Optional[datetime] = Field(default=None, index=True)
+    # None until poster and sprite have been rendered (or attempted) for a video
+    thumbnails_at: Optional[datetime] = Field(default=None, index=True)
+    # None until the video has been packaged for HLS (or attempted), when enabled
+    hls_at: Optional[datetime] = Field(default=None, index=True)
 
 class MediaCreate(MediaBase):
     pass
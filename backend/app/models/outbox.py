@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class EmailOutboxBase(SQLModel):
+    guest_id: Optional[int] = Field(default=None, index=True)
+    email_to: str
+    # pending -> sending -> sent | failed; "logged" when SMTP isn't configured
+    status: str = Field(default="pending", index=True)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+
+class EmailOutbox(EmailOutboxBase, table=True):
+    """
+    PIN invitations waiting for (or done with) delivery by the email worker.
+    While a row is being sent, next_attempt_at doubles as its lease: if the
+    worker dies mid-send the row becomes due again once that time passes.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    guest_name: Optional[str] = None
+    pin: Optional[str] = None # cleared once delivered
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class EmailOutboxRead(EmailOutboxBase):
+    id: int
+    next_attempt_at: datetime
@@ -0,0 +1,11 @@
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class RateLimitHit(SQLModel, table=True):
+    """
+    One counted request, for the database-backed rate limiter shared by all workers.
+    Rows older than the window are deleted as new hits come in.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(index=True)
+    hit_at: float = Field(index=True) # unix timestamp
@@ -0,0 +1,8 @@
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class SchemaMigration(SQLModel, table=True):
+    """One row per migration applied to this database (see core/migrations.py)."""
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -20,5 +20,8 @@ class SystemSettings(SQLModel, table=True):
     
     # System Settings
     domain: Optional[str] = None
+
+    # Bumped on every save so other workers can tell their cached copy is stale
+    version: int = Field(default=0)
     
     # Singleton marker - ensuring we check for ID=1 usually
@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class StorageFile(SQLModel, table=True):
+    """
+    Persistent index of the upload directory as of the last scan, so a rescan
+    only has to look at paths whose size or mtime moved.
+    """
+    path: str = Field(primary_key=True) # relative to UPLOAD_DIR
+    size: int
+    mtime_ns: int
+    indexed_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class UploadSessionBase(SQLModel):
+    filename: str = Field(index=True)
+    media_type: str # 'video' or 'audio'
+    total_size: int
+    related_to_id: Optional[int] = None
+    title: Optional[str] = None
+    genre: Optional[str] = None
+
+class UploadSession(UploadSessionBase, table=True):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    # Bytes received so far; the next chunk must start here
+    offset: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+class UploadSessionCreate(UploadSessionBase):
+    pass
+
+class UploadSessionRead(UploadSessionBase):
+    id: str
+    offset: int
+    expires_at: datetime
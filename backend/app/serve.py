@@ -0,0 +1,61 @@
+"""
+Production entry point: applies pending migrations once, then serves the app
+from WORKERS uvicorn processes (one per available CPU by default). Workers
+find the schema current and skip all DDL at startup.
+
+    python -m app.serve
+"""
+import os
+
+import structlog
+import uvicorn
+
+logger = structlog.get_logger()
+
+
+def worker_count() -> int:
+    from app.core.config import settings
+
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    # CPUs this process may run on, which respects container CPU sets
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main() -> None:
+    # Imported here rather than at the top: spawned processes (the analysis pool)
+    # re-import the main module, and should not build a database engine for it
+    from app.core.config import settings
+    from app.core.db import async_engine, engine, init_db
+
+    init_db()
+    # Workers are spawned fresh; don't hand them pooled connections
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+
+    workers = worker_count()
+    if workers > 1 and settings.RATE_LIMIT_BACKEND == "memory":
+        logger.warning(
+            f"RATE_LIMIT_BACKEND=memory keeps login limits per process; "
+            f"with {workers} workers the effective limit is {workers}x. Use 'database' to share it."
+        )
+    if workers > 1 and settings.METRICS_ENABLED and settings.OTEL_EXPORTER != "otlp":
+        logger.warning(
+            f"/metrics only reports the worker that answers the scrape; with {workers} workers "
+            f"set OTEL_EXPORTER=otlp to collect metrics from all of them."
+        )
+    logger.info(f"Starting {workers} worker(s) on {settings.HOST}:{settings.PORT}")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        # The app reads X-Forwarded-For itself, from TRUSTED_PROXIES only
+        proxy_headers=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
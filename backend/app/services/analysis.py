@@ -0,0 +1,275 @@
+import asyncio
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import structlog
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.media import Media
+from app.services import storage
+from app.services.analysis_worker import package_task, peaks_task, probe_task, thumbnails_task
+from app.services.scanner import FILE_CHANGED, FILE_MISSING
+
+logger = structlog.get_logger()
+
+# wake() only reaches this process; rows added by other workers are found by polling
+IDLE_POLL_SECONDS = 15.0
+# probe_file keys stored on Media as-is
+ANALYSIS_FIELDS = ("duration", "bitrate", "sample_rate", "channels", "audio_codec", "video_codec", "artist", "album")
+
+
+class MediaAnalyzer:
+    """
+    Fills the analysis columns of Media (duration, bitrate, codecs, tags) for rows
+    that have no `analyzed_at` yet: new uploads, files found by the scanner, and
+    rows from before this existed. Header parsing runs in a process pool so it
+    neither blocks the event loop nor competes for the GIL; results are written
+    back in batches. `wake()` after adding rows; otherwise the backlog is picked
+    up at startup or by the next idle poll. Runs only in the leader worker.
+
+    Further passes on the same pool render waveform peaks for audio, a poster
+    and sprite sheet for video and, when HLS_ENABLED, an HLS rendition ladder.
+    Those need ffmpeg; without it they are skipped and stay pending.
+    """
+
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._ffmpeg: Optional[str] = None
+        self._ffmpeg_checked = False
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and DB threads is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                analyzed = (
+                    await self.analyze_pending()
+                    + await self.compute_pending_peaks()
+                    + await self.compute_pending_thumbnails()
+                    + await self.package_pending_hls()
+                )
+            except Exception as e:
+                logger.error(f"Media analysis failed: {e}")
+                analyzed = 0
+            if not analyzed:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def analyze_pending(self) -> int:
+        """Analyzes one batch of unanalyzed rows; returns how many were processed."""
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            items = (await session.exec(
+                select(Media).where(
+                    Media.analyzed_at == None,  # noqa: E711
+                    (Media.file_state == None) | (Media.file_state != FILE_MISSING),  # noqa: E711
+                ).order_by(Media.id).limit(self.batch_size)
+            )).all()
+            if not items:
+                return 0
+
+            loop = asyncio.get_running_loop()
+            pool = self._executor()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, probe_task, storage.media_source(media)) for media in items
+            ))
+
+            now = datetime.utcnow()
+            for media, result in zip(items, results):
+                if "error" in result:
+                    logger.warning(f"Could not analyze {media.filename}: {result['error']}")
+                for field in ANALYSIS_FIELDS:
+                    setattr(media, field, result.get(field))
+                # Tags only fill in what the user hasn't set; the scanner's default title is the filename
+                if result.get("title") and (not media.title or media.title == media.filename):
+                    media.title = result["title"]
+                media.analyzed_at = now
+                # The scanner flagged the new contents; now they are probed
+                if media.file_state == FILE_CHANGED:
+                    media.file_state = None
+                session.add(media)
+            await session.commit()
+            return len(items)
+
+    def _ffmpeg_path(self) -> Optional[str]:
+        if not self._ffmpeg_checked:
+            self._ffmpeg_checked = True
+            self._ffmpeg = shutil.which(settings.FFMPEG_BINARY)
+            if not self._ffmpeg:
+                logger.warning(f"{settings.FFMPEG_BINARY} not found; waveform peaks are disabled")
+        return self._ffmpeg
+
+    async def compute_pending_peaks(self) -> int:
+        """
+        Writes waveform peaks for one batch of analyzed audio rows that have none
+        yet; returns how many were processed. Failures are logged and not retried
+        until the file changes.
+        """
+        ffmpeg = self._ffmpeg_path()
+        if not ffmpeg:
+            return 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            items = (await session.exec(
+                select(Media).where(
+                    Media.media_type == "audio",
+                    Media.analyzed_at != None,  # noqa: E711
+                    Media.peaks_at == None,  # noqa: E711
+                    (Media.file_state == None) | (Media.file_state != FILE_MISSING),  # noqa: E711
+                ).order_by(Media.id).limit(self.workers * 4)
+            )).all()
+            if not items:
+                return 0
+
+            # Decoding takes seconds per file, so batches are kept to a few per worker
+            loop = asyncio.get_running_loop()
+            pool = self._executor()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool, peaks_task, storage.media_source(media), storage.peaks_path(media), ffmpeg,
+                    settings.PEAKS_SAMPLE_RATE, settings.PEAKS_LEVELS, settings.PEAKS_BITS,
+                )
+                for media in items
+            ))
+
+            now = datetime.utcnow()
+            for media, result in zip(items, results):
+                if "error" in result:
+                    logger.warning(f"Could not compute peaks for {media.filename}: {result['error']}")
+                    media.peaks_version = None
+                else:
+                    media.peaks_version = int(now.timestamp() * 1000)
+                media.peaks_at = now
+                session.add(media)
+            await session.commit()
+            return len(items)
+
+    async def compute_pending_thumbnails(self) -> int:
+        """
+        Renders the poster and sprite sheet for one batch of analyzed videos that
+        have none yet; returns how many were processed. Failures are logged and
+        not retried until the file changes or a backfill is requested.
+        """
+        ffmpeg = self._ffmpeg_path()
+        if not ffmpeg:
+            return 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            items = (await session.exec(
+                select(Media).where(
+                    Media.media_type == "video",
+                    Media.analyzed_at != None,  # noqa: E711
+                    Media.thumbnails_at == None,  # noqa: E711
+                    (Media.file_state == None) | (Media.file_state != FILE_MISSING),  # noqa: E711
+                ).order_by(Media.id).limit(self.workers * 4)
+            )).all()
+            if not items:
+                return 0
+
+            loop = asyncio.get_running_loop()
+            pool = self._executor()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool, thumbnails_task, storage.media_source(media),
+                    storage.thumbnail_path(media, "poster"), storage.thumbnail_path(media, "sprite"),
+                    ffmpeg, media.duration, settings.POSTER_WIDTH, settings.SPRITE_TILE_WIDTH,
+                    settings.SPRITE_COLUMNS, settings.SPRITE_ROWS, settings.THUMBNAIL_FORMAT,
+                )
+                for media in items
+            ))
+
+            now = datetime.utcnow()
+            for media, result in zip(items, results):
+                if "error" in result:
+                    logger.warning(f"Could not render thumbnails for {media.filename}: {result['error']}")
+                    media.thumbnails_version = None
+                else:
+                    media.thumbnails_version = int(now.timestamp() * 1000)
+                has_sprite = result.get("sprite", False)
+                media.sprite_columns = settings.SPRITE_COLUMNS if has_sprite else None
+                media.sprite_rows = settings.SPRITE_ROWS if has_sprite else None
+                media.thumbnails_at = now
+                session.add(media)
+            await session.commit()
+            return len(items)
+
+    async def package_pending_hls(self) -> int:
+        """
+        Packages one analyzed video that has no HLS renditions yet, if packaging
+        is enabled; returns how many were processed. One at a time: a transcode
+        takes minutes and ffmpeg already uses every core, so analysis of new
+        uploads gets its turn in between.
+        """
+        ffmpeg = self._ffmpeg_path() if settings.HLS_ENABLED else None
+        if not ffmpeg:
+            return 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            media = (await session.exec(
+                select(Media).where(
+                    Media.media_type == "video",
+                    Media.analyzed_at != None,  # noqa: E711
+                    Media.hls_at == None,  # noqa: E711
+                    (Media.file_state == None) | (Media.file_state != FILE_MISSING),  # noqa: E711
+                ).order_by(Media.id).limit(1)
+            )).first()
+            if not media:
+                return 0
+
+            # Each run gets its own directory; the one being served stays untouched until replaced
+            version = int(datetime.utcnow().timestamp() * 1000)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor(), package_task, storage.media_source(media), storage.hls_dir(media, version), ffmpeg,
+                settings.HLS_LADDER, settings.HLS_AUDIO_BITRATE_KBPS, settings.HLS_SEGMENT_SECONDS,
+                settings.HLS_X264_PRESET,
+            )
+
+            now = datetime.utcnow()
+            if "error" in result:
+                logger.warning(f"Could not package {media.filename} for HLS: {result['error']}")
+                media.hls_version = None
+                media.hls_renditions = None
+            else:
+                media.hls_version = version
+                media.hls_renditions = ",".join(str(height) for height in result["renditions"])
+            media.hls_at = now
+            session.add(media)
+            await session.commit()
+            await storage.prune_hls(media)
+            return 1
+
+
+analyzer = MediaAnalyzer(settings.ANALYSIS_WORKERS, settings.ANALYSIS_BATCH_SIZE)
@@ -0,0 +1,51 @@
+"""
+Entry points of the analysis process pool (services/analysis.py).
+
+Spawned workers unpickle these functions by importing this module, so it only
+pulls in the standalone parsers and ffmpeg wrappers: nothing from app.core or
+the models, which would have every worker load the settings and build a
+database engine it never uses. Keep it that way when adding a task.
+"""
+import os
+from typing import Any, Dict
+
+from app.services.hls import package_hls
+from app.services.media_probe import probe_file, probe_url
+from app.services.peaks import write_peaks
+from app.services.thumbnails import write_thumbnails
+
+
+def probe_task(source: str) -> Dict[str, Any]:
+    # Errors are returned rather than raised so one bad file can't fail the batch
+    try:
+        if source.startswith(("http://", "https://")):
+            # Object storage: ranged reads of just the parts the parser looks at
+            return probe_url(source)
+        return probe_file(source)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def peaks_task(source: str, target: str, ffmpeg: str, sample_rate: int, levels, bits: int) -> Dict[str, Any]:
+    try:
+        # Derived files sit in UPLOAD_DIR, whose tree only mirrors object storage on demand
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return {"size": write_peaks(source, target, ffmpeg, sample_rate, levels, bits)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def thumbnails_task(source: str, poster_target: str, *args) -> Dict[str, Any]:
+    try:
+        os.makedirs(os.path.dirname(poster_target), exist_ok=True)
+        return write_thumbnails(source, poster_target, *args)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def package_task(source: str, target_dir: str, *args) -> Dict[str, Any]:
+    try:
+        os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+        return package_hls(source, target_dir, *args)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
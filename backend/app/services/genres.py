@@ -0,0 +1,91 @@
+import sqlite3
+from typing import List
+
+from sqlalchemy.orm import aliased
+from sqlmodel import and_, exists, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine
+from app.models.media import Media
+from app.services.jobs import JobContext, job_runner
+from app.services.library import next_version
+
+REINDEX_AUDIO_JOB = "media.reindex_audio"
+
+Parent = aliased(Media)
+
+# Audio whose linked parent has a (non-empty) genre that differs from its own
+NEEDS_SYNC = and_(
+    Media.media_type == "audio",
+    Parent.id == Media.related_to_id,
+    Parent.genre != None,  # noqa: E711
+    Parent.genre != "",
+    Parent.genre.is_distinct_from(Media.genre),
+)
+
+
+def supports_update_from(dialect) -> bool:
+    if dialect.name == "sqlite":
+        # UPDATE ... FROM arrived in SQLite 3.33
+        return sqlite3.sqlite_version_info >= (3, 33, 0)
+    return dialect.name in ("postgresql", "mysql", "mariadb", "mssql")
+
+
+async def genre_sync_diff(session: AsyncSession) -> List[dict]:
+    """Lists the audio rows a reindex would change, without touching them."""
+    statement = (
+        select(Media.id, Media.title, Media.genre, Parent.id, Parent.genre)
+        .where(NEEDS_SYNC)
+        .order_by(Media.id)
+    )
+    return [
+        {"id": audio_id, "title": title, "old_genre": old_genre, "new_genre": new_genre, "parent_id": parent_id}
+        for audio_id, title, old_genre, parent_id, new_genre in (await session.exec(statement)).all()
+    ]
+
+
+async def sync_all_audio_genres(session: AsyncSession) -> int:
+    """
+    Copies each parent's genre onto its linked audio in a single statement:
+    UPDATE ... FROM where the dialect has it, a correlated subquery otherwise.
+    The caller commits.
+    """
+    version = await next_version(session)
+    if supports_update_from(session.bind.dialect):
+        statement = update(Media).where(NEEDS_SYNC).values(genre=Parent.genre, version=version)
+    else:
+        parent_genre = (
+            select(Parent.genre).where(Parent.id == Media.related_to_id).scalar_subquery()
+        )
+        statement = (
+            update(Media)
+            .where(exists().where(NEEDS_SYNC))
+            .values(genre=parent_genre, version=version)
+        )
+    result = await session.exec(statement.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+@job_runner.register(REINDEX_AUDIO_JOB)
+async def run_reindex_audio(job: JobContext) -> dict:
+    async with AsyncSession(async_engine) as session:
+        updated_count = await sync_all_audio_genres(session)
+        await session.commit()
+    return {"message": f"Updated {updated_count} audio tracks with parent genres.", "updated_count": updated_count}
+
+
+async def propagate_genre(session: AsyncSession, parent_id: int, genre: str) -> int:
+    """Pushes a parent's new genre down to its linked audio. The caller commits."""
+    if not genre:
+        return 0
+    statement = (
+        update(Media)
+        .where(
+            Media.media_type == "audio",
+            Media.related_to_id == parent_id,
+            Media.genre.is_distinct_from(genre),
+        )
+        .values(genre=genre, version=await next_version(session))
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.exec(statement)).rowcount
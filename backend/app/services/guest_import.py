@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import secrets
+import string
+from typing import Any, Dict, List, Optional, Set
+
+from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.guest import Guest
+from app.models.outbox import EmailOutbox
+from app.services.settings_cache import settings_cache
+
+# Chunk size for IN (...) lookups and insert flushes; stays under SQLite's variable limit
+BATCH_SIZE = 500
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+FALSE_VALUES = {"0", "false", "no", "n", "off"}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def generate_pin(length: int = 8) -> str:
+    return "".join(secrets.choice(string.digits) for _ in range(length))
+
+
+async def reserved_pins() -> Set[str]:
+    """PINs no guest may hold: login checks the admin PIN first, so such a guest would sign in as admin."""
+    sys_settings = await settings_cache.get()
+    return {pin for pin in (settings.ACCESS_PIN, sys_settings.admin_pin if sys_settings else None) if pin}
+
+
+async def allocate_pins(session: AsyncSession, count: int, length: int = 8) -> List[str]:
+    """
+    Draws `count` distinct PINs that no existing guest uses and that are not
+    reserved for the admin. Candidates are checked against the table in chunks
+    and redrawn on collision; the unique index on Guest.pin guards against a
+    concurrent allocation.
+    """
+    reserved = await reserved_pins()
+    pins: Set[str] = set()
+    while len(pins) < count:
+        candidates: Set[str] = set()
+        while len(candidates) < count - len(pins):
+            pin = generate_pin(length)
+            if pin not in pins and pin not in reserved:
+                candidates.add(pin)
+        taken: Set[str] = set()
+        ordered = list(candidates)
+        for start in range(0, len(ordered), BATCH_SIZE):
+            chunk = ordered[start:start + BATCH_SIZE]
+            taken.update((await session.exec(select(Guest.pin).where(Guest.pin.in_(chunk)))).all())
+        pins.update(candidates - taken)
+    return list(pins)
+
+
+def _parse_bool(value: Any) -> Optional[bool]:
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+
+def parse_guest_rows(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """
+    Reads a JSON array of objects or a CSV with a header row (email, name,
+    is_active). Column names are case-insensitive; unknown ones are ignored.
+    """
+    if "json" in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise InvalidImport(f"Invalid JSON: {e}")
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise InvalidImport("Expected a JSON array of objects")
+        rows = [{str(k).strip().lower(): v for k, v in row.items()} for row in data]
+    else:
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise InvalidImport("CSV must be UTF-8 encoded")
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "email" not in [f.strip().lower() for f in reader.fieldnames]:
+            raise InvalidImport("CSV needs a header row with an 'email' column")
+        rows = [{(k or "").strip().lower(): v for k, v in row.items()} for row in reader]
+
+    if len(rows) > settings.GUEST_IMPORT_MAX_ROWS:
+        raise InvalidImport(f"At most {settings.GUEST_IMPORT_MAX_ROWS} rows per import")
+    return rows
+
+
+async def import_guests(session: AsyncSession, rows: List[Dict[str, Any]], send_invites: bool = True) -> Dict[str, Any]:
+    """
+    Validates and deduplicates `rows` in memory, then inserts the new guests (and
+    their invitation emails) in batches. The caller commits. Returns a report
+    with one entry per input row, in input order.
+    """
+    results: List[Dict[str, Any]] = []
+    accepted: Dict[str, int] = {} # normalized email -> index into results
+    for index, row in enumerate(rows, start=1):
+        raw_email = str(row.get("email") or "").strip()
+        result: Dict[str, Any] = {"row": index, "email": raw_email, "status": "invalid", "detail": None, "guest_id": None}
+        results.append(result)
+        try:
+            email = validate_email(raw_email, check_deliverability=False).normalized
+        except EmailNotValidError as e:
+            result["detail"] = str(e)
+            continue
+        is_active = _parse_bool(row.get("is_active"))
+        if is_active is None:
+            result["detail"] = f"Invalid is_active value: {row.get('is_active')!r}"
+            continue
+        key = email.lower()
+        if key in accepted:
+            result["status"] = "duplicate"
+            result["detail"] = f"Same email as row {accepted[key] + 1}"
+            continue
+        name = row.get("name")
+        result.update(email=email, name=str(name).strip() if name else None, is_active=is_active, status="new")
+        accepted[key] = index - 1
+
+    # Emails already registered, in one IN (...) query per chunk
+    keys = list(accepted)
+    for start in range(0, len(keys), BATCH_SIZE):
+        chunk = keys[start:start + BATCH_SIZE]
+        existing = (await session.exec(select(func.lower(Guest.email)).where(func.lower(Guest.email).in_(chunk)))).all()
+        for key in existing:
+            result = results[accepted.pop(key)]
+            result["status"] = "exists"
+            result["detail"] = "Email already registered"
+
+    new_results = [results[i] for i in accepted.values()]
+    pins = await allocate_pins(session, len(new_results))
+    for start in range(0, len(new_results), BATCH_SIZE):
+        batch = new_results[start:start + BATCH_SIZE]
+        guests = [
+            Guest(email=result["email"], name=result["name"], is_active=result["is_active"], pin=pin)
+            for result, pin in zip(batch, pins[start:start + BATCH_SIZE])
+        ]
+        session.add_all(guests)
+        await session.flush()
+        if send_invites:
+            session.add_all(
+                EmailOutbox(guest_id=guest.id, email_to=guest.email, pin=guest.pin, guest_name=guest.name)
+                for guest in guests if guest.is_active
+            )
+        for result, guest in zip(batch, guests):
+            result["status"] = "created"
+            result["guest_id"] = guest.id
+
+    for result in results:
+        result.pop("name", None)
+        result.pop("is_active", None)
+    counts = {status: 0 for status in ("created", "exists", "duplicate", "invalid")}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "rows": results}
@@ -0,0 +1,69 @@
+import calendar
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.guest import Guest
+
+# (loaded at, active, tokens valid after as a UTC timestamp); a missing guest is inactive
+_Entry = Tuple[float, bool, Optional[int]]
+
+
+class GuestTokenCheck:
+    """
+    Rejects guest tokens that were revoked: the guest was deleted or deactivated,
+    or the token was issued before `Guest.tokens_valid_after`.
+
+    The guest's state lives in the database so that a revocation holds in every
+    worker. Each process keeps a copy for `ttl` seconds; `invalidate` drops it
+    right away when this process made the change.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._guests: "OrderedDict[int, _Entry]" = OrderedDict()
+
+    async def accepts(self, claims: dict) -> bool:
+        try:
+            guest_id = int(claims.get("sub"))
+        except (TypeError, ValueError):
+            return False
+        entry = self._guests.get(guest_id)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            entry = await self._load(guest_id)
+        else:
+            self._guests.move_to_end(guest_id)
+
+        _, active, valid_after = entry
+        if not active:
+            return False
+        # iat has second precision; a token issued in the second of the revocation is rejected too
+        return valid_after is None or claims.get("iat", 0) > valid_after
+
+    async def _load(self, guest_id: int) -> _Entry:
+        async with AsyncSession(async_engine) as session:
+            row = (await session.exec(
+                select(Guest.is_active, Guest.tokens_valid_after).where(Guest.id == guest_id)
+            )).first()
+        active = row is not None and row[0]
+        valid_after = calendar.timegm(row[1].utctimetuple()) if active and row[1] else None
+        entry = (time.monotonic(), active, valid_after)
+        self._guests[guest_id] = entry
+        while len(self._guests) > self.max_size:
+            self._guests.popitem(last=False)
+        return entry
+
+    def invalidate(self, guest_id: int) -> None:
+        self._guests.pop(guest_id, None)
+
+    def clear(self) -> None:
+        self._guests.clear()
+
+
+guest_tokens = GuestTokenCheck(settings.GUEST_TOKEN_CACHE_SECONDS, settings.TOKEN_CACHE_SIZE)
@@ -0,0 +1,127 @@
+"""
+HLS packaging for videos: a rendition ladder of H.264/AAC variants in fMP4
+segments, written by one ffmpeg run. Like media_probe, this runs inside the
+analysis process pool and imports nothing from the app.
+
+Output layout (inside `<file>.hls/<hls_version>/`, one directory per packaging
+run so a new run never touches files that clients cache as immutable):
+
+    master.m3u8
+    v0/index.m3u8, v0/init_0.mp4, v0/seg_00000.m4s, ...   (one dir per rendition)
+"""
+import os
+import re
+import shutil
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+MASTER_PLAYLIST = "master.m3u8"
+# "Stream #0:0[0x1](und): Video: h264 (...), yuv420p(...), 1920x1080 [SAR 1:1 DAR 16:9], ..."
+VIDEO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Video: .*?(\d{2,5})x(\d{2,5})")
+AUDIO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Audio: ")
+
+
+def probe_streams(path: str, ffmpeg: str) -> Tuple[Optional[Tuple[int, int]], bool]:
+    """(width, height) of the first video stream, and whether there is audio, from ffmpeg's input dump."""
+    result = subprocess.run(
+        [ffmpeg, "-nostdin", "-hide_banner", "-i", path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    info = result.stderr.decode(errors="replace")
+    video = VIDEO_STREAM.search(info)
+    size = (int(video.group(1)), int(video.group(2))) if video else None
+    return size, AUDIO_STREAM.search(info) is not None
+
+
+def plan_ladder(source_height: int, ladder: Dict[int, int]) -> List[Tuple[int, int]]:
+    """
+    (height, video kbps) renditions for a source, tallest first. Rungs taller
+    than the source are dropped rather than upscaled; a source smaller than
+    every rung gets one rendition at its own height.
+    """
+    rungs = sorted(((h, kbps) for h, kbps in ladder.items() if h <= source_height), reverse=True)
+    if not rungs:
+        rungs = [(source_height - source_height % 2, min(ladder.values()))]
+    return rungs
+
+
+def build_command(
+    path: str,
+    out_dir: str,
+    ffmpeg: str,
+    rungs: List[Tuple[int, int]],
+    has_audio: bool,
+    audio_kbps: int,
+    segment_seconds: int,
+    preset: str,
+) -> List[str]:
+    splits = "".join(f"[s{i}]" for i in range(len(rungs)))
+    filters = [f"[0:v:0]split={len(rungs)}{splits}"]
+    filters += [f"[s{i}]scale=-2:{height}[v{i}]" for i, (height, _) in enumerate(rungs)]
+
+    command = [ffmpeg, "-nostdin", "-v", "error", "-y", "-i", path, "-filter_complex", ";".join(filters)]
+    stream_map = []
+    for i, (_, kbps) in enumerate(rungs):
+        command += [
+            "-map", f"[v{i}]",
+            f"-c:v:{i}", "libx264", f"-b:v:{i}", f"{kbps}k",
+            f"-maxrate:v:{i}", f"{kbps * 107 // 100}k", f"-bufsize:v:{i}", f"{kbps * 3 // 2}k",
+        ]
+        if has_audio:
+            command += ["-map", "0:a:0"]
+            stream_map.append(f"v:{i},a:{i}")
+        else:
+            stream_map.append(f"v:{i}")
+    if has_audio:
+        command += ["-c:a", "aac", "-b:a", f"{audio_kbps}k", "-ac", "2"]
+    command += [
+        "-preset", preset, "-pix_fmt", "yuv420p",
+        # Keyframes on segment boundaries so every rendition switches cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_flags", "independent_segments",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", os.path.join(out_dir, "v%v", "seg_%05d.m4s"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(out_dir, "v%v", "index.m3u8"),
+    ]
+    return command
+
+
+def package_hls(
+    path: str,
+    target_dir: str,
+    ffmpeg: str,
+    ladder: Dict[int, int],
+    audio_kbps: int,
+    segment_seconds: int,
+    preset: str,
+) -> Dict[str, List[int]]:
+    """
+    Packages `path` into `target_dir`, a directory that must not exist yet; it
+    appears only once complete. Returns the rendition heights, tallest first.
+    """
+    size, has_audio = probe_streams(path, ffmpeg)
+    if not size:
+        raise RuntimeError("no video stream")
+    rungs = plan_ladder(size[1], ladder)
+
+    # Built under a hidden name (skipped by the storage scanner), then renamed into place
+    parent, name = os.path.split(target_dir)
+    tmp_dir = os.path.join(parent, f".{name}.{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        command = build_command(path, tmp_dir, ffmpeg, rungs, has_audio, audio_kbps, segment_seconds, preset)
+        for i in range(len(rungs)):
+            os.makedirs(os.path.join(tmp_dir, f"v{i}"))
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0 or not os.path.exists(os.path.join(tmp_dir, MASTER_PLAYLIST)):
+            message = result.stderr[-500:].decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with {result.returncode}: {message}")
+        os.rename(tmp_dir, target_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {"renditions": [height for height, _ in rungs]}
@@ -0,0 +1,273 @@
+"""
+Persistent queue for long-running admin operations.
+
+An endpoint queues a Job row and answers 202 with it; clients follow it at
+/jobs/{id}. The runner claims due rows with a lease, runs them within the
+concurrency limit of their type, records progress and the result, and retries
+failures with exponential backoff. It runs in the leader worker only, so the
+limits hold across all workers; jobs of a leader that died are picked up again
+once their lease runs out.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.telemetry import job_duration, tracer
+from app.models.job import Job
+
+logger = structlog.get_logger()
+
+ACTIVE = ("pending", "running")
+FINISHED = ("done", "failed")
+MAX_RETRY_DELAY = timedelta(hours=1)
+# Progress reports closer together than this are skipped; the result supersedes them anyway
+PROGRESS_INTERVAL_SECONDS = 1.0
+PURGE_INTERVAL = timedelta(hours=1)
+CLAIM_BATCH_SIZE = 100
+
+
+def retry_delay(attempts: int) -> timedelta:
+    # Capped in seconds: a timedelta of the uncapped value overflows after a few dozen attempts
+    seconds = settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, MAX_RETRY_DELAY.total_seconds()))
+
+
+def lease_until() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+class JobContext:
+    """Handed to a handler: the job's parameters, and a way to publish progress."""
+
+    def __init__(self, job: Job):
+        self.id = job.id
+        self.params = job.params
+        self.attempt = job.attempts
+        self._reported_at = 0.0
+
+    async def report(self, progress: dict) -> None:
+        now = time.monotonic()
+        if now - self._reported_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        async with AsyncSession(async_engine) as session:
+            await session.exec(
+                update(Job).where(Job.id == self.id, Job.status == "running").values(progress=progress)
+            )
+            await session.commit()
+
+
+Handler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+
+@dataclass
+class JobType:
+    handler: Handler
+    concurrency: int
+    max_attempts: int
+
+
+async def latest_job(session: AsyncSession, job_type: str) -> Optional[Job]:
+    statement = select(Job).where(Job.type == job_type).order_by(Job.created_at.desc()).limit(1)
+    return (await session.exec(statement)).first()
+
+
+class JobRunner:
+    """
+    Registry of job types and the background task that runs them. Handlers
+    register with `@job_runner.register(type)` and return the job's result.
+    """
+
+    def __init__(self):
+        self.types: Dict[str, JobType] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # job id -> (type, task) for the jobs this process is running
+        self._running: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._renewed_at = 0.0
+        self._purged_at: Optional[datetime] = None
+
+    def register(self, job_type: str, concurrency: int = 1, max_attempts: int = 3) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self.types[job_type] = JobType(handler, concurrency, max_attempts)
+            return handler
+        return decorator
+
+    async def _active(self, session: AsyncSession, dedup_key: str) -> Optional[Job]:
+        statement = select(Job).where(Job.dedup_key == dedup_key, Job.status.in_(ACTIVE))
+        return (await session.exec(statement)).first()
+
+    async def enqueue(self, session: AsyncSession, job_type: str, params: Optional[dict] = None, dedupe: bool = True) -> Tuple[Job, bool]:
+        """
+        Queues a job and commits. With `dedupe`, a pending or running job of the
+        same type and parameters is returned instead; `created` tells which.
+        """
+        params = params or {}
+        dedup_key = f"{job_type}:{json.dumps(params, sort_keys=True)}" if dedupe else None
+        if dedup_key:
+            existing = await self._active(session, dedup_key)
+            if existing:
+                return existing, False
+
+        job = Job(type=job_type, params=params, dedup_key=dedup_key, max_attempts=self.types[job_type].max_attempts)
+        session.add(job)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # The unique index on active dedup keys: another request queued it meanwhile
+            await session.rollback()
+            existing = await self._active(session, dedup_key) if dedup_key else None
+            if existing is None:
+                raise
+            return existing, False
+        self.notify()
+        return job, True
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        tasks = [task for _, task in self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                    await self._renew_leases(session)
+                    await self._purge(session)
+                    for job in await self._claim(session):
+                        task = asyncio.create_task(self._execute(job))
+                        self._running[job.id] = (job.type, task)
+            except Exception as e:
+                logger.error(f"Job runner pass failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _renew_leases(self, session: AsyncSession) -> None:
+        if not self._running or time.monotonic() - self._renewed_at < settings.JOB_LEASE_SECONDS / 4:
+            return
+        await session.exec(
+            update(Job).where(Job.id.in_(list(self._running)), Job.status == "running")
+            .values(next_attempt_at=lease_until())
+        )
+        await session.commit()
+        self._renewed_at = time.monotonic()
+
+    async def _purge(self, session: AsyncSession) -> None:
+        now = datetime.utcnow()
+        if self._purged_at and now - self._purged_at < PURGE_INTERVAL:
+            return
+        cutoff = now - timedelta(days=settings.JOB_RETENTION_DAYS)
+        await session.exec(delete(Job).where(Job.status.in_(FINISHED), Job.finished_at < cutoff))
+        await session.commit()
+        self._purged_at = now
+
+    async def _claim(self, session: AsyncSession) -> List[Job]:
+        free = {job_type: kind.concurrency for job_type, kind in self.types.items()}
+        for job_type, _ in self._running.values():
+            free[job_type] -= 1
+        free = {job_type: slots for job_type, slots in free.items() if slots > 0}
+        if not free:
+            return []
+
+        now = datetime.utcnow()
+        # Running rows are due when their lease ran out: the worker running them is gone
+        due = (Job.type.in_(list(free)), Job.status.in_(ACTIVE), Job.next_attempt_at <= now)
+        candidates = (await session.exec(
+            select(Job.id, Job.type).where(*due, Job.id.not_in(list(self._running)))
+            .order_by(Job.next_attempt_at).limit(CLAIM_BATCH_SIZE)
+        )).all()
+        chosen = []
+        for job_id, job_type in candidates:
+            if free[job_type] > 0:
+                free[job_type] -= 1
+                chosen.append(job_id)
+        if not chosen:
+            return []
+
+        lease = lease_until()
+        await session.exec(
+            update(Job).where(Job.id.in_(chosen), *due)
+            .values(status="running", attempts=Job.attempts + 1, started_at=now, next_attempt_at=lease)
+        )
+        await session.commit()
+        claimed = (await session.exec(
+            select(Job).where(Job.id.in_(chosen), Job.next_attempt_at == lease)
+        )).all()
+
+        runnable = []
+        for job in claimed:
+            if job.attempts > job.max_attempts:
+                # Its last attempt was cut short by a lost worker
+                job.status = "failed"
+                job.error = job.error or "Worker stopped while running the job"
+                job.finished_at = now
+                session.add(job)
+            else:
+                runnable.append(job)
+        await session.commit()
+        return runnable
+
+    async def _finish(self, job_id: str, **values) -> None:
+        async with AsyncSession(async_engine) as session:
+            await session.exec(update(Job).where(Job.id == job_id, Job.status == "running").values(**values))
+            await session.commit()
+
+    async def _execute(self, job: Job) -> None:
+        kind = self.types[job.type]
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            with tracer.start_as_current_span(f"job {job.type}") as span:
+                span.set_attributes({"job.id": job.id, "job.attempt": job.attempts})
+                result = await kind.handler(JobContext(job))
+            outcome = "done"
+            await self._finish(job.id, status="done", result=result or {}, error=None, finished_at=datetime.utcnow())
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without counting the attempt
+            outcome = "cancelled"
+            await self._finish(job.id, status="pending", attempts=job.attempts - 1, next_attempt_at=datetime.utcnow())
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Job {job.id} ({job.type}) failed on attempt {job.attempts}: {error}")
+            now = datetime.utcnow()
+            if job.attempts < job.max_attempts:
+                await self._finish(job.id, status="pending", error=error, next_attempt_at=now + retry_delay(job.attempts))
+            else:
+                await self._finish(job.id, status="failed", error=error, finished_at=now)
+        finally:
+            job_duration.record(time.perf_counter() - started, {"job.type": job.type, "outcome": outcome})
+            self._running.pop(job.id, None)
+            # A slot is free: start whatever is queued behind this job
+            self.notify()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.locks import FileLock
+
+logger = structlog.get_logger()
+
+
+class LeaderElection:
+    """
+    Picks the one worker process that runs the singleton background jobs: the
+    one holding the lock file. The other workers retry now and then, so the
+    role moves on when the leader exits.
+    """
+
+    def __init__(self, lock_path: str, retry_seconds: float = 10.0):
+        self._lock = FileLock(lock_path)
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock.held
+
+    def start(self, on_elected: Callable[[], Awaitable[None]]) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(on_elected))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._lock.release()
+
+    async def _run(self, on_elected: Callable[[], Awaitable[None]]) -> None:
+        while not self._lock.acquire(blocking=False):
+            await asyncio.sleep(self.retry_seconds)
+        logger.info("This worker runs the background jobs")
+        try:
+            await on_elected()
+        except Exception as e:
+            logger.error(f"Starting background jobs failed: {e}")
+
+
+leader = LeaderElection(settings.BACKGROUND_LOCK_FILE)
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.library import LibraryState, MediaTombstone
+from app.models.media import Media, MediaRead
+
+VERSION_KEY = "library_version"
+SNAPSHOT_FIELDS = list(MediaRead.model_fields)
+
+
+def _bump_version(session: OrmSession) -> int:
+    """
+    Bumps the library version once per transaction and returns it; later calls
+    in the same transaction reuse the number.
+    """
+    if VERSION_KEY in session.info:
+        return session.info[VERSION_KEY]
+    connection = session.connection()
+    result = connection.execute(
+        update(LibraryState).where(LibraryState.id == 1).values(version=LibraryState.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(LibraryState.__table__.insert().values(id=1, version=1, pruned_version=0))
+    version = connection.execute(select(LibraryState.version).where(LibraryState.id == 1)).scalar_one()
+    session.info[VERSION_KEY] = version
+    return version
+
+
+async def next_version(session: AsyncSession) -> int:
+    """Version to stamp on rows changed by bulk (Core) statements in this transaction."""
+    return await session.run_sync(_bump_version)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _stamp_media_changes(session: OrmSession, flush_context, instances) -> None:
+    # ORM-level adds/edits/deletes of Media are versioned automatically
+    new = [obj for obj in session.new if isinstance(obj, Media)]
+    dirty = [obj for obj in session.dirty if isinstance(obj, Media) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Media)]
+    if not (new or dirty or deleted):
+        return
+
+    version = _bump_version(session)
+    for media in new + dirty:
+        media.version = version
+    connection = session.connection()
+    for media in deleted:
+        # Core statements: adding ORM objects mid-flush would need another flush
+        connection.execute(delete(MediaTombstone).where(MediaTombstone.media_id == media.id))
+        connection.execute(
+            MediaTombstone.__table__.insert().values(media_id=media.id, version=version, deleted_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(OrmSession, "after_commit")
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_version(session: OrmSession) -> None:
+    session.info.pop(VERSION_KEY, None)
+
+
+async def get_state(session: AsyncSession) -> LibraryState:
+    state = await session.get(LibraryState, 1)
+    return state or LibraryState(id=1, version=0, pruned_version=0)
+
+
+async def prune_tombstones(session: AsyncSession) -> None:
+    """Drops tombstones older than the retention window. The caller commits."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.LIBRARY_TOMBSTONE_RETENTION_DAYS)
+    newest_pruned = (await session.exec(
+        select(MediaTombstone.version).where(MediaTombstone.deleted_at < cutoff)
+        .order_by(MediaTombstone.version.desc()).limit(1)
+    )).first()
+    if newest_pruned is None:
+        return
+    await session.exec(delete(MediaTombstone).where(MediaTombstone.version <= newest_pruned))
+    await session.exec(update(LibraryState).where(LibraryState.id == 1).values(pruned_version=newest_pruned))
+
+
+def _rows_to_dicts(rows) -> list:
+    return [dict(zip(SNAPSHOT_FIELDS, row)) for row in rows]
+
+
+async def snapshot(session: AsyncSession, since: Optional[int] = None) -> dict:
+    """
+    Full library (videos, audio and their links) or, with `since`, only the
+    rows added/changed and the ids deleted after that version.
+    """
+    state = await get_state(session)
+    columns = [getattr(Media, name) for name in SNAPSHOT_FIELDS]
+
+    if since is not None and state.pruned_version <= since <= state.version:
+        changed = _rows_to_dicts((await session.exec(
+            select(*columns).where(Media.version > since).order_by(Media.id)
+        )).all())
+        deleted = (await session.exec(
+            select(MediaTombstone.media_id).where(MediaTombstone.version > since)
+        )).all()
+        return {"version": state.version, "since": since, "full": False, "changed": changed, "deleted": list(deleted)}
+
+    rows = _rows_to_dicts((await session.exec(
+        select(*columns).order_by(Media.created_at.desc(), Media.id.desc())
+    )).all())
+    return {
+        "version": state.version,
+        "full": True,
+        "videos": [row for row in rows if row["media_type"] == "video"],
+        "audio": [row for row in rows if row["media_type"] == "audio"],
+    }
@@ -0,0 +1,275 @@
+import mimetypes
+import os
+import secrets
+import stat as stat_module
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+
+# HLS playlists and fMP4 segments (not in every platform's mime table)
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/iso.segment", ".m4s")
+
+# Chunk size used when the server cannot do zero-copy sendfile
+CHUNK_SIZE = 256 * 1024
+
+ByteRange = Tuple[int, int]  # inclusive (start, end)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition for a download, safe for any filename (RFC 6266 / 5987)."""
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def make_etag(st: os.stat_result, content_hash: Optional[str] = None) -> str:
+    """
+    Strong validator for a media file.
+    Uses the stored content hash when we have one, otherwise size + mtime.
+    """
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_list(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag (RFC 9110 13.1.2)."""
+    if if_none_match is None:
+        return False
+    tags = _etag_list(if_none_match)
+    return "*" in tags or _strip_weak(etag) in (_strip_weak(t) for t in tags)
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def parse_range_header(header: str, size: int) -> List[ByteRange]:
+    """
+    Parses a `Range: bytes=...` header into sorted, merged inclusive ranges.
+    Returns an empty list if the header is malformed (caller serves the full file).
+    Raises RangeNotSatisfiable if no range overlaps the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return []
+
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_s, sep, end_s = part.partition("-")
+        if not sep:
+            return []
+        try:
+            if start_s == "":
+                # Suffix range: last N bytes
+                length = int(end_s)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(start_s)
+                end = int(end_s) if end_s else size - 1
+        except ValueError:
+            return []
+        if start >= size:
+            continue
+        if end < start:
+            return []
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Merge overlapping / adjacent ranges so clients can't make us send bytes twice
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class MediaFileResponse(Response):
+    """
+    Serves a file (or byte ranges of it) from disk.
+    Uses the ASGI zero-copy extension when the server offers it, otherwise
+    streams the requested ranges in chunks from a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        file_size: int,
+        content_type: str,
+        ranges: Optional[List[ByteRange]] = None,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+        send_body: bool = True,
+    ) -> None:
+        self.path = path
+        self.status_code = status_code
+        self.background = None
+        self.send_body = send_body
+        self.ranges = ranges or []
+        self.boundary = secrets.token_hex(16)
+        self.parts: List[Tuple[bytes, int, int]] = []
+
+        if len(self.ranges) > 1:
+            # multipart/byteranges: precompute each part header
+            for start, end in self.ranges:
+                part_header = (
+                    f"--{self.boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((part_header, start, end - start + 1))
+            self.trailer = f"\r\n--{self.boundary}--\r\n".encode("latin-1")
+            content_length = sum(len(h) + n for h, _, n in self.parts)
+            content_length += 2 * (len(self.parts) - 1) + len(self.trailer)
+            self.media_type = f"multipart/byteranges; boundary={self.boundary}"
+        elif self.ranges:
+            start, end = self.ranges[0]
+            self.parts.append((b"", start, end - start + 1))
+            self.trailer = b""
+            content_length = end - start + 1
+            self.media_type = content_type
+        else:
+            self.parts.append((b"", 0, file_size))
+            self.trailer = b""
+            content_length = file_size
+            self.media_type = content_type
+
+        self.init_headers(headers)
+        self.headers["content-length"] = str(content_length)
+        self.headers["content-type"] = self.media_type
+        if len(self.ranges) == 1:
+            start, end = self.ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for index, (part_header, offset, count) in enumerate(self.parts):
+                prefix = (b"\r\n" if index else b"") + part_header
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zerocopy:
+                    await send(
+                        {
+                            "type": "http.response.zerocopy",
+                            "file": file.wrapped.fileno(),
+                            "offset": offset,
+                            "count": count,
+                            "more_body": True,
+                        }
+                    )
+                    continue
+                await file.seek(offset)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+
+
+def build_media_response(
+    request: Request, path: str, content_hash: Optional[str] = None, cache_control: Optional[str] = None
+) -> Response:
+    """
+    Evaluates conditional and range headers for a media file and returns the
+    matching 200 / 206 / 304 / 416 response. `cache_control` overrides the
+    default media caching policy.
+    """
+    st = os.stat(path)
+    if not stat_module.S_ISREG(st.st_mode):
+        raise FileNotFoundError(path)
+
+    size = st.st_size
+    etag = make_etag(st, content_hash)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        "cache-control": cache_control or f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}",
+    }
+
+    # Conditional GET: If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        since = _parse_http_date(if_modified_since) if if_modified_since else None
+        if since is not None and int(st.st_mtime) <= since:
+            return Response(status_code=304, headers=headers)
+
+    send_body = request.method != "HEAD"
+    range_header = request.headers.get("range")
+    if range_header and request.method == "GET":
+        # If-Range: only honour the range if the representation is unchanged
+        if_range = request.headers.get("if-range")
+        if if_range:
+            if if_range.startswith('"') or if_range.startswith("W/"):
+                range_valid = if_range == etag  # strong comparison only
+            else:
+                range_valid = if_range == last_modified
+            if not range_valid:
+                range_header = None
+
+    if range_header and request.method == "GET":
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if ranges:
+            return MediaFileResponse(
+                path, size, content_type, ranges=ranges, status_code=206, headers=headers
+            )
+
+    return MediaFileResponse(path, size, content_type, headers=headers, send_body=send_body)
@@ -0,0 +1,171 @@
+"""
+Header and tag parsing for media files. Runs inside the analysis process pool,
+so this module deliberately imports nothing from the app (no settings, no DB).
+"""
+import io
+import re
+import struct
+import urllib.request
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import mutagen
+from mutagen.mp4 import Atoms, MP4StreamInfoError
+
+# Easy-tag keys copied into the result, first value only
+TAG_KEYS = ("title", "artist", "album", "genre")
+# Ranged reads of remote files: block size, and how many blocks are kept
+HTTP_BLOCK_SIZE = 256 * 1024
+HTTP_CACHED_BLOCKS = 16
+HTTP_TIMEOUT_SECONDS = 30
+
+
+def _first(tags, key: str) -> Optional[str]:
+    values = tags.get(key) if tags else None
+    if not values:
+        return None
+    value = str(values[0]).strip()
+    return value or None
+
+
+def _audio_codec(audio) -> Optional[str]:
+    info = audio.info
+    if hasattr(info, "codec"):
+        # MP4: e.g. "mp4a.40.2", "alac"; empty when there is no audio track
+        return info.codec or None
+    name = type(info).__name__ # MPEGInfo, FLACStreamInfo, OggVorbisInfo, ...
+    if name == "MPEGInfo":
+        return f"mp{info.layer}"
+    for suffix in ("StreamInfo", "Info"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return name.lower().replace("ogg", "") or None
+
+
+def mp4_video_codec(fileobj: BinaryIO) -> Optional[str]:
+    """
+    Sample-entry type (avc1, hvc1, av01, ...) of the first video track, read from
+    moov/trak/mdia/{hdlr,minf/stbl/stsd}. mutagen only describes the audio track.
+    """
+    try:
+        atoms = Atoms(fileobj)
+        moov = atoms[b"moov"]
+    except (KeyError, MP4StreamInfoError, struct.error, ValueError):
+        return None
+    for trak in moov.findall(b"trak"):
+        try:
+            ok, hdlr = trak[b"mdia", b"hdlr"].read(fileobj)
+            if not ok or hdlr[8:12] != b"vide":
+                continue
+            ok, stsd = trak[b"mdia", b"minf", b"stbl", b"stsd"].read(fileobj)
+        except KeyError:
+            continue
+        if ok and len(stsd) >= 16:
+            return stsd[12:16].decode("latin-1").strip() or None
+    return None
+
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Read-only, seekable view of a URL through HTTP Range requests, for parsers
+    that only look at a few regions of a large file (headers, tags, the MP4
+    moov box). Recently read blocks are cached.
+    """
+
+    def __init__(self, url: str, block_size: int = HTTP_BLOCK_SIZE):
+        super().__init__()
+        self.url = url
+        self.block_size = block_size
+        self.size = 0
+        self._position = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._whole: Optional[bytes] = None
+        self._fetch(0)
+
+    def _fetch(self, index: int) -> bytes:
+        if self._whole is not None:
+            return self._whole[index * self.block_size:(index + 1) * self.block_size]
+        if index in self._blocks:
+            self._blocks.move_to_end(index)
+            return self._blocks[index]
+        start = index * self.block_size
+        request = urllib.request.Request(self.url, headers={"Range": f"bytes={start}-{start + self.block_size - 1}"})
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS) as response:
+            data = response.read()
+            if response.status == 200:
+                # The server ignored the range and sent everything
+                self._whole, self.size = data, len(data)
+                return self._fetch(index)
+            total = re.search(r"/(\d+)$", response.headers.get("Content-Range", ""))
+            if total:
+                self.size = int(total.group(1))
+        self._blocks[index] = data
+        if len(self._blocks) > HTTP_CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        written = 0
+        while written < len(view) and self._position < self.size:
+            index, offset = divmod(self._position, self.block_size)
+            chunk = self._fetch(index)[offset:offset + len(view) - written]
+            if not chunk:
+                break
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._position += len(chunk)
+        return written
+
+
+def probe_file(source: Union[str, BinaryIO]) -> Dict[str, Any]:
+    """
+    Duration, bitrate, sample rate, channels, codecs and basic tags of a media
+    file, given as a path or a seekable file object. Unknown formats give an
+    empty dict; unreadable files raise.
+    """
+    audio = mutagen.File(source, easy=True)
+    if audio is None:
+        return {}
+
+    info = audio.info
+    result: Dict[str, Any] = {
+        "duration": round(info.length, 3) if getattr(info, "length", None) else None,
+        "bitrate": getattr(info, "bitrate", None) or None,
+        "sample_rate": getattr(info, "sample_rate", None) or None,
+        "channels": getattr(info, "channels", None) or None,
+        "audio_codec": _audio_codec(audio),
+        "video_codec": None,
+    }
+    for key in TAG_KEYS:
+        result[key] = _first(audio.tags, key)
+
+    if type(audio).__name__ in ("MP4", "EasyMP4"):
+        if isinstance(source, str):
+            with open(source, "rb") as fileobj:
+                result["video_codec"] = mp4_video_codec(fileobj)
+        else:
+            source.seek(0)
+            result["video_codec"] = mp4_video_codec(source)
+    return result
+
+
+def probe_url(url: str) -> Dict[str, Any]:
+    """probe_file for a file behind a URL that honours Range, without downloading all of it."""
+    with HttpRangeFile(url) as fileobj:
+        return probe_file(fileobj)
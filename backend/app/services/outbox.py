@@ -0,0 +1,216 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import aiosmtplib
+import structlog
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.telemetry import smtp_send_duration, tracer
+from app.models.outbox import EmailOutbox
+from app.services.email import SmtpConfig, build_pin_email, get_smtp_config
+
+logger = structlog.get_logger()
+
+# Rows claimable by a worker: new ones, and sends whose lease ran out
+CLAIMABLE = ["pending", "sending"]
+MAX_RETRY_DELAY = timedelta(hours=1)
+IDLE_POLL_SECONDS = 5.0
+
+
+class SmtpPool:
+    """
+    Up to `size` authenticated SMTP connections to one server, reused across
+    messages so a batch pays for the TCP/TLS handshake and login once per
+    connection rather than once per recipient. The size also caps concurrency.
+    """
+
+    def __init__(self, config: SmtpConfig, size: int):
+        self.config = config
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.config.host,
+            port=self.config.port,
+            username=self.config.user,
+            password=self.config.password,
+            use_tls=self.config.use_tls,
+        )
+        await client.connect()
+        return client
+
+    async def send(self, sender: str, recipient: str, message: bytes) -> None:
+        async with self._slots:
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                with tracer.start_as_current_span("smtp.send") as span:
+                    await self._send(sender, recipient, message, span)
+                outcome = "sent"
+            finally:
+                smtp_send_duration.record(time.perf_counter() - started, {"outcome": outcome})
+
+    async def _send(self, sender: str, recipient: str, message: bytes, span) -> None:
+        client = self._idle.pop() if self._idle else None
+        reused = client is not None and client.is_connected
+        span.set_attribute("smtp.connection_reused", reused)
+        if not reused:
+            client = await self._connect()
+        try:
+            try:
+                await client.sendmail(sender, [recipient], message)
+            except aiosmtplib.SMTPServerDisconnected:
+                if not reused:
+                    raise
+                # An idle connection the server dropped; one fresh attempt
+                client = await self._connect()
+                await client.sendmail(sender, [recipient], message)
+        except Exception:
+            client.close()
+            raise
+        self._idle.append(client)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+async def enqueue_pin_email(session: AsyncSession, guest_id: Optional[int], email_to: str, pin: str, guest_name: Optional[str] = None) -> EmailOutbox:
+    """Queues an invitation; the caller commits, then wakes the worker with `email_worker.notify()`."""
+    item = EmailOutbox(guest_id=guest_id, email_to=email_to, pin=pin, guest_name=guest_name)
+    session.add(item)
+    return item
+
+
+class EmailWorker:
+    """
+    Background task draining the EmailOutbox table. Rows are claimed in batches
+    with a lease, so several app workers can share one outbox, and sent through
+    an SmtpPool. Failures are retried with exponential backoff up to
+    EMAIL_MAX_ATTEMPTS, after which the row is marked failed.
+    """
+
+    def __init__(self):
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._pool: Optional[SmtpPool] = None
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_pool()
+
+    async def _close_pool(self) -> None:
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.process_batch()
+            except Exception as e:
+                logger.error(f"Email outbox batch failed: {e}")
+                processed = 0
+            if processed:
+                continue
+            # Nothing due: let connections go rather than keep them idle
+            await self._close_pool()
+            try:
+                await asyncio.wait_for(self._wake.wait(), IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, session: AsyncSession) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=settings.EMAIL_LEASE_SECONDS)
+        due = (EmailOutbox.status.in_(CLAIMABLE), EmailOutbox.next_attempt_at <= now)
+        candidates = (await session.exec(
+            select(EmailOutbox.id).where(*due).order_by(EmailOutbox.next_attempt_at).limit(settings.EMAIL_BATCH_SIZE)
+        )).all()
+        if not candidates:
+            return []
+        # Conditional update: rows another worker claimed meanwhile no longer match `due`
+        await session.exec(
+            update(EmailOutbox).where(EmailOutbox.id.in_(candidates), *due)
+            .values(status="sending", next_attempt_at=lease_until)
+        )
+        await session.commit()
+        return (await session.exec(
+            select(EmailOutbox).where(EmailOutbox.id.in_(candidates), EmailOutbox.next_attempt_at == lease_until)
+        )).all()
+
+    async def _deliver(self, config: SmtpConfig, item: EmailOutbox) -> Optional[str]:
+        """Sends one row; returns the error message, or None on success."""
+        if not config.host:
+            logger.info(f"SMTP not configured. Mock Email to {item.email_to}: PIN={item.pin} (Link: {config.link_url})")
+            return None
+        try:
+            message = build_pin_email(config, item.email_to, item.pin or "", item.guest_name)
+            await self._pool.send(config.sender_address, item.email_to, message)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to send email to {item.email_to} via {config.host}: {e}")
+            return str(e) or type(e).__name__
+
+    async def process_batch(self) -> int:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            items = await self._claim(session)
+            if not items:
+                return 0
+
+            config = await get_smtp_config()
+            if config.host and (self._pool is None or self._pool.config != config):
+                await self._close_pool()
+                self._pool = SmtpPool(config, settings.SMTP_POOL_SIZE)
+
+            errors = await asyncio.gather(*(self._deliver(config, item) for item in items))
+
+            now = datetime.utcnow()
+            for item, error in zip(items, errors):
+                item.attempts += 1
+                if error is None:
+                    item.status = "sent" if config.host else "logged"
+                    item.sent_at = now
+                    item.pin = None
+                    item.last_error = None
+                elif item.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    item.status = "failed"
+                    item.last_error = error
+                else:
+                    item.status = "pending"
+                    item.last_error = error
+                    item.next_attempt_at = now + retry_delay(item.attempts)
+                session.add(item)
+            await session.commit()
+            return len(items)
+
+
+email_worker = EmailWorker()
@@ -0,0 +1,158 @@
+"""
+Waveform peaks for audio files. Like media_probe, this runs inside the
+analysis process pool and imports nothing from the app.
+
+A peaks file holds several resolutions of min/max pairs over mono audio:
+
+    header   "ERPK", u16 format version, u16 bits (8 or 16), u32 sample rate,
+             u32 level count
+    levels   u32 samples per peak, u32 peak count  (one entry per level)
+    data     each level's pairs in the same order: min0, max0, min1, max1, ...
+
+All integers are little-endian; samples are signed.
+"""
+import os
+import struct
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"ERPK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+LEVEL = struct.Struct("<II")
+# Samples per read from ffmpeg, in units of the finest level
+READ_BLOCKS = 4096
+
+
+@dataclass
+class PeaksLevel:
+    samples_per_peak: int
+    sample_rate: int
+    bits: int
+    data: bytes
+
+    @property
+    def count(self) -> int:
+        return len(self.data) // (2 * self.bits // 8)
+
+
+def _reduce(samples: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+    # One min/max pair per `block` samples; a short tail becomes its own pair
+    full = len(samples) - len(samples) % block
+    blocks = samples[:full].reshape(-1, block)
+    mins, maxs = blocks.min(axis=1), blocks.max(axis=1)
+    if full < len(samples):
+        tail = samples[full:]
+        mins = np.append(mins, tail.min())
+        maxs = np.append(maxs, tail.max())
+    return mins, maxs
+
+
+def _coarsen(values: np.ndarray, factor: int, reducer) -> np.ndarray:
+    # Edge padding repeats the last value, which leaves the tail's min/max unchanged
+    padded = np.pad(values, (0, -len(values) % factor), mode="edge")
+    return reducer(padded.reshape(-1, factor), axis=1)
+
+
+def decode_peaks(path: str, ffmpeg: str, sample_rate: int, base: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes `path` to mono 16-bit PCM with ffmpeg and reduces it to min/max
+    pairs of `base` samples as it streams, so memory stays flat for long files.
+    """
+    command = [
+        ffmpeg, "-nostdin", "-v", "error", "-i", path,
+        "-map", "0:a:0", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-",
+    ]
+    mins: List[np.ndarray] = []
+    maxs: List[np.ndarray] = []
+    # stderr goes to a file: a corrupt input can log more than a pipe buffer holds
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        with process.stdout:
+            while chunk := process.stdout.read(base * READ_BLOCKS * 2):
+                samples = np.frombuffer(chunk[: len(chunk) - len(chunk) % 2], dtype="<i2")
+                if len(samples):
+                    low, high = _reduce(samples, base)
+                    mins.append(low)
+                    maxs.append(high)
+        if process.wait() != 0:
+            errors.seek(0)
+            message = errors.read()[-500:].decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {message}")
+    if not mins:
+        raise RuntimeError("no audio samples decoded")
+    return np.concatenate(mins), np.concatenate(maxs)
+
+
+def build_peaks(mins: np.ndarray, maxs: np.ndarray, sample_rate: int, levels: Sequence[int], bits: int) -> bytes:
+    """Encodes finest-level min/max arrays (at levels[0]) plus coarser levels into a peaks file."""
+    base = levels[0]
+    dtype = np.dtype("<i1") if bits == 8 else np.dtype("<i2")
+    shift = 16 - bits
+
+    index, data = [], []
+    for samples_per_peak in levels:
+        factor = samples_per_peak // base
+        low = _coarsen(mins, factor, np.min) if factor > 1 else mins
+        high = _coarsen(maxs, factor, np.max) if factor > 1 else maxs
+        pairs = np.empty(2 * len(low), dtype=dtype)
+        pairs[0::2] = low >> shift
+        pairs[1::2] = high >> shift
+        index.append(LEVEL.pack(samples_per_peak, len(low)))
+        data.append(pairs.tobytes())
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, bits, sample_rate, len(levels))
+    return header + b"".join(index) + b"".join(data)
+
+
+def write_peaks(path: str, target: str, ffmpeg: str, sample_rate: int, levels: Sequence[int], bits: int) -> int:
+    """
+    Computes the peaks of `path` and writes them to `target` atomically.
+    `levels` are samples per peak; each must be a multiple of the smallest.
+    Returns the file size.
+    """
+    levels = sorted(set(levels))
+    if any(level % levels[0] for level in levels):
+        raise ValueError(f"Peak levels must be multiples of {levels[0]}: {levels}")
+
+    mins, maxs = decode_peaks(path, ffmpeg, sample_rate, levels[0])
+    payload = build_peaks(mins, maxs, sample_rate, levels, bits)
+    # ".part" files are skipped by the storage scanner
+    tmp_path = f"{target}.{os.getpid()}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, target)
+    return len(payload)
+
+
+def read_level(path: str, resolution: Optional[int] = None) -> PeaksLevel:
+    """
+    Reads one level of a peaks file: the coarsest level with at least
+    `resolution` peaks (the finest one if none has that many, or if no
+    resolution is given). Only that level's bytes are read.
+    """
+    with open(path, "rb") as f:
+        magic, version, bits, sample_rate, level_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a peaks file: {path}")
+        levels = [LEVEL.unpack(f.read(LEVEL.size)) for _ in range(level_count)]
+
+        pair_size = 2 * bits // 8
+        offset = HEADER.size + LEVEL.size * level_count
+        offsets = []
+        for _, count in levels:
+            offsets.append(offset)
+            offset += count * pair_size
+
+        chosen = 0
+        if resolution:
+            for i, (_, count) in enumerate(levels):
+                if count >= resolution:
+                    chosen = i
+        samples_per_peak, count = levels[chosen]
+        f.seek(offsets[chosen])
+        return PeaksLevel(samples_per_peak, sample_rate, bits, f.read(count * pair_size))
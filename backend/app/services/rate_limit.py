@@ -0,0 +1,153 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Deque, List, Tuple, Union
+
+from sqlalchemy import delete, func, insert, select
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.rate_limit import RateLimitHit
+
+# (key, limit) pairs checked together; a request is only counted if all of them allow it
+Limits = List[Tuple[str, int]]
+
+
+class MemoryRateLimiter:
+    """
+    Sliding-window limiter. Each key keeps a ring buffer holding the timestamps of
+    its last `limit` hits, so a key costs at most `limit` floats; keys are kept
+    in an LRU bounded by `max_keys`.
+    """
+
+    def __init__(self, window: float, max_keys: int):
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _retry_after(self, hits: Deque[float], limit: int, now: float) -> float:
+        if len(hits) < limit:
+            return 0.0
+        # Full buffer: the oldest of the last `limit` hits must have left the window
+        return max(hits[0] + self.window - now, 0.0)
+
+    def _wait(self, limits: Limits, now: float) -> float:
+        wait = 0.0
+        for key, limit in limits:
+            hits = self._hits.get(key)
+            if hits is not None:
+                wait = max(wait, self._retry_after(hits, limit, now))
+        return wait
+
+    async def retry_after(self, limits: Limits) -> float:
+        """Seconds until every key allows another hit, without counting one."""
+        with self._lock:
+            return self._wait(limits, time.monotonic())
+
+    async def hit(self, limits: Limits) -> float:
+        """Counts a request against every key; returns seconds to wait (0 if allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            wait = self._wait(limits, now)
+            if wait:
+                return wait
+
+            for key, limit in limits:
+                hits = self._hits.get(key)
+                if hits is None or hits.maxlen != limit:
+                    hits = self._hits[key] = deque(hits or (), maxlen=limit)
+                hits.append(now)
+                self._hits.move_to_end(key)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+            return 0.0
+
+
+class DatabaseRateLimiter:
+    """
+    Same sliding windows, kept in the RateLimitHit table so every worker sees the
+    same counts. Each call is one short write transaction.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+
+    async def _wait(self, connection, limits: Limits, now: float) -> float:
+        wait = 0.0
+        for key, limit in limits:
+            count, oldest = (await connection.execute(
+                select(func.count(), func.min(RateLimitHit.hit_at))
+                .where(RateLimitHit.key == key, RateLimitHit.hit_at >= now - self.window)
+            )).one()
+            if count >= limit:
+                wait = max(wait, oldest + self.window - now)
+        return max(wait, 0.0)
+
+    async def retry_after(self, limits: Limits) -> float:
+        async with async_engine.connect() as connection:
+            return await self._wait(connection, limits, time.time())
+
+    async def hit(self, limits: Limits) -> float:
+        now = time.time()
+        async with async_engine.begin() as connection:
+            # Delete first: on SQLite this takes the write lock before we count
+            await connection.execute(delete(RateLimitHit).where(RateLimitHit.hit_at < now - self.window))
+            wait = await self._wait(connection, limits, now)
+            if wait:
+                return wait
+            await connection.execute(insert(RateLimitHit), [{"key": key, "hit_at": now} for key, _ in limits])
+            return 0.0
+
+
+def make_limiter():
+    window = settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+    if settings.RATE_LIMIT_BACKEND == "database":
+        return DatabaseRateLimiter(window)
+    return MemoryRateLimiter(window, settings.RATE_LIMIT_MAX_KEYS)
+
+
+login_limiter = make_limiter()
+
+
+def login_limits(client_ip: str) -> Limits:
+    """Counted for every login attempt."""
+    return [(f"login:ip:{client_ip}", settings.LOGIN_RATE_LIMIT_PER_IP)]
+
+
+def failed_login_limits() -> Limits:
+    """Counted for wrong PINs only, so guests logging in do not use up the budget."""
+    return [("login:global", settings.LOGIN_RATE_LIMIT_GLOBAL)]
+
+
+@lru_cache(maxsize=4)
+def _trusted_networks(proxies: Tuple[str, ...]) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def client_ip(request: Request) -> str:
+    """
+    The address of the client behind our own proxies. X-Forwarded-For is read
+    from the nearest hop backwards, and only while the hop is a trusted proxy:
+    entries the client wrote itself sit further left and are never reached.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not settings.TRUSTED_PROXIES or not _is_trusted(address):
+        return address
+    forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if not _is_trusted(hop):
+            break
+    return address
@@ -0,0 +1,230 @@
+import mimetypes
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import anyio
+import structlog
+from sqlmodel import delete, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine
+from app.core.telemetry import scan_duration, scan_files, tracer
+from app.models.media import Media
+from app.models.storage_file import StorageFile
+from app.services.jobs import JobContext, job_runner
+from app.services.library import next_version
+from app.services.storage import DERIVED_SUFFIXES, backend, media_url
+from app.services.storage_backends import FileStat, StorageBackend
+
+logger = structlog.get_logger()
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.avi', '.mkv')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a', '.flac', '.aac')
+
+# Media.file_state values set by the scanner (None means the file is fine)
+FILE_MISSING = "missing"
+FILE_CHANGED = "changed"
+
+SCAN_JOB = "storage.scan"
+Report = Callable[[dict], Awaitable[None]]
+
+def detect_media_type(filename: str) -> Optional[str]:
+    lower_name = filename.lower()
+    if lower_name.endswith(VIDEO_EXTENSIONS):
+        return 'video'
+    if lower_name.endswith(AUDIO_EXTENSIONS):
+        return 'audio'
+    guessed = mimetypes.guess_type(lower_name)[0] or ""
+    if guessed.startswith(("video/", "audio/")):
+        return guessed.split("/")[0]
+    return None
+
+
+def batched(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@dataclass
+class ScanProgress:
+    # None once the scan is complete
+    phase: Optional[str] = "listing"
+    files_on_disk: int = 0
+    unchanged: int = 0
+    processed: int = 0
+    to_process: int = 0
+    added: int = 0
+    changed: int = 0
+    missing: int = 0
+    restored: int = 0
+
+    @property
+    def message(self) -> str:
+        if self.phase is not None:
+            return f"Scan running ({self.phase}): {self.processed}/{self.to_process} files processed."
+        return (
+            f"Scan complete. Added {self.added} new files, "
+            f"{self.changed} changed, {self.missing} missing, {self.restored} restored."
+        )
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "message": self.message, "added_count": self.added}
+
+
+class StorageScanner:
+    """
+    Incremental scanner for the storage backend. Diffs its listing against the
+    StorageFile index and only touches the database for paths that were added,
+    changed or removed since the last scan. Runs as the "storage.scan" job.
+    """
+
+    def __init__(self, backend: StorageBackend, batch_size: int = 500):
+        self.backend = backend
+        self.batch_size = batch_size
+
+    async def _media_for_paths(self, session: AsyncSession, paths: List[str]) -> Dict[str, List[Media]]:
+        statement = select(Media).where(or_(Media.filename.in_(paths), Media.storage_path.in_(paths)))
+        by_path: Dict[str, List[Media]] = {}
+        for media in (await session.exec(statement)).all():
+            by_path.setdefault(media.storage_path or media.filename, []).append(media)
+        return by_path
+
+    async def scan(self, session: AsyncSession, progress: ScanProgress, report: Optional[Report] = None) -> ScanProgress:
+        """Updates `progress` in place, passing it to `report` after every committed batch."""
+        on_disk = await anyio.to_thread.run_sync(self.backend.list_files, DERIVED_SUFFIXES)
+        index: Dict[str, FileStat] = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in (await session.exec(
+                select(StorageFile.path, StorageFile.size, StorageFile.mtime_ns)
+            )).all()
+        }
+        first_scan = not index
+
+        new_paths = [path for path in on_disk if path not in index]
+        changed_paths = [path for path, stat in on_disk.items() if path in index and index[path] != stat]
+        gone_paths = [path for path in index if path not in on_disk]
+
+        progress.files_on_disk = len(on_disk)
+        progress.unchanged = len(on_disk) - len(new_paths) - len(changed_paths)
+        progress.to_process = len(new_paths) + len(changed_paths) + len(gone_paths)
+
+        progress.phase = "new files"
+        for batch in batched(new_paths, self.batch_size):
+            known = await self._media_for_paths(session, batch)
+            for path in batch:
+                size, mtime_ns = on_disk[path]
+                session.add(StorageFile(path=path, size=size, mtime_ns=mtime_ns))
+                for media in known.get(path, []):
+                    if media.file_state is not None:
+                        media.file_state = None
+                        session.add(media)
+                        progress.restored += 1
+                if path in known or os.sep in path:
+                    # Already tracked, or inside the blob tree (blobs always belong to a row)
+                    continue
+                media_type = detect_media_type(path)
+                if media_type:
+                    session.add(Media(
+                        filename=path,
+                        url=media_url(path),
+                        media_type=media_type,
+                        title=path, # Default title
+                        genre="Recovered", # Default genre
+                        size=size
+                    ))
+                    progress.added += 1
+            await session.commit()
+            progress.processed += len(batch)
+            if report:
+                await report(progress.as_dict())
+
+        progress.phase = "changed files"
+        for batch in batched(changed_paths, self.batch_size):
+            known = await self._media_for_paths(session, batch)
+            for path in batch:
+                size, mtime_ns = on_disk[path]
+                await session.exec(
+                    update(StorageFile).where(StorageFile.path == path)
+                    .values(size=size, mtime_ns=mtime_ns, indexed_at=datetime.utcnow())
+                )
+                for media in known.get(path, []):
+                    media.file_state = FILE_CHANGED
+                    media.size = size
+                    if not media.storage_path:
+                        # Content moved under us: the stored hash no longer applies. A blob
+                        # row keeps its hash, which names the Blob it holds a reference on
+                        media.sha256 = None
+                    media.analyzed_at = None
+                    media.peaks_at = None
+                    media.thumbnails_at = None
+                    media.hls_at = None
+                    session.add(media)
+                    progress.changed += 1
+            await session.commit()
+            progress.processed += len(batch)
+            if report:
+                await report(progress.as_dict())
+
+        progress.phase = "missing files"
+        for batch in batched(gone_paths, self.batch_size):
+            known = await self._media_for_paths(session, batch)
+            await session.exec(delete(StorageFile).where(StorageFile.path.in_(batch)))
+            for path in batch:
+                # Only rows stored at this path; a flat name can match a row since moved into a blob
+                for media in known.get(path, []):
+                    media.file_state = FILE_MISSING
+                    session.add(media)
+                    progress.missing += 1
+            await session.commit()
+            progress.processed += len(batch)
+            if report:
+                await report(progress.as_dict())
+
+        if first_scan:
+            # No index yet, so rows whose file vanished before it existed can't be
+            # found by diffing; check them once against the disk snapshot
+            progress.phase = "orphaned rows"
+            rows = (await session.exec(
+                select(Media.id, Media.filename, Media.storage_path).where(Media.file_state == None)  # noqa: E711
+            )).all()
+            orphaned = [media_id for media_id, filename, storage_path in rows
+                        if (storage_path or filename) not in on_disk]
+            for batch in batched(orphaned, self.batch_size):
+                await session.exec(
+                    update(Media).where(Media.id.in_(batch))
+                    .values(file_state=FILE_MISSING, version=await next_version(session))
+                )
+                progress.missing += len(batch)
+            await session.commit()
+
+        progress.phase = None
+        return progress
+
+
+scanner = StorageScanner(backend)
+
+
+@job_runner.register(SCAN_JOB)
+async def run_scan(job: JobContext) -> dict:
+    """One incremental scan; its counters are the job's progress and result."""
+    progress = ScanProgress()
+    started = time.perf_counter()
+    state = "failed"
+    try:
+        with tracer.start_as_current_span("storage.scan") as span:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await scanner.scan(session, progress, job.report)
+            span.set_attributes({"scan.files_on_disk": progress.files_on_disk, "scan.processed": progress.processed})
+        state = "done"
+    finally:
+        scan_duration.record(time.perf_counter() - started, {"state": state})
+    for outcome in ("added", "changed", "missing", "restored"):
+        scan_files.add(getattr(progress, outcome), {"outcome": outcome})
+    if progress.added or progress.changed:
+        # Imported here: the analyzer module depends on this one
+        from app.services.analysis import analyzer
+        analyzer.wake()
+    return progress.as_dict()
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+
+import structlog
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.settings import SystemSettings
+
+logger = structlog.get_logger()
+
+
+def _detached(row: SystemSettings) -> SystemSettings:
+    # A plain copy: safe to hand out after the loading session is gone
+    return SystemSettings.model_validate(row.model_dump())
+
+
+class SettingsCache:
+    """
+    Process-wide copy of the SystemSettings row.
+
+    Readers (login, email, the settings endpoint) get the cached copy without a
+    query. Writes in this process replace it directly via `set`; writes from other
+    workers bump `SystemSettings.version`, which a background task polls every
+    SETTINGS_CACHE_POLL_SECONDS and reloads the row when it moved.
+    """
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._settings: Optional[SystemSettings] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self) -> Optional[SystemSettings]:
+        """Cached settings, or None if no row has been saved yet."""
+        if not self._loaded:
+            await self.reload()
+        return self._settings
+
+    def set(self, row: Optional[SystemSettings]) -> None:
+        self._settings = _detached(row) if row else None
+        self._loaded = True
+
+    def invalidate(self) -> None:
+        self._loaded = False
+
+    async def reload(self) -> None:
+        async with self._lock:
+            async with AsyncSession(async_engine) as session:
+                self.set((await session.exec(select(SystemSettings))).first())
+
+    async def _current_version(self) -> Optional[int]:
+        async with AsyncSession(async_engine) as session:
+            return (await session.exec(select(SystemSettings.version))).first()
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cached = self._settings.version if self._settings else None
+                if not self._loaded or await self._current_version() != cached:
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"Settings cache refresh failed: {e}")
+
+    async def start(self) -> None:
+        await self.reload()
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+settings_cache = SettingsCache(settings.SETTINGS_CACHE_POLL_SECONDS)
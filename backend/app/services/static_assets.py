@@ -0,0 +1,220 @@
+"""
+Serving of the built SPA (index.html and the Vite bundles under assets/).
+
+The static directory is indexed once at startup, so the catch-all route is a
+dictionary lookup instead of filesystem checks. Compressible files are sent
+gzip or brotli encoded: prebuilt `.gz` / `.br` siblings are used when present,
+otherwise variants are built in the background on first request and kept in
+STATIC_COMPRESSED_CACHE_DIR.
+"""
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from typing import Dict, List, Optional, Set, Tuple
+
+import anyio
+import structlog
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.services.media_delivery import MediaFileResponse, etag_matches
+
+try:
+    import brotli
+except ImportError:  # optional extra; gzip only without it
+    brotli = None
+
+logger = structlog.get_logger()
+
+INDEX_HTML = "index.html"
+# Vite names bundles like assets/index-4f3a9c1b.js; the hash changes with the content
+HASHED_ASSET = re.compile(r"(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/wasm")
+MIN_COMPRESS_SIZE = 1024
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS: Dict[str, str] = {"br": ".br", "gzip": ".gz"}
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def available_encodings() -> List[str]:
+    return [encoding for encoding in ENCODINGS if encoding != "br" or brotli is not None]
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """Codings from Accept-Encoding with a non-zero q-value."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    if "*" in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+@dataclass
+class Variant:
+    path: str
+    size: int
+
+
+@dataclass
+class StaticAsset:
+    path: str
+    size: int
+    etag: str
+    last_modified: str
+    content_type: str
+    cache_control: str
+    compressible: bool
+    # Content-Encoding -> file, for the variants that exist on disk
+    variants: Dict[str, Variant] = field(default_factory=dict)
+
+
+class StaticIndex:
+    def __init__(self, root: str, cache_dir: str, exclude: Tuple[str, ...] = ()):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.exclude = exclude
+        self.assets: Dict[str, StaticAsset] = {}
+        self._building: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _cache_path(self, relpath: str, st: os.stat_result, encoding: str) -> str:
+        # Keyed by content identity so a redeploy never picks up a stale variant
+        key = hashlib.sha256(f"{relpath}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, key + ENCODINGS[encoding])
+
+    def build(self) -> None:
+        """Indexes the static directory and drops cached variants of files that no longer exist."""
+        assets: Dict[str, StaticAsset] = {}
+        expected_cache: Set[str] = set()
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(directory, d)) not in self.exclude]
+            for name in filenames:
+                if name.endswith(tuple(ENCODINGS.values())):
+                    continue  # prebuilt variants are attached to their source below
+                path = os.path.join(directory, name)
+                relpath = os.path.relpath(path, self.root).replace(os.sep, "/")
+                st = os.stat(path)
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if content_type.startswith("text/"):
+                    content_type += "; charset=utf-8"
+                asset = StaticAsset(
+                    path=path,
+                    size=st.st_size,
+                    etag=f'"{st.st_size:x}-{st.st_mtime_ns:x}"',
+                    last_modified=formatdate(st.st_mtime, usegmt=True),
+                    content_type=content_type,
+                    cache_control=IMMUTABLE_CACHE if HASHED_ASSET.search(relpath) else "no-cache",
+                    compressible=st.st_size >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES),
+                )
+                if asset.compressible:
+                    # Prebuilt siblings win over our cache; both count only if not older than the source
+                    for encoding, suffix in ENCODINGS.items():
+                        cached = self._cache_path(relpath, st, encoding)
+                        expected_cache.add(cached)
+                        for candidate in (path + suffix, cached):
+                            try:
+                                variant_st = os.stat(candidate)
+                            except FileNotFoundError:
+                                continue
+                            if variant_st.st_mtime_ns >= st.st_mtime_ns:
+                                asset.variants[encoding] = Variant(candidate, variant_st.st_size)
+                                break
+                assets[relpath] = asset
+
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                stale = os.path.join(self.cache_dir, name)
+                if stale not in expected_cache:
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+        self.assets = assets
+        logger.info(f"Indexed {len(assets)} static files")
+
+    def get(self, relpath: str) -> Optional[StaticAsset]:
+        return self.assets.get(relpath)
+
+    def _build_variant(self, relpath: str, asset: StaticAsset, encoding: str) -> None:
+        st = os.stat(asset.path)
+        target = self._cache_path(relpath, st, encoding)
+        with open(asset.path, "rb") as f:
+            data = _compress(f.read(), encoding)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        asset.variants[encoding] = Variant(target, len(data))
+
+    async def _build_in_background(self, relpath: str, asset: StaticAsset, encoding: str) -> None:
+        try:
+            await anyio.to_thread.run_sync(self._build_variant, relpath, asset, encoding)
+        except Exception as e:
+            logger.warning(f"Could not compress {relpath} ({encoding}): {e}")
+        finally:
+            self._building.discard((relpath, encoding))
+
+    def _schedule_variants(self, relpath: str, asset: StaticAsset, accepted: Set[str]) -> None:
+        for encoding in available_encodings():
+            key = (relpath, encoding)
+            if encoding in accepted and encoding not in asset.variants and key not in self._building:
+                self._building.add(key)
+                task = asyncio.create_task(self._build_in_background(relpath, asset, encoding))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def respond(self, request: Request, relpath: str, asset: StaticAsset) -> Response:
+        """
+        Picks the best encoding the client accepts that is already on disk (and
+        starts building missing ones for next time), then answers 200 or 304.
+        """
+        headers = {"cache-control": asset.cache_control, "last-modified": asset.last_modified}
+        path, size, encoding = asset.path, asset.size, None
+        if asset.compressible:
+            headers["vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request.headers.get("accept-encoding"))
+            self._schedule_variants(relpath, asset, accepted)
+            for candidate in ENCODINGS:
+                if candidate in accepted and candidate in asset.variants:
+                    encoding = candidate
+                    path, size = asset.variants[candidate].path, asset.variants[candidate].size
+                    headers["content-encoding"] = encoding
+                    break
+
+        # Each encoding is its own representation and needs its own validator
+        headers["etag"] = asset.etag if not encoding else f'{asset.etag[:-1]}-{encoding}"'
+        if etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+            return Response(status_code=304, headers=headers)
+
+        return MediaFileResponse(
+            path, size, asset.content_type, headers=headers, send_body=request.method != "HEAD"
+        )
+
+
+static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "static"))
+# Uploads are served by their own routes, never by the SPA catch-all
+static_index = StaticIndex(static_dir, settings.STATIC_COMPRESSED_CACHE_DIR, exclude=(os.path.abspath(settings.UPLOAD_DIR),))
@@ -0,0 +1,351 @@
+import hashlib
+import os
+import shutil
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.blob import Blob
+from app.models.media import Media
+from app.services.jobs import JobContext, job_runner
+from app.services.storage_backends import HASH_CHUNK_SIZE, create_backend
+from app.services.upload_pipeline import StoredUpload, discard
+
+UPLOAD_DIR = settings.UPLOAD_DIR
+STATIC_URL_PREFIX = "/limit_static/uploads"
+# Files derived from a media file (waveform peaks, poster, sprite sheet, HLS
+# directory) live next to it under UPLOAD_DIR, whichever backend holds the file
+PEAKS_SUFFIX = ".peaks"
+HLS_SUFFIX = ".hls"
+THUMBNAIL_FORMATS = ("jpg", "webp")
+DERIVED_SUFFIXES = (
+    PEAKS_SUFFIX,
+    HLS_SUFFIX,
+    *(f".{kind}.{ext}" for kind in ("poster", "sprite") for ext in THUMBNAIL_FORMATS),
+)
+MIGRATE_CAS_JOB = "storage.migrate_cas"
+HASH_BACKFILL_JOB = "storage.backfill_hashes"
+
+
+backend = create_backend(UPLOAD_DIR, STATIC_URL_PREFIX)
+
+
+def content_addressed() -> bool:
+    return settings.STORAGE_LAYOUT == "cas"
+
+
+def blob_relpath(sha256: str) -> str:
+    # Two levels of sharding keep directories small: blobs/ab/cd/abcd...
+    return os.path.join("blobs", sha256[:2], sha256[2:4], sha256)
+
+
+def media_key(media: Media) -> str:
+    """Storage backend key of the bytes behind a Media row, in either layout."""
+    return media.storage_path or media.filename
+
+
+def media_path(media: Media) -> str:
+    """
+    Path of the Media row under UPLOAD_DIR: its bytes with the local backend,
+    and where its derived files go with any backend.
+    """
+    return os.path.join(UPLOAD_DIR, media_key(media))
+
+
+def media_source(media: Media) -> str:
+    """The bytes of a Media row as ffmpeg and the analysis workers read them: a path or a URL."""
+    return backend.source(media_key(media))
+
+
+def peaks_path(media: Media) -> str:
+    return media_path(media) + PEAKS_SUFFIX
+
+
+def thumbnail_path(media: Media, kind: str) -> str:
+    """Poster ("poster") or sprite sheet ("sprite") in the configured image format."""
+    return f"{media_path(media)}.{kind}.{settings.THUMBNAIL_FORMAT}"
+
+
+def hls_dir(media: Media, version: Optional[int] = None) -> str:
+    """The video's HLS directory, or the packaging `version` inside it."""
+    root = media_path(media) + HLS_SUFFIX
+    return root if version is None else os.path.join(root, str(version))
+
+
+def _prune_hls(root: str, keep: Optional[int]) -> None:
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        # Hidden entries are runs still in progress
+        if entry.name.startswith(".") or entry.name == str(keep):
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.remove(entry.path)
+
+
+async def prune_hls(media: Media) -> None:
+    """
+    Removes every HLS packaging of the video except its current hls_version.
+    Call after committing the version, so no served playlist loses its files.
+    """
+    await anyio.to_thread.run_sync(_prune_hls, hls_dir(media), media.hls_version)
+
+
+def _remove_derived(path: str) -> None:
+    for derived in (path + suffix for suffix in DERIVED_SUFFIXES):
+        if os.path.isdir(derived):
+            shutil.rmtree(derived, ignore_errors=True)
+        elif os.path.exists(derived):
+            os.remove(derived)
+
+
+def _move_derived(source: str, target: str) -> None:
+    for suffix in DERIVED_SUFFIXES:
+        if not os.path.exists(source + suffix):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.isdir(target + suffix):
+            shutil.rmtree(target + suffix)
+        os.replace(source + suffix, target + suffix)
+
+
+async def discard_derived(path: str) -> None:
+    """Removes everything derived from the media file at `path`."""
+    await anyio.to_thread.run_sync(_remove_derived, path)
+
+
+async def remove(key: str) -> None:
+    """Deletes stored bytes no row references any more, with their derived files."""
+    await anyio.to_thread.run_sync(backend.delete, key)
+    await discard_derived(os.path.join(UPLOAD_DIR, key))
+
+
+def media_url(relpath: str) -> str:
+    return backend.url(relpath)
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _claim_blob(session: AsyncSession, sha256: str, size: int) -> Tuple[Blob, bool]:
+    """
+    Takes one reference on the blob with this hash, creating its row if there is
+    none yet. Returns the blob and whether it is new, in which case the caller
+    still has to store the bytes. The caller commits.
+
+    A single insert-or-increment, so concurrent uploads of the same bytes queue
+    on the row instead of both inserting it; the later ones only see it once
+    the first has stored the bytes and committed.
+    """
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    statement = (
+        insert(Blob)
+        .values(sha256=sha256, size=size, path=blob_relpath(sha256), ref_count=1, created_at=datetime.utcnow())
+        .on_conflict_do_update(index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + 1})
+        .returning(Blob.ref_count)
+    )
+    ref_count = (await session.exec(statement)).scalar_one()
+    blob = await session.get(Blob, sha256)
+    await session.refresh(blob)
+    # A row left at zero references has no bytes to rely on either
+    return blob, ref_count == 1
+
+
+async def store_upload(session: AsyncSession, stored: StoredUpload, filename: str) -> dict:
+    """
+    Hands a received upload over to the storage backend and returns the Media
+    storage fields (url, storage_path) for the configured layout. In the flat
+    layout the name must be free: FileExistsError leaves the received file for
+    the caller.
+    """
+    if not content_addressed():
+        await anyio.to_thread.run_sync(backend.put, filename, stored.tmp_path, True)
+        return {"url": media_url(filename), "storage_path": None}
+
+    blob, created = await _claim_blob(session, stored.sha256, stored.size)
+    if created:
+        await anyio.to_thread.run_sync(backend.put, blob.path, stored.tmp_path)
+    else:
+        await discard(stored.tmp_path)
+    return {"url": media_url(blob.path), "storage_path": blob.path}
+
+
+async def release(session: AsyncSession, media: Media) -> Optional[str]:
+    """
+    Drops the Media row's claim on its bytes and returns the key that is no
+    longer referenced (if any). The caller commits first, then removes it.
+    """
+    if not media.storage_path:
+        return media_key(media)
+
+    # The Blob row is found by path: the row's hash is only a cache and may be stale
+    blob = (await session.exec(select(Blob).where(Blob.path == media.storage_path))).first()
+    if blob is None:
+        # No reference count to go by; the bytes stay while another row points at them
+        shared = (await session.exec(
+            select(Media.id).where(Media.storage_path == media.storage_path, Media.id != media.id).limit(1)
+        )).first()
+        return None if shared else media.storage_path
+
+    await session.exec(
+        update(Blob).where(Blob.sha256 == blob.sha256).values(ref_count=Blob.ref_count - 1)
+    )
+    await session.refresh(blob)
+    if blob.ref_count <= 0:
+        await session.delete(blob)
+        return blob.path
+    return None
+
+
+async def _ensure_size_and_hash(media: Media, need_hash: bool) -> bool:
+    """Backfills size (and hash if asked) from storage. Returns False if the file is missing."""
+    key = media_key(media)
+    try:
+        if media.size is None:
+            size = await anyio.to_thread.run_sync(backend.size, key)
+            if size is None:
+                return False
+            media.size = size
+        if need_hash and media.sha256 is None:
+            media.sha256 = await anyio.to_thread.run_sync(backend.hash, key)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _hash_candidates(media_items: List[Media]) -> Tuple[Counter, List[Media]]:
+    """Sizes in use, and the rows that could be duplicates but have no hash yet."""
+    sizes = Counter(media.size for media in media_items if media.size is not None)
+    unhashed = [
+        media for media in media_items
+        if media.size is None or (media.sha256 is None and sizes[media.size] > 1)
+    ]
+    return sizes, unhashed
+
+
+async def find_duplicates(session: AsyncSession) -> Tuple[List[dict], int]:
+    """
+    Groups Media rows whose bytes are identical but stored separately, going by
+    the sizes and hashes already on the rows; nothing is read from storage.
+    Also returns how many rows could not be compared yet: no size, or a size
+    shared with another row but no hash. backfill_hashes fills those in.
+    """
+    media_items = (await session.exec(select(Media))).all()
+    sizes, unhashed = _hash_candidates(media_items)
+
+    by_hash: Dict[str, List[Media]] = defaultdict(list)
+    for media in media_items:
+        if media.sha256 is not None and sizes[media.size] > 1:
+            by_hash[media.sha256].append(media)
+
+    report = []
+    for sha256, group in by_hash.items():
+        # Rows already sharing one blob are deduplicated; count physical copies
+        copies = {media_key(m) for m in group}
+        if len(copies) < 2:
+            continue
+        report.append({
+            "sha256": sha256,
+            "size": group[0].size,
+            "copies": len(copies),
+            "reclaimable_bytes": group[0].size * (len(copies) - 1),
+            "media": [{"id": m.id, "filename": m.filename, "media_type": m.media_type} for m in group],
+        })
+    report.sort(key=lambda entry: entry["reclaimable_bytes"], reverse=True)
+    return report, len(unhashed)
+
+
+async def backfill_hashes(session: AsyncSession, report: Optional[Callable[[dict], Awaitable[None]]] = None) -> dict:
+    """
+    Reads from storage what find_duplicates needs: the size of every row, then
+    the hash of rows that share their size with another. Only same-size files
+    get hashed. Each row is committed on its own, so a rerun picks up where an
+    interrupted one stopped.
+    """
+    media_items = (await session.exec(select(Media))).all()
+    hashed = missing = 0
+    # Sizes first: they decide which rows need a hash at all
+    for phase, need_hash in (("sizes", False), ("hashes", True)):
+        _, pending = _hash_candidates(media_items)
+        if need_hash:
+            pending = [media for media in pending if media.size is not None]
+        for done, media in enumerate(pending):
+            if report:
+                await report({"phase": phase, "processed": done, "total": len(pending)})
+            if not await _ensure_size_and_hash(media, need_hash):
+                missing += 1
+                continue
+            if need_hash:
+                hashed += 1
+            session.add(media)
+            await session.commit()
+    return {"hashed": hashed, "missing_files": missing}
+
+
+async def migrate_to_cas(session: AsyncSession, report: Optional[Callable[[dict], Awaitable[None]]] = None) -> dict:
+    """
+    Converts flat-layout Media rows to blobs in place. Files are moved into
+    the blob tree (a rename with the local backend); duplicates collapse onto
+    one blob and the extra copies are removed. Each row is committed on its
+    own so an interrupted run can simply be started again.
+    """
+    statement = select(Media).where(Media.storage_path == None)  # noqa: E711
+    media_items = (await session.exec(statement)).all()
+
+    migrated = missing = reclaimed = 0
+    for media in media_items:
+        if report:
+            await report({"processed": migrated + missing, "total": len(media_items)})
+        if not await _ensure_size_and_hash(media, need_hash=True):
+            missing += 1
+            continue
+        flat_key, flat_path = media_key(media), media_path(media)
+        blob, created = await _claim_blob(session, media.sha256, media.size)
+        if created:
+            await anyio.to_thread.run_sync(backend.move, flat_key, blob.path)
+        else:
+            # The row points at the existing blob first; the copy is dropped after commit
+            reclaimed += media.size
+        media.storage_path = blob.path
+        media.url = media_url(blob.path)
+        session.add(media)
+        await session.commit()
+        if created:
+            # Peaks, thumbnails and HLS follow the file into the blob tree rather than being recomputed
+            await anyio.to_thread.run_sync(_move_derived, flat_path, media_path(media))
+        else:
+            await anyio.to_thread.run_sync(backend.delete, flat_key)
+            # The blob's own derived files stay: rows already using them cache them by version
+            await anyio.to_thread.run_sync(_remove_derived, flat_path)
+        migrated += 1
+
+    return {"migrated": migrated, "missing_files": missing, "reclaimed_bytes": reclaimed}
+
+
+@job_runner.register(MIGRATE_CAS_JOB)
+async def run_migrate_to_cas(job: JobContext) -> dict:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        result = await migrate_to_cas(session, job.report)
+    return {"message": f"Migrated {result['migrated']} files to content-addressed storage.", **result}
+
+
+@job_runner.register(HASH_BACKFILL_JOB)
+async def run_backfill_hashes(job: JobContext) -> dict:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        result = await backfill_hashes(session, job.report)
+    return {"message": f"Hashed {result['hashed']} files.", **result}
@@ -0,0 +1,283 @@
+"""
+Drivers for where media bytes live, selected by STORAGE_BACKEND.
+
+Keys are "/"-separated paths relative to the storage root: Media.storage_path
+for blobs, Media.filename for flat files, StorageFile.path for scanned files.
+Uploads are always received into UPLOAD_DIR first and handed over with `put`;
+derived files (peaks, thumbnails, HLS) stay in UPLOAD_DIR with either driver.
+
+The methods are blocking; callers run them in a worker thread.
+"""
+import errno
+import hashlib
+import mimetypes
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.media_delivery import content_disposition
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # optional extra, only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# (size, mtime in ns) of a stored file
+FileStat = Tuple[int, int]
+
+
+def _skipped(name: str, exclude_suffixes: Tuple[str, ...]) -> bool:
+    # Hidden entries are in-flight writes (thumbnails, HLS); ".part" are unfinished uploads
+    return name.startswith(".") or name.endswith((".part", *exclude_suffixes))
+
+
+class StorageBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """The value stored in Media.url; clients play and download through /stream."""
+
+    @abstractmethod
+    def put(self, key: str, source_path: str, exclusive: bool = False) -> None:
+        """
+        Moves a complete local file into storage under `key`; `source_path` is
+        consumed. With `exclusive`, an existing `key` is left alone and
+        FileExistsError raised, with `source_path` still in place.
+        """
+
+    @abstractmethod
+    def move(self, key: str, new_key: str) -> None:
+        """Renames `key` to `new_key` within storage."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Removes `key`; a missing key is not an error."""
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Size in bytes, or None if the key doesn't exist."""
+
+    @abstractmethod
+    def hash(self, key: str) -> str:
+        """SHA-256 of the stored bytes; raises FileNotFoundError if the key doesn't exist."""
+
+    @abstractmethod
+    def list_files(self, exclude_suffixes: Tuple[str, ...] = ()) -> Dict[str, FileStat]:
+        """Every stored file except hidden, partial and excluded ones, keyed like `put`."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path on this machine, when the bytes are served by this process."""
+        return None
+
+    def download_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        """A time-limited URL the client can fetch directly, or None to serve it here."""
+        return None
+
+    @abstractmethod
+    def source(self, key: str) -> str:
+        """Something ffmpeg and the analysis workers can read: a path or a URL."""
+
+
+class LocalBackend(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str, url_prefix: str):
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key.replace(os.sep, '/')}"
+
+    def put(self, key: str, source_path: str, exclusive: bool = False) -> None:
+        # Uploads are received inside the root, so this is a rename rather than a copy
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not exclusive:
+            os.replace(source_path, target)
+            return
+        try:
+            # Creates the name only if it is free; two uploads of the same name can't both win
+            os.link(source_path, target)
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.ENOTSUP):
+                raise
+            # No hard links on this filesystem: claim the name first, then rename over the claim
+            os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            os.replace(source_path, target)
+        else:
+            os.remove(source_path)
+
+    def move(self, key: str, new_key: str) -> None:
+        self.put(new_key, self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def hash(self, key: str) -> str:
+        digest = hashlib.sha256()
+        with open(self._path(key), "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def list_files(self, exclude_suffixes: Tuple[str, ...] = ()) -> Dict[str, FileStat]:
+        """
+        Snapshot of every regular file under the root using os.scandir, which
+        gets size and mtime from the directory entry without an extra stat on
+        most platforms.
+        """
+        found: Dict[str, FileStat] = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if _skipped(entry.name, exclude_suffixes):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    found[os.path.relpath(entry.path, self.root)] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def source(self, key: str) -> str:
+        return self._path(key)
+
+
+class S3Backend(StorageBackend):
+    """
+    Any S3-compatible object store (AWS, MinIO, R2, ...). Large files go up as
+    multipart uploads; clients get presigned GET URLs, so media bytes never
+    pass through the app.
+    """
+
+    name = "s3"
+    # Analysis and HLS packaging read the source for as long as ffmpeg runs
+    SOURCE_URL_EXPIRES_SECONDS = 6 * 3600
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 (install the 's3' extra)")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            config=BotoConfig(
+                signature_version="s3v4",
+                s3={"addressing_style": settings.S3_ADDRESSING_STYLE},
+                max_pool_connections=settings.S3_MAX_CONCURRENCY * 2,
+            ),
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key.replace(os.sep, "/")
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+    def put(self, key: str, source_path: str, exclusive: bool = False) -> None:
+        # upload_file has no conditional write, so this check can race; the Media row
+        # for the name is checked first, which narrows it to near-simultaneous uploads
+        if exclusive and self.size(key) is not None:
+            raise FileExistsError(key)
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        # upload_file switches to a multipart upload above multipart_threshold
+        self.client.upload_file(
+            source_path, self.bucket, self._key(key),
+            ExtraArgs={"ContentType": content_type}, Config=self.transfer,
+        )
+        os.remove(source_path)
+
+    def move(self, key: str, new_key: str) -> None:
+        copy_source = {"Bucket": self.bucket, "Key": self._key(key)}
+        self.client.copy(copy_source, self.bucket, self._key(new_key), Config=self.transfer)
+        self.delete(key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def hash(self, key: str) -> str:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+        digest = hashlib.sha256()
+        for chunk in body.iter_chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def list_files(self, exclude_suffixes: Tuple[str, ...] = ()) -> Dict[str, FileStat]:
+        found: Dict[str, FileStat] = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if not key or any(_skipped(part, exclude_suffixes) for part in key.split("/")):
+                    continue
+                modified: datetime = item["LastModified"]
+                found[key] = (item["Size"], int(modified.timestamp() * 1_000_000_000))
+        return found
+
+    def _presign(self, key: str, expires: int, filename: Optional[str] = None) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = content_disposition(filename)
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires)
+
+    def download_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        return self._presign(key, settings.S3_PRESIGN_EXPIRES_SECONDS, filename)
+
+    def source(self, key: str) -> str:
+        return self._presign(key, self.SOURCE_URL_EXPIRES_SECONDS)
+
+
+def create_backend(upload_dir: str, url_prefix: str) -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        return S3Backend(settings.S3_BUCKET, settings.S3_PREFIX)
+    return LocalBackend(upload_dir, url_prefix)
@@ -0,0 +1,82 @@
+"""
+Poster frames and scrub-preview sprite sheets for videos, rendered with ffmpeg.
+Like media_probe, this runs inside the analysis process pool and imports
+nothing from the app.
+"""
+import os
+import subprocess
+from typing import Dict, List, Optional
+
+# ffmpeg quality setting per output format (mjpeg: 2-31, lower is better; webp: 0-100)
+QUALITY = {"jpg": "4", "webp": "75"}
+
+
+def _render(ffmpeg: str, input_args: List[str], output_args: List[str], target: str) -> None:
+    # Rendered under a hidden name (skipped by the storage scanner), then moved into place
+    directory, name = os.path.split(target)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}{os.path.splitext(name)[1]}")
+    command = [ffmpeg, "-nostdin", "-v", "error", "-y", *input_args, *output_args, tmp_path]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0 or not os.path.exists(tmp_path):
+            message = result.stderr[-500:].decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with {result.returncode}: {message}")
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_poster(path: str, target: str, ffmpeg: str, duration: Optional[float], width: int, image_format: str) -> None:
+    """One frame, a tenth of the way in (at most 10s) to skip fade-ins and title cards."""
+    at = min(duration * 0.1, 10.0) if duration else 0.0
+    _render(
+        ffmpeg,
+        ["-ss", f"{at:.3f}", "-i", path],
+        ["-map", "0:v:0", "-frames:v", "1", "-vf", f"scale='min({width},iw)':-2", "-q:v", QUALITY[image_format]],
+        target,
+    )
+
+
+def write_sprite(
+    path: str, target: str, ffmpeg: str, duration: float, tile_width: int, columns: int, rows: int, image_format: str
+) -> None:
+    """
+    `columns` x `rows` frames evenly spaced over the video, tiled left to right,
+    top to bottom. Only keyframes are decoded, so a long video costs little more
+    than a short one; tiles between keyframes repeat the previous one.
+    """
+    tiles = columns * rows
+    _render(
+        ffmpeg,
+        ["-skip_frame", "nokey", "-i", path],
+        [
+            "-map", "0:v:0", "-frames:v", "1",
+            "-vf", f"fps={tiles}/{duration:.3f}:eof_action=pass,scale={tile_width}:-2,tile={columns}x{rows}",
+            "-q:v", QUALITY[image_format],
+        ],
+        target,
+    )
+
+
+def write_thumbnails(
+    path: str,
+    poster_target: str,
+    sprite_target: str,
+    ffmpeg: str,
+    duration: Optional[float],
+    poster_width: int,
+    tile_width: int,
+    columns: int,
+    rows: int,
+    image_format: str,
+) -> Dict[str, bool]:
+    """
+    Renders the poster and, when the duration is known, the sprite sheet.
+    Returns which of the two were written; ffmpeg failures raise.
+    """
+    write_poster(path, poster_target, ffmpeg, duration, poster_width, image_format)
+    if not duration:
+        return {"poster": True, "sprite": False}
+    write_sprite(path, sprite_target, ffmpeg, duration, tile_width, columns, rows, image_format)
+    return {"poster": True, "sprite": True}
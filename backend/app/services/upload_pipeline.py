@@ -0,0 +1,212 @@
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.telemetry import record_upload, tracer
+
+# Form fields besides the file are short strings (type, title, genre) held in memory
+MAX_FIELD_SIZE = 8 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    """A fully received file, still under its temporary name until committed."""
+    tmp_path: str
+    filename: str
+    size: int
+    sha256: Optional[str]
+
+
+def size_limit(media_type: Optional[str]) -> int:
+    """
+    Per-type limit; unknown or not-yet-known types get the largest configured one.
+    """
+    limits = settings.UPLOAD_SIZE_LIMITS
+    if media_type in limits:
+        return limits[media_type]
+    return max(limits.values())
+
+
+def _write_and_hash(buffer: BinaryIO, digest, data: bytes) -> None:
+    # Runs in a worker thread; hashlib releases the GIL for large buffers
+    digest.update(data)
+    buffer.write(data)
+
+
+class FileSink:
+    """
+    Streams bytes to a temporary file in `directory`, hashing and counting as it
+    goes. All disk work happens in the thread pool so the event loop stays free.
+    """
+
+    def __init__(self, directory: str, filename: str, max_size: int):
+        self.filename = filename
+        self.max_size = max_size
+        self.tmp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.tmp")
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.buffer: Optional[BinaryIO] = None
+
+    async def open(self) -> None:
+        self.buffer = await anyio.to_thread.run_sync(open, self.tmp_path, "wb")
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(self.max_size)
+        await anyio.to_thread.run_sync(_write_and_hash, self.buffer, self.digest, data)
+
+    async def close(self) -> StoredUpload:
+        await anyio.to_thread.run_sync(self.buffer.close)
+        return StoredUpload(self.tmp_path, self.filename, self.size, self.digest.hexdigest())
+
+    async def abort(self) -> None:
+        if self.buffer and not self.buffer.closed:
+            await anyio.to_thread.run_sync(self.buffer.close)
+        await discard(self.tmp_path)
+
+
+async def discard(path: str) -> None:
+    try:
+        await anyio.to_thread.run_sync(os.remove, path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class _Part:
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    header_field: bytes = b""
+    header_value: bytes = b""
+    name: str = ""
+    filename: Optional[str] = None
+    data: bytearray = field(default_factory=bytearray)
+
+
+async def _receive_multipart(
+    request: Request,
+    directory: str,
+    check_filename: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> Tuple[Dict[str, str], StoredUpload]:
+    """The multipart parsing behind receive_upload."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > size_limit(None):
+        raise UploadTooLarge(size_limit(None))
+
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise InvalidUpload("Expected a multipart/form-data body")
+
+    events: list = []
+    parser = MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("begin", None)),
+        "on_header_field": lambda data, start, end: events.append(("header_field", data[start:end])),
+        "on_header_value": lambda data, start, end: events.append(("header_value", data[start:end])),
+        "on_header_end": lambda: events.append(("header_end", None)),
+        "on_headers_finished": lambda: events.append(("headers_finished", None)),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+    fields: Dict[str, str] = {}
+    part = _Part()
+    sink: Optional[FileSink] = None
+    stored: Optional[StoredUpload] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    part = _Part()
+                elif kind == "header_field":
+                    part.header_field += data
+                elif kind == "header_value":
+                    part.header_value += data
+                elif kind == "header_end":
+                    part.headers.append((part.header_field.lower(), part.header_value))
+                    part.header_field, part.header_value = b"", b""
+                elif kind == "headers_finished":
+                    disposition = dict(part.headers).get(b"content-disposition", b"")
+                    _, options = parse_options_header(disposition)
+                    part.name = options.get(b"name", b"").decode("utf-8", errors="replace")
+                    if b"filename" in options:
+                        if sink or stored:
+                            raise InvalidUpload("Only one file per upload is supported")
+                        part.filename = options[b"filename"].decode("utf-8", errors="replace")
+                        if check_filename:
+                            await check_filename(part.filename)
+                        sink = FileSink(directory, part.filename, size_limit(fields.get("media_type")))
+                        await sink.open()
+                elif kind == "data":
+                    if part.filename is not None:
+                        await sink.write(data)
+                    else:
+                        if len(part.data) + len(data) > MAX_FIELD_SIZE:
+                            raise InvalidUpload(f"Form field '{part.name}' exceeds {MAX_FIELD_SIZE} bytes")
+                        part.data += data
+                elif kind == "end":
+                    if part.filename is not None:
+                        stored = await sink.close()
+                        sink = None
+                    else:
+                        fields[part.name] = part.data.decode("utf-8", errors="replace")
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        # Shielded so a client disconnect can't leave the temp file behind
+        with anyio.CancelScope(shield=True):
+            if sink:
+                await sink.abort()
+            if stored:
+                await discard(stored.tmp_path)
+        raise
+
+    if stored is None:
+        raise InvalidUpload("No file part in upload")
+    if stored.size > size_limit(fields.get("media_type")):
+        await discard(stored.tmp_path)
+        raise UploadTooLarge(size_limit(fields.get("media_type")))
+    return fields, stored
+
+
+async def receive_upload(
+    request: Request,
+    directory: str,
+    check_filename: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> Tuple[Dict[str, str], StoredUpload]:
+    """
+    Parses a multipart/form-data upload straight off the request stream.
+
+    Form fields are collected in memory, up to MAX_FIELD_SIZE each; the single
+    file part goes through a FileSink, so nothing is spooled to a temp file and
+    copied afterwards. The size limit is enforced while streaming: per type when
+    `media_type` precedes the file in the form, otherwise the largest limit
+    applies and the caller checks the per-type limit once the form is complete.
+    `check_filename` runs as soon as the file part's name is known, so e.g.
+    duplicates are rejected before the body is transferred.
+    """
+    started = time.perf_counter()
+    with tracer.start_as_current_span("upload.receive") as span:
+        fields, stored = await _receive_multipart(request, directory, check_filename)
+        span.set_attribute("upload.bytes", stored.size)
+    record_upload("multipart", stored.size, time.perf_counter() - started)
+    return fields, stored
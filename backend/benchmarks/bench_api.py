@@ -0,0 +1,347 @@
+"""
+API hot-path benchmark: login, listings, upload, scan and reindex under concurrent load.
+
+For each library size a fresh database is seeded with synthetic Media rows
+(half videos, half audio linked to them) and Guest rows, then every scenario
+is driven through httpx, in-process over ASGI and/or against a real uvicorn.
+Results (p50/p95/p99 latency and throughput per scenario) are printed as JSON
+and compared against a stored baseline; regressions beyond --threshold make
+the run exit with status 1.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_api.py --rows 1000,10000,100000
+    cd backend && PYTHONPATH=. python benchmarks/bench_api.py --save-baseline   # on the reference machine
+
+Each size runs in its own process, since the app binds its database at import.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+ADMIN_PIN = "bench-admin-pin"
+UPLOAD_BYTES = 64 * 1024
+# Lower is better for latencies, higher for throughput
+COMPARED = {"p95_ms": 1, "throughput_rps": -1}
+
+Send = Callable[[object, int], Awaitable[int]]
+
+
+def child_env(workdir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "STATIC_COMPRESSED_CACHE_DIR": os.path.join(workdir, "static-cache"),
+        "BACKGROUND_LOCK_FILE": os.path.join(workdir, "background.lock"),
+        "ACCESS_PIN": ADMIN_PIN,
+        # Every request comes from one IP; keep the limiter on the path but out of the way
+        "LOGIN_RATE_LIMIT_PER_IP": "100000000",
+        "LOGIN_RATE_LIMIT_GLOBAL": "100000000",
+    }
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> dict:
+    ordered = sorted(latencies) or [0.0]
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+    }
+
+
+async def drive(
+    client, send: Send, requests: int, concurrency: int, prepare: Optional[Callable[[], None]] = None
+) -> dict:
+    """
+    Runs `requests` calls of `send` from `concurrency` workers; non-2xx counts
+    as an error. `prepare` runs before each call, outside the timed window.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in next_index:
+            if prepare:
+                await asyncio.to_thread(prepare)
+            start = time.perf_counter()
+            try:
+                status = await send(client, i)
+            except Exception:
+                status = 0
+            if 200 <= status < 300:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+# --- child: seed one library and run the scenarios against it ---
+
+def seed(rows: int, guests: int, scan_files: int) -> List[str]:
+    from sqlmodel import Session, select
+
+    from app.core.db import engine, init_db
+    from app.core.config import settings
+    from app.models.guest import Guest
+    from app.models.media import Media
+
+    init_db()
+    base = datetime(2024, 1, 1)
+    # Marked as processed so the background analyzer leaves the synthetic rows alone
+    done = {"analyzed_at": base, "peaks_at": base, "thumbnails_at": base, "hls_at": base}
+    videos = rows // 2
+    with Session(engine) as session:
+        session.execute(Media.__table__.insert(), [
+            {"filename": f"v{i}.mp4", "url": f"/uploads/v{i}.mp4", "media_type": "video", "genre": f"genre-{i % 25}",
+             "size": 1 << 20, "created_at": base + timedelta(seconds=i), "version": 0, **done}
+            for i in range(videos)
+        ])
+        video_ids = session.exec(select(Media.id).where(Media.media_type == "video")).all()
+        session.execute(Media.__table__.insert(), [
+            {"filename": f"a{i}.mp3", "url": f"/uploads/a{i}.mp3", "media_type": "audio",
+             "related_to_id": video_ids[i % len(video_ids)] if video_ids else None, "genre": "stale",
+             "size": 1 << 18, "created_at": base + timedelta(seconds=i), "version": 0, **done}
+            for i in range(rows - videos)
+        ])
+        pins = [f"{20_000_000 + i}" for i in range(guests)]
+        session.execute(Guest.__table__.insert(), [
+            {"email": f"guest{i}@example.com", "name": f"Guest {i}", "is_active": True, "pin": pin, "created_at": base}
+            for i, pin in enumerate(pins)
+        ])
+        session.commit()
+
+    # Files for the scanner; names that match no row, so the first scan imports them
+    for i in range(scan_files):
+        directory = os.path.join(settings.UPLOAD_DIR, f"scan{i % 20}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"track{i}.mp3"), "wb") as f:
+            f.write(os.urandom(256))
+    return pins
+
+
+def mark_stale() -> None:
+    from sqlmodel import Session, update
+
+    from app.core.db import engine
+    from app.models.media import Media
+
+    with Session(engine) as session:
+        session.exec(update(Media).where(Media.media_type == "audio").values(genre="stale"))
+        session.commit()
+
+
+async def run_scenarios(client, mode: str, pins: List[str], args) -> Dict[str, dict]:
+    login = await client.post("/api/v1/auth/login", json={"pin": ADMIN_PIN})
+    login.raise_for_status()
+    admin = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    async def guest_login(client, i: int) -> int:
+        return (await client.post("/api/v1/auth/login", json={"pin": pins[i % len(pins)]})).status_code
+
+    async def list_videos(client, i: int) -> int:
+        return (await client.get("/api/v1/media/videos")).status_code
+
+    async def list_audio(client, i: int) -> int:
+        return (await client.get("/api/v1/media/audio")).status_code
+
+    async def upload(client, i: int) -> int:
+        name = f"bench-{mode}-{i}-{uuid.uuid4().hex[:8]}.mp3"
+        files = {"file": (name, os.urandom(UPLOAD_BYTES), "audio/mpeg")}
+        response = await client.post("/api/v1/media/upload", headers=admin, data={"media_type": "audio"}, files=files)
+        return response.status_code
+
+    async def finish(client, response) -> int:
+        # The latency is the whole background job, not just the 202
+        while response.status_code < 300 and response.json()["status"] in ("pending", "running"):
+            await asyncio.sleep(0.005)
+            response = await client.get(f"/api/v1/jobs/{response.json()['id']}", headers=admin)
+        return response.status_code if response.json().get("status") != "failed" else 500
+
+    async def scan(client, i: int) -> int:
+        return await finish(client, await client.post("/api/v1/media/scan", headers=admin))
+
+    async def reindex(client, i: int) -> int:
+        return await finish(client, await client.post("/api/v1/media/reindex-audio", headers=admin))
+
+    # The first scan imports the seeded files; the timed ones are incremental rescans
+    await scan(client, -1)
+    scenarios = {
+        "login": (guest_login, args.requests, args.concurrency),
+        "videos": (list_videos, args.requests, args.concurrency),
+        "audio": (list_audio, args.requests, args.concurrency),
+        "upload": (upload, args.uploads, min(args.concurrency, 4)),
+        "scan": (scan, args.scan_runs, 1),
+        # Every run has the full set of audio rows to fix
+        "reindex": (reindex, args.reindex_runs, 1, mark_stale),
+    }
+    return {name: await drive(client, *scenario) for name, scenario in scenarios.items()}
+
+
+async def run_in_process(pins: List[str], args) -> Dict[str, dict]:
+    import httpx
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            return await run_scenarios(client, "inprocess", pins, args)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(pins: List[str], args) -> Dict[str, dict]:
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+            for _ in range(200):
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {server.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            return await run_scenarios(client, "uvicorn", pins, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def child_main(args) -> None:
+    pins = seed(args.child_rows, args.guests, args.scan_files)
+    results = {}
+    if args.mode in ("inprocess", "both"):
+        results["inprocess"] = asyncio.run(run_in_process(pins, args))
+    if args.mode in ("uvicorn", "both"):
+        results["uvicorn"] = asyncio.run(run_uvicorn(pins, args))
+    with open(args.child_output, "w") as f:
+        json.dump(results, f)
+
+
+# --- parent: one child per size, then the baseline comparison ---
+
+def run_size(rows: int, argv: List[str]) -> Dict[str, dict]:
+    workdir = tempfile.mkdtemp(prefix=f"bench-api-{rows}-")
+    output = os.path.join(workdir, "results.json")
+    try:
+        command = [sys.executable, os.path.abspath(__file__), *argv, "--child-rows", str(rows), "--child-output", output]
+        # App logs go to the child's stdout; only the results file is read back
+        subprocess.run(command, env=child_env(workdir), stdout=subprocess.DEVNULL, check=True)
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[dict]:
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, direction in COMPARED.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > threshold:
+                regressions.append({
+                    "benchmark": key, "metric": metric, "baseline": old, "current": new,
+                    "change_pct": round(change * 100, 1),
+                })
+    return regressions
+
+
+def parent_main(args, argv: List[str]) -> int:
+    results: Dict[str, dict] = {}
+    for rows in [int(size) for size in args.rows.split(",")]:
+        for mode, scenarios in run_size(rows, argv).items():
+            for name, summary in scenarios.items():
+                results[f"{mode}/{rows}/{name}"] = summary
+
+    baseline: Optional[dict] = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.threshold) if baseline else []
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "guests": args.guests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+        "baseline": None if baseline is None else args.baseline,
+        "regressions": regressions,
+    }
+    print(json.dumps(report, indent=2))
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="1000,10000,100000", help="comma separated library sizes")
+    parser.add_argument("--guests", type=int, default=5000)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=1000, help="per login/listing scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--scan-files", type=int, default=2000)
+    parser.add_argument("--scan-runs", type=int, default=10)
+    parser.add_argument("--reindex-runs", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--output", help="also write the report here")
+    parser.add_argument("--child-rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_rows is not None:
+        child_main(args)
+    else:
+        sys.exit(parent_main(args, sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+Concurrency benchmark for the async DB layer.
+
+Measures /media/audio latency on its own, then again while an admin
+/media/reindex-audio runs over a large library. With the async session the
+listing p99 should stay roughly flat instead of queueing behind the reindex.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_async_db.py --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.api.v1.endpoints.auth import create_access_token  # noqa: E402
+from app.core.db import engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.media import Media  # noqa: E402
+from app.services.jobs import job_runner  # noqa: E402
+
+
+def seed(rows: int) -> None:
+    init_db()
+    base = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        videos = [
+            Media(filename=f"v{i}.mp4", url=f"/v{i}", media_type="video", genre=f"g{i % 7}",
+                  created_at=base + timedelta(seconds=i))
+            for i in range(rows // 10 or 1)
+        ]
+        session.add_all(videos)
+        session.commit()
+        video_ids = [v.id for v in videos]
+        session.add_all(
+            Media(filename=f"a{i}.mp3", url=f"/a{i}", media_type="audio", genre="stale",
+                  related_to_id=video_ids[i % len(video_ids)], created_at=base + timedelta(seconds=i))
+            for i in range(rows)
+        )
+        session.commit()
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+async def listing_load(client: httpx.AsyncClient, requests: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            start = time.perf_counter()
+            response = await client.get("/api/v1/media/audio", params={"limit": 50})
+            response.raise_for_status()
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return samples
+
+
+async def reindex(client: httpx.AsyncClient, headers: dict) -> int:
+    """Queues the reindex and follows its job, which runs in this process."""
+    response = await client.post("/api/v1/media/reindex-audio", headers=headers)
+    while response.status_code < 300 and response.json()["status"] in ("pending", "running"):
+        await asyncio.sleep(0.01)
+        response = await client.get(f"/api/v1/jobs/{response.json()['id']}", headers=headers)
+    return response.status_code if response.json().get("status") != "failed" else 500
+
+
+async def main(rows: int, requests: int, concurrency: int) -> dict:
+    seed(rows)
+    token = create_access_token({"sub": "admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await listing_load(client, requests, concurrency)
+
+        job_runner.start()
+        admin_started = time.perf_counter()
+        admin_task = asyncio.create_task(reindex(client, headers))
+        busy = await listing_load(client, requests, concurrency)
+        admin_status = await admin_task
+        admin_seconds = time.perf_counter() - admin_started
+        await job_runner.stop()
+
+    return {
+        "rows": rows,
+        "concurrency": concurrency,
+        "idle": percentiles(idle),
+        "during_admin_op": percentiles(busy),
+        "admin_op": {"status": admin_status, "seconds": round(admin_seconds, 2)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.rows, args.requests, args.concurrency)), indent=2))
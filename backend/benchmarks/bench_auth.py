@@ -0,0 +1,54 @@
+"""
+Token verification benchmark: a full jose decode per request vs the verified-token LRU.
+
+Issues a pool of tokens (as if that many clients were active), then verifies
+them round-robin through both paths.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_auth.py --requests 200000 --tokens 100
+"""
+import argparse
+import json
+import time
+
+from jose import jwt
+
+from app.core.config import settings
+from app.core.security import ALGORITHM, TokenVerifier, create_access_token
+
+
+def uncached(tokens: list, requests: int) -> None:
+    for i in range(requests):
+        jwt.decode(tokens[i % len(tokens)], settings.SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def cached(tokens: list, requests: int, cache_size: int) -> None:
+    verifier = TokenVerifier(cache_size)
+    for i in range(requests):
+        verifier.verify(tokens[i % len(tokens)])
+
+
+def timed(fn, requests: int) -> dict:
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "us_per_request": round(seconds / requests * 1e6, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--tokens", type=int, default=100, help="distinct tokens in rotation")
+    parser.add_argument("--cache-size", type=int, default=settings.TOKEN_CACHE_SIZE)
+    args = parser.parse_args()
+
+    tokens = [create_access_token({"sub": str(i), "role": "guest"}) for i in range(args.tokens)]
+    full_decode = timed(lambda: uncached(tokens, args.requests), args.requests)
+    lru = timed(lambda: cached(tokens, args.requests, args.cache_size), args.requests)
+    print(json.dumps({
+        "requests": args.requests,
+        "tokens": args.tokens,
+        "cache_size": args.cache_size,
+        "full_decode": full_decode,
+        "lru": lru,
+        "speedup": round(full_decode["seconds"] / max(lru["seconds"], 1e-9), 1),
+    }, indent=2))
@@ -0,0 +1,123 @@
+"""
+Invitation delivery benchmark: one aiosmtplib.send per guest vs the pooled outbox worker.
+
+Runs against a local aiosmtpd stand-in (or --smtp-host/--smtp-port), queues
+an invite per guest and times draining the outbox; the baseline sends the same
+messages with a fresh connection each, like the old BackgroundTasks path.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_email.py --guests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument("--guests", type=int, default=2000)
+parser.add_argument("--baseline", type=int, default=200, help="messages sent one connection each")
+parser.add_argument("--smtp-host", default=None, help="use an existing server instead of aiosmtpd")
+parser.add_argument("--smtp-port", type=int, default=None)
+args = parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+SMTP_HOST = args.smtp_host or "127.0.0.1"
+SMTP_PORT = args.smtp_port or free_port()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'email.db')}"
+os.environ.update(SMTP_HOST=SMTP_HOST, SMTP_PORT=str(SMTP_PORT), SMTP_TLS="false")
+
+import aiosmtplib  # noqa: E402
+from sqlmodel import func, select  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.core.db import async_engine, init_db  # noqa: E402
+from app.models.outbox import EmailOutbox  # noqa: E402
+from app.services.email import build_pin_email, get_smtp_config  # noqa: E402
+from app.services.outbox import EmailWorker, enqueue_pin_email  # noqa: E402
+
+
+class CountingHandler:
+    def __init__(self):
+        self.messages = 0
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+
+async def per_message(count: int) -> float:
+    config = await get_smtp_config()
+    start = time.perf_counter()
+    for i in range(count):
+        message = build_pin_email(config, f"guest{i}@example.com", "12345678", f"Guest {i}")
+        await aiosmtplib.send(
+            message, sender=config.sender_address, recipients=[f"guest{i}@example.com"],
+            hostname=config.host, port=config.port, use_tls=False,
+        )
+    return time.perf_counter() - start
+
+
+async def pooled(count: int) -> dict:
+    async with AsyncSession(async_engine) as session:
+        for i in range(count):
+            await enqueue_pin_email(session, i + 1, f"guest{i}@example.com", "12345678", f"Guest {i}")
+        await session.commit()
+
+    worker = EmailWorker()
+    start = time.perf_counter()
+    while await worker.process_batch():
+        pass
+    seconds = time.perf_counter() - start
+    await worker.stop()
+
+    async with AsyncSession(async_engine) as session:
+        sent = (await session.exec(select(func.count()).where(EmailOutbox.status == "sent"))).one()
+    return {"seconds": round(seconds, 3), "sent": sent}
+
+
+async def main() -> dict:
+    baseline = await per_message(args.baseline)
+    result = await pooled(args.guests)
+    return {
+        "guests": args.guests,
+        "per_message": {
+            "messages": args.baseline,
+            "seconds": round(baseline, 3),
+            "projected_seconds": round(baseline / max(args.baseline, 1) * args.guests, 3),
+        },
+        "pooled": result,
+    }
+
+
+if __name__ == "__main__":
+    init_db()
+    controller = None
+    handler = None
+    if not args.smtp_host:
+        from aiosmtpd.controller import Controller
+
+        handler = CountingHandler()
+        controller = Controller(handler, hostname=SMTP_HOST, port=SMTP_PORT)
+        controller.start()
+    try:
+        report = asyncio.run(main())
+    finally:
+        if controller:
+            controller.stop()
+    if handler:
+        report["server"] = {"messages": handler.messages, "connections": handler.connections}
+    print(json.dumps(report, indent=2))
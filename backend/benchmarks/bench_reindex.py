@@ -0,0 +1,96 @@
+"""
+Genre reindex benchmark: the old per-row loop vs the set-based UPDATE.
+
+Seeds a library of linked audio rows (100k by default), marks them stale,
+then times both strategies on identical data.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_reindex.py --audio 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "reindex.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlmodel import Session, select, update  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.core.db import async_engine, engine, init_db  # noqa: E402
+from app.models.media import Media  # noqa: E402
+from app.services.genres import sync_all_audio_genres  # noqa: E402
+
+
+def seed(audio_rows: int, videos: int) -> None:
+    init_db()
+    with Session(engine) as session:
+        session.add_all(
+            Media(filename=f"v{i}.mp4", url="", media_type="video", genre=f"genre-{i % 25}")
+            for i in range(videos)
+        )
+        session.commit()
+        video_ids = session.exec(select(Media.id).where(Media.media_type == "video")).all()
+        session.add_all(
+            Media(filename=f"a{i}.mp3", url="", media_type="audio", related_to_id=video_ids[i % len(video_ids)])
+            for i in range(audio_rows)
+        )
+        session.commit()
+
+
+def mark_stale() -> None:
+    with Session(engine) as session:
+        session.exec(update(Media).where(Media.media_type == "audio").values(genre="stale"))
+        session.commit()
+
+
+def per_row_reindex() -> int:
+    # The previous implementation: one lookup per linked audio row
+    with Session(engine) as session:
+        audios = session.exec(
+            select(Media).where(Media.media_type == "audio", Media.related_to_id != None)  # noqa: E711
+        ).all()
+        updated = 0
+        for audio in audios:
+            parent = session.get(Media, audio.related_to_id)
+            if parent and parent.genre and parent.genre != audio.genre:
+                audio.genre = parent.genre
+                session.add(audio)
+                updated += 1
+        session.commit()
+        return updated
+
+
+async def set_based_reindex() -> int:
+    async with AsyncSession(async_engine) as session:
+        updated = await sync_all_audio_genres(session)
+        await session.commit()
+        return updated
+
+
+def timed(fn) -> dict:
+    start = time.perf_counter()
+    updated = fn()
+    return {"updated": updated, "seconds": round(time.perf_counter() - start, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--audio", type=int, default=100_000)
+    parser.add_argument("--videos", type=int, default=10_000)
+    args = parser.parse_args()
+
+    seed(args.audio, args.videos)
+    mark_stale()
+    per_row = timed(per_row_reindex)
+    mark_stale()
+    set_based = timed(lambda: asyncio.run(set_based_reindex()))
+    print(json.dumps({
+        "audio_rows": args.audio,
+        "videos": args.videos,
+        "per_row": per_row,
+        "set_based": set_based,
+        "speedup": round(per_row["seconds"] / max(set_based["seconds"], 1e-9), 1),
+    }, indent=2))
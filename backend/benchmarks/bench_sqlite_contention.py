@@ -0,0 +1,116 @@
+"""
+Read/write contention benchmark for the SQLite engine profile.
+
+Runs reader threads issuing the paginated listing query while a writer
+commits small inserts (like uploads do), once with stock SQLite settings
+and once with the production profile from core/db.py. Both profiles are
+built explicitly, so DB_ENGINE_PROFILE and the pool settings of the
+environment don't change what is compared.
+
+    cd backend && PYTHONPATH=. python benchmarks/bench_sqlite_contention.py --seconds 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.db import engine_options, install_sqlite_pragmas, sqlite_pragmas
+from app.models.media import Media
+
+
+PROFILES = ("default", "production")
+
+
+def build_engine(profile: str, connections: int):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'contention.db')}"
+    # One pooled connection per thread, the same for both profiles
+    bench_engine = create_engine(url, **engine_options(url, pool_size=connections, max_overflow=0))
+    install_sqlite_pragmas(bench_engine, sqlite_pragmas(profile))
+    SQLModel.metadata.create_all(bench_engine)
+    return bench_engine
+
+
+def seed(bench_engine, rows: int) -> None:
+    base = datetime(2024, 1, 1)
+    with Session(bench_engine) as session:
+        session.add_all(
+            Media(filename=f"a{i}.mp3", url=f"/a{i}", media_type="audio", created_at=base + timedelta(seconds=i))
+            for i in range(rows)
+        )
+        session.commit()
+
+
+def run_profile(profile: str, rows: int, readers: int, seconds: float) -> dict:
+    bench_engine = build_engine(profile, readers + 1)
+    seed(bench_engine, rows)
+    stop = threading.Event()
+    read_latencies: list[float] = []
+    counters = {"writes": 0, "read_errors": 0, "write_errors": 0}
+    lock = threading.Lock()
+
+    def reader() -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session(bench_engine) as session:
+                    statement = (
+                        select(Media).where(Media.media_type == "audio")
+                        .order_by(Media.created_at.desc(), Media.id.desc()).limit(50)
+                    )
+                    session.exec(statement).all()
+            except OperationalError:
+                with lock:
+                    counters["read_errors"] += 1
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - start)
+
+    def writer() -> None:
+        i = 0
+        while not stop.is_set():
+            try:
+                with Session(bench_engine) as session:
+                    session.add(Media(filename=f"w{i}.mp4", url=f"/w{i}", media_type="video"))
+                    session.commit()
+                counters["writes"] += 1
+            except OperationalError:
+                counters["write_errors"] += 1
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    bench_engine.dispose()
+
+    ordered = sorted(read_latencies) or [0.0]
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)  # noqa: E731
+    return {
+        "profile": profile,
+        "pragmas": sqlite_pragmas(profile),
+        "reads_per_s": round(len(read_latencies) / seconds, 1),
+        "writes_per_s": round(counters["writes"] / seconds, 1),
+        "read_p50_ms": pick(0.50),
+        "read_p99_ms": pick(0.99),
+        "read_errors": counters["read_errors"],
+        "write_errors": counters["write_errors"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    results = [run_profile(profile, args.rows, args.readers, args.seconds) for profile in PROFILES]
+    print(json.dumps(results, indent=2))
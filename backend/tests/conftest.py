@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# The app reads its settings at import time: point it at a scratch directory first
+WORKDIR = tempfile.mkdtemp(prefix="er-music-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    "UPLOAD_DIR": os.path.join(WORKDIR, "uploads"),
+    "STATIC_COMPRESSED_CACHE_DIR": os.path.join(WORKDIR, "static-cache"),
+    "BACKGROUND_LOCK_FILE": os.path.join(WORKDIR, "background.lock"),
+    "JOB_POLL_SECONDS": "0.1",
+    # Spans and metrics are kept for tests/test_telemetry.py
+    "OTEL_EXPORTER": "memory",
+})
+
+import time  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.security import create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def admin_headers():
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+
+
+def wait_for_job(client, headers, job: dict, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while job["status"] in ("pending", "running"):
+        assert time.monotonic() < deadline, f"job {job['id']} still {job['status']}"
+        time.sleep(0.05)
+        job = client.get(f"/api/v1/jobs/{job['id']}", headers=headers).json()
+    return job
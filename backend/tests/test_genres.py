@@ -0,0 +1,69 @@
+import os
+import uuid
+
+import pytest
+from sqlmodel import Session, update
+
+from app.core.db import engine
+from app.models.media import Media
+from app.services import genres
+from tests.conftest import wait_for_job
+
+
+def add(client, headers, media_type: str, genre=None, related_to_id=None) -> int:
+    extension = "mp4" if media_type == "video" else "mp3"
+    response = client.post(
+        "/api/v1/media/upload", headers=headers, data={"media_type": media_type},
+        files={"file": (f"{uuid.uuid4().hex}.{extension}", os.urandom(64), "application/octet-stream")},
+    )
+    assert response.status_code == 200, response.text
+    media_id = response.json()["id"]
+    # Set afterwards: an upload takes its parent's genre
+    with Session(engine) as session:
+        session.exec(update(Media).where(Media.id == media_id).values(genre=genre, related_to_id=related_to_id))
+        session.commit()
+    return media_id
+
+
+@pytest.fixture
+def linked(client, admin_headers):
+    """Audio linked to videos, by what a reindex should do with it."""
+    rock, untagged = add(client, admin_headers, "video", "rock"), add(client, admin_headers, "video", "")
+    return {
+        "unset": add(client, admin_headers, "audio", None, rock),
+        "stale": add(client, admin_headers, "audio", "jazz", rock),
+        "synced": add(client, admin_headers, "audio", "rock", rock),
+        "untagged parent": add(client, admin_headers, "audio", "jazz", untagged),
+        "unlinked": add(client, admin_headers, "audio", "jazz"),
+    }
+
+
+def genres_of(ids: dict) -> dict:
+    with Session(engine) as session:
+        return {name: session.get(Media, media_id).genre for name, media_id in ids.items()}
+
+
+@pytest.mark.parametrize("update_from", [True, False], ids=["update-from", "correlated-subquery"])
+def test_reindex_copies_parent_genres(client, admin_headers, linked, monkeypatch, update_from):
+    if update_from:
+        assert genres.supports_update_from(engine.dialect), "SQLite without UPDATE ... FROM"
+    else:
+        monkeypatch.setattr(genres, "supports_update_from", lambda dialect: False)
+
+    response = client.post("/api/v1/media/reindex-audio", params={"dry_run": True}, headers=admin_headers)
+    assert response.status_code == 200
+    changes = {change["id"]: change for change in response.json()["changes"]}
+    assert {linked["unset"], linked["stale"]} <= set(changes)
+    assert not {linked["synced"], linked["untagged parent"], linked["unlinked"]} & set(changes)
+    assert changes[linked["stale"]]["old_genre"] == "jazz" and changes[linked["stale"]]["new_genre"] == "rock"
+    # A dry run changes nothing
+    assert genres_of(linked)["unset"] is None
+
+    response = client.post("/api/v1/media/reindex-audio", headers=admin_headers)
+    assert response.status_code == 202
+    job = wait_for_job(client, admin_headers, response.json())
+    assert job["status"] == "done", job
+    assert job["result"]["updated_count"] == len(changes)
+    assert genres_of(linked) == {
+        "unset": "rock", "stale": "rock", "synced": "rock", "untagged parent": "jazz", "unlinked": "jazz",
+    }
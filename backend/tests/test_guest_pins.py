@@ -0,0 +1,21 @@
+import itertools
+import uuid
+
+from app.core.config import settings
+from app.services import guest_import
+
+
+def test_guests_never_get_the_admin_pin(client, admin_headers, monkeypatch):
+    draws = itertools.chain([settings.ACCESS_PIN], (f"{n:08d}" for n in itertools.count(uuid.uuid4().int % 10**7)))
+    monkeypatch.setattr(guest_import, "generate_pin", lambda length=8: next(draws))
+
+    response = client.post("/api/v1/guests/", headers=admin_headers, json={"email": f"{uuid.uuid4().hex}@example.com"})
+    assert response.status_code == 200, response.text
+    assert response.json()["pin"] != settings.ACCESS_PIN
+
+
+def test_admin_pin_taken_by_a_guest_is_rejected(client, admin_headers):
+    guest = client.post("/api/v1/guests/", headers=admin_headers, json={"email": f"{uuid.uuid4().hex}@example.com"}).json()
+    response = client.post("/api/v1/settings/", headers=admin_headers, json={"admin_pin": guest["pin"]})
+    assert response.status_code == 400
+    assert client.post("/api/v1/auth/login", json={"pin": guest["pin"]}).json()["role"] == "guest"
@@ -0,0 +1,54 @@
+import uuid
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.guest import Guest
+from app.services.guest_tokens import guest_tokens
+
+
+def guest_login(client, admin_headers) -> tuple:
+    response = client.post("/api/v1/guests/", headers=admin_headers, json={"email": f"{uuid.uuid4().hex}@example.com"})
+    assert response.status_code == 200, response.text
+    guest = response.json()
+    token = client.post("/api/v1/auth/login", json={"pin": guest["pin"]}).json()["access_token"]
+    return guest["id"], {"Authorization": f"Bearer {token}"}
+
+
+def whoami(client, headers) -> int:
+    # An admin-only endpoint: a valid guest token gets 403, a rejected one 401
+    return client.get("/api/v1/jobs/", headers=headers).status_code
+
+
+def test_deactivation_rejects_issued_tokens(client, admin_headers):
+    guest_id, headers = guest_login(client, admin_headers)
+    assert whoami(client, headers) == 403
+
+    client.patch(f"/api/v1/guests/{guest_id}", headers=admin_headers, json={"is_active": False})
+    assert whoami(client, headers) == 401
+
+    # Reactivating does not bring the old token back
+    client.patch(f"/api/v1/guests/{guest_id}", headers=admin_headers, json={"is_active": True})
+    assert whoami(client, headers) == 401
+
+
+def test_revocation_from_another_worker(client, admin_headers):
+    guest_id, headers = guest_login(client, admin_headers)
+    assert whoami(client, headers) == 403
+
+    # Another worker revokes the guest: only the database knows
+    with Session(engine) as session:
+        guest = session.get(Guest, guest_id)
+        guest.tokens_valid_after = datetime.utcnow()
+        session.add(guest)
+        session.commit()
+    # ...which this one sees once its copy is older than GUEST_TOKEN_CACHE_SECONDS
+    guest_tokens.clear()
+    assert whoami(client, headers) == 401
+
+
+def test_deleted_guest_token_rejected(client, admin_headers):
+    guest_id, headers = guest_login(client, admin_headers)
+    assert client.delete(f"/api/v1/guests/{guest_id}", headers=admin_headers).status_code == 200
+    assert whoami(client, headers) == 401
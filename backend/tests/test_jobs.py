@@ -0,0 +1,130 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.models.job import Job
+from app.services.jobs import MAX_RETRY_DELAY, JobRunner, retry_delay
+
+
+class Flaky(Exception):
+    pass
+
+
+@pytest.fixture
+def runner():
+    """A runner of its own, with job types the app's runner doesn't claim."""
+    runner = JobRunner()
+    runner.job_type = f"test.{uuid.uuid4().hex}"
+
+    @runner.register(runner.job_type, max_attempts=2)
+    async def fail(job):
+        raise Flaky(f"attempt {job.attempt}")
+
+    return runner
+
+
+def call(client, func, *args):
+    """Runs `func(session, *args)` on the app's event loop."""
+    async def run():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            return await func(session, *args)
+    return client.portal.call(run)
+
+
+def load(job_id: str) -> Job:
+    with Session(engine) as session:
+        return session.get(Job, job_id)
+
+
+def expire_lease(job_id: str) -> None:
+    # As if the worker running it had died
+    with Session(engine) as session:
+        session.exec(update(Job).where(Job.id == job_id).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        session.commit()
+
+
+def test_enqueue_returns_the_active_job(client, runner):
+    job, created = call(client, runner.enqueue, runner.job_type, {"b": 1, "a": 2})
+    assert created
+    again, created = call(client, runner.enqueue, runner.job_type, {"a": 2, "b": 1})
+    assert (again.id, created) == (job.id, False)
+    other, created = call(client, runner.enqueue, runner.job_type, {"a": 3})
+    assert created and other.id != job.id
+    unique, created = call(client, runner.enqueue, runner.job_type, {"a": 2, "b": 1}, False)
+    assert created and unique.id != job.id
+
+
+def test_enqueue_race_returns_the_winner(client, runner, monkeypatch):
+    job, _ = call(client, runner.enqueue, runner.job_type)
+    active = runner._active
+
+    # The other request's row isn't visible to the first check, so the unique index rejects ours
+    async def not_yet(session, dedup_key):
+        monkeypatch.setattr(runner, "_active", active)
+        return None
+    monkeypatch.setattr(runner, "_active", not_yet)
+
+    again, created = call(client, runner.enqueue, runner.job_type)
+    assert (again.id, created) == (job.id, False)
+
+
+def test_retry_delay_backs_off_exponentially():
+    base = timedelta(seconds=settings.JOB_RETRY_BASE_SECONDS)
+    assert [retry_delay(attempts) for attempts in (1, 2, 3)] == [base, 2 * base, 4 * base]
+    assert retry_delay(100) == MAX_RETRY_DELAY
+
+
+def test_failed_attempts_are_retried_with_backoff(client, runner):
+    job, _ = call(client, runner.enqueue, runner.job_type)
+
+    [claimed] = call(client, runner._claim)
+    assert claimed.id == job.id and claimed.attempts == 1
+    before = datetime.utcnow()
+    client.portal.call(runner._execute, claimed)
+    job = load(job.id)
+    assert (job.status, job.error) == ("pending", "attempt 1")
+    assert job.next_attempt_at >= before + retry_delay(1)
+    # Not due before its backoff has passed
+    assert call(client, runner._claim) == []
+
+    expire_lease(job.id)
+    [claimed] = call(client, runner._claim)
+    client.portal.call(runner._execute, claimed)
+    job = load(job.id)
+    assert (job.status, job.attempts, job.error) == ("failed", 2, "attempt 2")
+    assert job.finished_at is not None
+
+
+def test_running_job_is_reclaimed_after_its_lease(client, runner):
+    job, _ = call(client, runner.enqueue, runner.job_type)
+    [claimed] = call(client, runner._claim)
+    assert load(job.id).status == "running"
+
+    # Another runner leaves it alone while the lease holds
+    other = JobRunner()
+    other.types = runner.types
+    assert call(client, other._claim) == []
+
+    expire_lease(job.id)
+    [reclaimed] = call(client, other._claim)
+    assert reclaimed.id == job.id and reclaimed.attempts == 2
+
+
+def test_job_lost_on_its_last_attempt_fails(client, runner):
+    job, _ = call(client, runner.enqueue, runner.job_type)
+    for attempt in (1, 2):
+        expire_lease(job.id)
+        [claimed] = call(client, runner._claim)
+        assert claimed.attempts == attempt
+        runner._running.clear()
+
+    # A third claim exceeds max_attempts: the job fails instead of running again
+    expire_lease(job.id)
+    assert call(client, runner._claim) == []
+    job = load(job.id)
+    assert (job.status, job.attempts, job.error) == ("failed", 3, "Worker stopped while running the job")
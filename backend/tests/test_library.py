@@ -0,0 +1,101 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.library import LibraryState, MediaTombstone
+from app.models.media import Media
+from app.services.analysis import analyzer
+from tests.test_storage import upload
+
+
+@pytest.fixture(autouse=True)
+def paused_analyzer(client):
+    # Its writes to Media would bump the library version under the tests
+    client.portal.call(analyzer.stop)
+    yield
+    client.portal.call(analyzer.start)
+
+
+def add(client, headers) -> int:
+    return upload(client, headers, f"{uuid.uuid4().hex}.mp3", os.urandom(64))["id"]
+
+
+def library(client, since: int = None) -> dict:
+    response = client.get("/api/v1/media/library", params={} if since is None else {"since": since})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_snapshot(client, admin_headers):
+    media_id = add(client, admin_headers)
+    response = client.get("/api/v1/media/library")
+    data = response.json()
+    assert data["full"] is True
+    assert media_id in [row["id"] for row in data["audio"]]
+    assert all(row["media_type"] == "video" for row in data["videos"])
+
+    etag = response.headers["etag"]
+    assert etag == f'W/"library-{data["version"]}"'
+    assert client.get("/api/v1/media/library", headers={"If-None-Match": etag}).status_code == 304
+    add(client, admin_headers)
+    assert client.get("/api/v1/media/library", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_delta_after_update_and_delete(client, admin_headers):
+    updated, deleted = add(client, admin_headers), add(client, admin_headers)
+    since = library(client)["version"]
+
+    with Session(engine) as session:
+        media = session.get(Media, updated)
+        media.title = "renamed"
+        session.add(media)
+        session.commit()
+    assert client.delete(f"/api/v1/media/{deleted}", headers=admin_headers).status_code == 200
+
+    data = library(client, since)
+    assert data["full"] is False
+    assert [row["title"] for row in data["changed"] if row["id"] == updated] == ["renamed"]
+    assert deleted not in [row["id"] for row in data["changed"]]
+    assert deleted in data["deleted"]
+    later = library(client, data["version"])
+    assert updated not in [row["id"] for row in later["changed"]] and deleted not in later["deleted"]
+
+
+def test_update_and_delete_in_one_flush(client, admin_headers):
+    updated, deleted = add(client, admin_headers), add(client, admin_headers)
+    since = library(client)["version"]
+
+    with Session(engine) as session:
+        media = session.get(Media, updated)
+        media.title = "same flush"
+        session.add(media)
+        session.delete(session.get(Media, deleted))
+        session.commit()
+
+    data = library(client, since)
+    assert updated in [row["id"] for row in data["changed"]]
+    assert deleted in data["deleted"]
+    # One transaction, one version
+    with Session(engine) as session:
+        assert session.get(Media, updated).version == session.get(MediaTombstone, deleted).version
+
+
+def test_version_older_than_tombstones_gets_full_resync(client, admin_headers):
+    add(client, admin_headers)
+    old = library(client)["version"]
+    with Session(engine) as session:
+        session.add(MediaTombstone(media_id=10**9, version=old, deleted_at=datetime.utcnow() - timedelta(days=365)))
+        session.commit()
+
+    # Deleting prunes tombstones past their retention
+    assert client.delete(f"/api/v1/media/{add(client, admin_headers)}", headers=admin_headers).status_code == 200
+    with Session(engine) as session:
+        assert session.get(LibraryState, 1).pruned_version == old
+        assert session.get(MediaTombstone, 10**9) is None
+
+    assert library(client, old - 1)["full"] is True
+    assert library(client, old)["full"] is False
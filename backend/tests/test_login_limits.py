@@ -0,0 +1,47 @@
+import pytest
+from starlette.requests import Request
+
+from app.api.v1.endpoints import auth
+from app.core.config import settings
+from app.services.rate_limit import MemoryRateLimiter, client_ip
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = MemoryRateLimiter(60, 100)
+    monkeypatch.setattr(auth, "login_limiter", limiter)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 100)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_GLOBAL", 3)
+    return limiter
+
+
+def login(client, pin: str) -> int:
+    return client.post("/api/v1/auth/login", json={"pin": pin}).status_code
+
+
+def test_global_limit_counts_wrong_pins_only(client, limiter):
+    for _ in range(5):
+        assert login(client, settings.ACCESS_PIN) == 200
+    for _ in range(3):
+        assert login(client, "00000000") == 400
+    assert login(client, settings.ACCESS_PIN) == 429
+
+
+def request_from(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 40000), "headers": headers})
+
+
+def test_client_ip_behind_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.0/8"])
+    assert client_ip(request_from("10.0.0.2", "203.0.113.7")) == "203.0.113.7"
+    # Two proxies of ours in a row
+    assert client_ip(request_from("10.0.0.2", "203.0.113.7, 10.0.0.5")) == "203.0.113.7"
+    # Whatever the client put in front of its own address is ignored
+    assert client_ip(request_from("10.0.0.2", "1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+    # Only our proxies may set the header
+    assert client_ip(request_from("198.51.100.1", "1.2.3.4")) == "198.51.100.1"
+
+
+def test_client_ip_without_trusted_proxies():
+    assert client_ip(request_from("10.0.0.2", "203.0.113.7")) == "10.0.0.2"
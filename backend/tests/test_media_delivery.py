@@ -0,0 +1,107 @@
+import os
+import uuid
+
+import pytest
+
+from app.services.media_delivery import RangeNotSatisfiable, parse_range_header
+from tests.test_storage import upload
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    ("bytes=900-", [(900, 999)]),
+    ("bytes=990-2000", [(990, 999)]),
+    ("bytes=500-599, 0-99", [(0, 99), (500, 599)]),
+    # Overlapping and adjacent ranges are merged
+    ("bytes=0-99,50-149,150-199", [(0, 199)]),
+    # Malformed: the caller serves the whole file
+    ("items=0-99", []),
+    ("bytes=abc-", []),
+    ("bytes=99-0", []),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0", "bytes=2000-3000, 1500-"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, SIZE)
+
+
+@pytest.fixture(scope="module")
+def media(client, admin_headers):
+    data = os.urandom(SIZE)
+    row = upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data)
+    return f"/api/v1/media/{row['id']}/stream", data
+
+
+def test_single_range(client, media):
+    url, data = media
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{SIZE}"
+    assert response.content == data[100:200]
+
+
+def test_suffix_and_open_ended_ranges(client, media):
+    url, data = media
+    response = client.get(url, headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 990-999/{SIZE}"
+    assert response.content == data[-10:]
+
+    response = client.get(url, headers={"Range": "bytes=950-"})
+    assert response.status_code == 206
+    assert response.content == data[950:]
+
+
+def test_unsatisfiable_range(client, media):
+    url, _ = media
+    response = client.get(url, headers={"Range": f"bytes={SIZE}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{SIZE}"
+
+
+def test_multiple_ranges(client, media):
+    url, data = media
+    response = client.get(url, headers={"Range": "bytes=0-9,500-509"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    parts = response.content.split(f"--{boundary}".encode())
+    assert parts[-1] == b"--\r\n"
+    # Each part is CRLF, its headers, a blank line and its bytes, up to the CRLF before the next boundary
+    bodies = [part[2:-2].split(b"\r\n\r\n", 1) for part in parts[1:-1]]
+    assert [head.split(b"Content-Range: ")[1] for head, _ in bodies] == [
+        f"bytes 0-9/{SIZE}".encode(), f"bytes 500-509/{SIZE}".encode(),
+    ]
+    assert [body for _, body in bodies] == [data[0:10], data[500:510]]
+
+
+def test_if_none_match(client, media):
+    url, _ = media
+    etag = client.get(url).headers["etag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_range(client, media):
+    url, data = media
+    etag = client.get(url).headers["etag"]
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    # A stale validator gets the whole, current file
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == data
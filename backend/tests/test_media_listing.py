@@ -0,0 +1,80 @@
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, update
+
+from app.api.v1.endpoints.media import decode_cursor, encode_cursor, prefix_upper_bound
+from app.core.db import engine
+from app.models.media import Media
+from tests.test_storage import upload
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "!!!", encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_tampered_cursor_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_tampered_cursor_is_a_bad_request(client):
+    response = client.get("/api/v1/media/audio", params={"cursor": "bm90fGEgY3Vyc29y"})
+    assert response.status_code == 400
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound("abc") == "abd"
+    assert prefix_upper_bound("a" + chr(0x10FFFF)) == "b"
+    assert prefix_upper_bound(chr(0x10FFFF)) is None
+
+
+def test_pages_break_created_at_ties_on_id(client, admin_headers):
+    genre = uuid.uuid4().hex
+    ids = [
+        upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", os.urandom(64))["id"] for _ in range(5)
+    ]
+    with Session(engine) as session:
+        session.exec(update(Media).where(Media.id.in_(ids)).values(genre=genre, created_at=datetime(2024, 1, 1)))
+        session.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"genre": genre, "limit": 2, "fields": "id"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/media/audio", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_title_prefix(client, admin_headers):
+    stem = f"Title {uuid.uuid4().hex}"
+    titles = [f"{stem}", f"{stem}a", f"{stem}a%", f"{stem}b", f"{stem[:-1]}"]
+    for title in titles:
+        response = client.post(
+            "/api/v1/media/upload", headers=admin_headers,
+            data={"media_type": "audio", "title": title},
+            files={"file": (f"{uuid.uuid4().hex}.mp3", os.urandom(64), "audio/mpeg")},
+        )
+        assert response.status_code == 200, response.text
+
+    def matching(prefix):
+        response = client.get("/api/v1/media/audio", params={"title_prefix": prefix, "fields": "title"})
+        return sorted(item["title"] for item in response.json())
+
+    assert matching(stem) == [stem, f"{stem}a", f"{stem}a%", f"{stem}b"]
+    assert matching(f"{stem}a") == [f"{stem}a", f"{stem}a%"]
+    assert matching(f"{stem}a%") == [f"{stem}a%"]
+    # Case-sensitive
+    assert matching(stem.lower()) == []
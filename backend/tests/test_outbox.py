@@ -0,0 +1,135 @@
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlmodel import Session
+
+from app.core import telemetry
+from app.core.config import settings
+from app.core.db import engine
+from app.models.outbox import EmailOutbox
+from app.services.outbox import email_worker
+
+
+class Recorder:
+    """Accepts everything, except that recipients named retry-* are refused with a 451 once."""
+
+    def __init__(self):
+        self.messages = []
+        self.refused = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("retry-") and address not in self.refused:
+            self.refused.add(address)
+            return "451 4.3.0 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos[0]))
+        return "250 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    recorder = Recorder()
+    controller = Controller(recorder, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", controller.hostname)
+    monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+    monkeypatch.setattr(settings, "SMTP_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BASE_SECONDS", 1.0)
+    yield recorder
+    controller.stop()
+
+
+def notify(client) -> None:
+    # The worker's event loop runs in the client's portal thread
+    client.portal.call(email_worker.notify)
+
+
+def import_guests(client, headers, emails) -> dict:
+    response = client.post("/api/v1/guests/import", headers=headers, json=[{"email": email} for email in emails])
+    assert response.status_code == 200, response.text
+    guests = client.get("/api/v1/guests/", headers=headers).json()
+    return {guest["email"]: guest["id"] for guest in guests if guest["email"] in emails}
+
+
+def wait_for_email(client, headers, guest_id: int, done, timeout: float = 15.0) -> dict:
+    """Polls the guest's delivery status until `done(row)` holds."""
+    deadline = time.monotonic() + timeout
+    while True:
+        rows = client.get(f"/api/v1/guests/{guest_id}/email", headers=headers).json()
+        if rows and done(rows[0]):
+            return rows[0]
+        assert time.monotonic() < deadline, f"guest {guest_id} email still {rows}"
+        notify(client)
+        time.sleep(0.05)
+
+
+def sent_to(recorder: Recorder, emails) -> list:
+    return sorted(rcpt for _, rcpt in recorder.messages if rcpt in emails)
+
+
+def test_batch_reuses_pooled_connections(client, admin_headers, smtp):
+    telemetry.memory_span_exporter.clear()
+    emails = [f"pool-{uuid.uuid4().hex[:8]}@example.com" for _ in range(6)]
+    for guest_id in import_guests(client, admin_headers, emails).values():
+        wait_for_email(client, admin_headers, guest_id, lambda row: row["status"] == "sent")
+
+    assert sent_to(smtp, emails) == sorted(emails)
+    # Two pool slots: six messages over at most two connections
+    assert len({peer for peer, rcpt in smtp.messages if rcpt in emails}) <= 2
+    sends = [span for span in telemetry.memory_span_exporter.get_finished_spans() if span.name == "smtp.send"]
+    assert sum(span.attributes["smtp.connection_reused"] for span in sends) >= 4
+
+
+def test_temporary_failure_is_retried_with_backoff(client, admin_headers, smtp):
+    email = f"retry-{uuid.uuid4().hex[:8]}@example.com"
+    guest_id = import_guests(client, admin_headers, [email])[email]
+
+    failed = wait_for_email(client, admin_headers, guest_id, lambda row: row["attempts"] == 1)
+    assert failed["status"] == "pending" and "451" in failed["last_error"]
+    # Retried no sooner than EMAIL_RETRY_BASE_SECONDS after the first attempt
+    retry_at = datetime.fromisoformat(failed["next_attempt_at"])
+    assert retry_at - datetime.fromisoformat(failed["created_at"]) >= timedelta(seconds=1)
+
+    sent = wait_for_email(client, admin_headers, guest_id, lambda row: row["status"] == "sent")
+    assert sent["attempts"] == 2 and sent["last_error"] is None
+    assert sent_to(smtp, [email]) == [email]
+
+
+def test_expired_lease_is_claimed_again(client, admin_headers, smtp):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        # A worker died mid-send, and one that is still sending
+        stale = EmailOutbox(email_to="stale@example.com", pin="11112222", status="sending", next_attempt_at=now - timedelta(seconds=1))
+        leased = EmailOutbox(email_to="leased@example.com", pin="33334444", status="sending", next_attempt_at=now + timedelta(minutes=5))
+        session.add_all([stale, leased])
+        session.commit()
+        stale_id, leased_id = stale.id, leased.id
+
+    deadline = time.monotonic() + 15
+    while True:
+        with Session(engine) as session:
+            stale = session.get(EmailOutbox, stale_id)
+            leased = session.get(EmailOutbox, leased_id)
+        if stale.status == "sent":
+            break
+        assert time.monotonic() < deadline, f"stale row still {stale.status}"
+        notify(client)
+        time.sleep(0.05)
+
+    assert stale.pin is None and stale.attempts == 1
+    assert leased.status == "sending"
+    assert sent_to(smtp, ["stale@example.com", "leased@example.com"]) == ["stale@example.com"]
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+import pytest
+from jose import jwt
+
+from app.core.config import settings
+from app.core.security import ALGORITHM, TokenRejected, TokenVerifier, create_access_token
+
+
+def sign(claims: dict) -> str:
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+def test_tokens_without_exp_or_iat_are_rejected(client):
+    verifier = TokenVerifier(16)
+    for claims in ({"sub": "admin", "role": "admin"}, {"sub": "admin", "role": "admin", "iat": int(time.time())}):
+        with pytest.raises(TokenRejected):
+            verifier.verify(sign(claims))
+    legacy = sign({"sub": "admin", "role": "admin"})
+    assert client.get("/api/v1/jobs/", headers={"Authorization": f"Bearer {legacy}"}).status_code == 401
+
+
+def test_expired_token_rejected_even_when_cached():
+    verifier = TokenVerifier(16)
+    token = create_access_token({"sub": "admin", "role": "admin"}, expires_delta=timedelta(seconds=1))
+    assert verifier.verify(token)["role"] == "admin"
+    time.sleep(1.1)
+    with pytest.raises(TokenRejected):
+        verifier.verify(token)
@@ -0,0 +1,182 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.blob import Blob
+from app.models.media import Media
+from app.services import storage
+from tests.conftest import wait_for_job
+
+
+def upload(client, headers, name: str, data: bytes) -> dict:
+    response = client.post(
+        "/api/v1/media/upload", headers=headers,
+        data={"media_type": "audio"}, files={"file": (name, data, "audio/mpeg")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def scan(client, headers) -> dict:
+    job = wait_for_job(client, headers, client.post("/api/v1/media/scan", headers=headers).json())
+    assert job["status"] == "done", job
+    return job["result"]
+
+
+def load(media_id: int) -> Media:
+    with Session(engine) as session:
+        return session.get(Media, media_id)
+
+
+@pytest.fixture
+def cas(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_LAYOUT", "cas")
+
+
+def test_shared_blob_survives_rescan_and_delete(client, admin_headers, cas):
+    data = os.urandom(4096)
+    first = upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data)
+    second = upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data)
+    assert first["storage_path"] == second["storage_path"]
+    scan(client, admin_headers)
+
+    # Same bytes, new mtime: the scan sees a changed file
+    blob_path = os.path.join(settings.UPLOAD_DIR, first["storage_path"])
+    stat = os.stat(blob_path)
+    os.utime(blob_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert scan(client, admin_headers)["changed"] == 2
+    assert load(first["id"]).sha256 is not None
+
+    assert client.delete(f"/api/v1/media/{first['id']}", headers=admin_headers).status_code == 200
+    assert os.path.exists(blob_path)
+    assert client.get(f"/api/v1/media/{second['id']}/stream").status_code == 200
+
+
+def test_scan_after_cas_migration_keeps_rows_present(client, admin_headers, monkeypatch):
+    data = os.urandom(4096)
+    rows = [upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data) for _ in range(2)]
+    assert all(row["storage_path"] is None for row in rows)
+    scan(client, admin_headers)
+
+    monkeypatch.setattr(settings, "STORAGE_LAYOUT", "cas")
+    job = client.post("/api/v1/media/migrate-storage", headers=admin_headers).json()
+    assert wait_for_job(client, admin_headers, job)["status"] == "done"
+    result = scan(client, admin_headers)
+
+    assert result["missing"] == 0
+    for row in rows:
+        media = load(row["id"])
+        assert media.storage_path == storage.blob_relpath(media.sha256)
+        assert media.file_state is None
+
+
+def duplicate_groups(client, headers) -> tuple:
+    response = client.get("/api/v1/media/duplicates", headers=headers).json()
+    return [{m["id"] for m in group["media"]} for group in response["groups"]], response["unhashed"]
+
+
+def test_duplicates_report_is_read_only(client, admin_headers):
+    data = os.urandom(4096)
+    rows = [upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data) for _ in range(2)]
+    ids = {row["id"] for row in rows}
+    # Rows from before sizes and hashes were recorded on upload
+    with Session(engine) as session:
+        for row in rows:
+            media = session.get(Media, row["id"])
+            media.size = media.sha256 = None
+            session.add(media)
+        session.commit()
+
+    groups, unhashed = duplicate_groups(client, admin_headers)
+    assert ids not in groups and unhashed >= 2
+    assert all(load(row["id"]).size is None for row in rows)
+
+    job = client.post("/api/v1/media/duplicates/backfill", headers=admin_headers).json()
+    assert wait_for_job(client, admin_headers, job)["status"] == "done"
+    groups, unhashed = duplicate_groups(client, admin_headers)
+    assert ids in groups and unhashed == 0
+
+
+def test_concurrent_identical_uploads_share_one_blob(client, admin_headers, cas):
+    data = os.urandom(256 * 1024)
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(pool.map(
+            lambda _: client.post(
+                "/api/v1/media/upload", headers=admin_headers,
+                data={"media_type": "audio"}, files={"file": (f"{uuid.uuid4().hex}.mp3", data, "audio/mpeg")},
+            ),
+            range(4),
+        ))
+    assert [response.status_code for response in responses] == [200] * 4, [r.text for r in responses]
+    paths = {response.json()["storage_path"] for response in responses}
+    assert len(paths) == 1
+    with Session(engine) as session:
+        blob = session.get(Blob, responses[0].json()["sha256"])
+    assert blob.ref_count == 4
+    assert os.path.exists(os.path.join(settings.UPLOAD_DIR, blob.path))
+
+
+def test_cas_migration_keeps_the_blob_derived_files(client, admin_headers, monkeypatch):
+    data = os.urandom(4096)
+    rows = [upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", data) for _ in range(2)]
+    for row in rows:
+        with open(os.path.join(settings.UPLOAD_DIR, row["filename"] + storage.PEAKS_SUFFIX), "wb") as f:
+            f.write(row["filename"].encode())
+
+    monkeypatch.setattr(settings, "STORAGE_LAYOUT", "cas")
+    job = client.post("/api/v1/media/migrate-storage", headers=admin_headers).json()
+    assert wait_for_job(client, admin_headers, job)["status"] == "done"
+
+    blob_peaks = storage.peaks_path(load(rows[0]["id"]))
+    with open(blob_peaks, "rb") as f:
+        # The row that created the blob brought its peaks; the duplicate's were dropped, not moved over them
+        assert f.read() == rows[0]["filename"].encode()
+    for row in rows:
+        assert not os.path.exists(os.path.join(settings.UPLOAD_DIR, row["filename"] + storage.PEAKS_SUFFIX))
+
+
+def test_hls_packaging_versions_are_pruned_after_commit(client, admin_headers):
+    row = upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", os.urandom(4096))
+    with Session(engine) as session:
+        media = session.get(Media, row["id"])
+        for version in (1, 2):
+            os.makedirs(storage.hls_dir(media, version))
+            with open(os.path.join(storage.hls_dir(media, version), "master.m3u8"), "w") as f:
+                f.write(f"#EXTM3U\n# {version}\n")
+        media.hls_version = 2
+        session.add(media)
+        session.commit()
+        session.refresh(media)
+
+    # Until pruned, the old packaging stays on disk next to the current one
+    response = client.get(f"/api/v1/media/{row['id']}/hls/2/master.m3u8")
+    assert response.status_code == 200 and response.text.endswith("# 2\n")
+    assert client.get(f"/api/v1/media/{row['id']}/hls/1/master.m3u8").status_code == 404
+    assert os.path.isdir(storage.hls_dir(media, 1))
+
+    client.portal.call(storage.prune_hls, media)
+    assert os.listdir(storage.hls_dir(media)) == ["2"]
+
+
+def test_changed_file_is_settled_after_reanalysis(client, admin_headers):
+    row = upload(client, admin_headers, f"{uuid.uuid4().hex}.mp3", os.urandom(4096))
+    scan(client, admin_headers)
+
+    path = os.path.join(settings.UPLOAD_DIR, row["filename"])
+    with open(path, "ab") as f:
+        f.write(b"more")
+    # Flagged "changed" until the analyzer has probed the new contents
+    assert scan(client, admin_headers)["changed"] == 1
+    deadline = time.monotonic() + 30
+    while load(row["id"]).file_state is not None:
+        assert time.monotonic() < deadline, "changed file was never re-analyzed"
+        time.sleep(0.05)
+    media = load(row["id"])
+    assert media.size == 4100 and media.analyzed_at is not None
+    assert scan(client, admin_headers)["changed"] == 0
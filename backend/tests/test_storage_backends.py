@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import urllib.request
+import wave
+
+import pytest
+
+pytest.importorskip("boto3")
+moto_server = pytest.importorskip("moto.server")
+
+from app.core.config import settings  # noqa: E402
+from app.services.media_delivery import content_disposition  # noqa: E402
+from app.services.media_probe import probe_url  # noqa: E402
+from app.services.storage_backends import S3Backend  # noqa: E402
+
+BUCKET = "media-test"
+MiB = 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    # A real HTTP endpoint, so presigned URLs can be fetched like a browser would
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in {
+            "S3_ENDPOINT_URL": f"http://{host}:{port}",
+            "S3_REGION": "us-east-1",
+            "S3_ACCESS_KEY_ID": "testing",
+            "S3_SECRET_ACCESS_KEY": "testing",
+            "S3_ADDRESSING_STYLE": "path",
+            # S3's smallest part size
+            "S3_MULTIPART_THRESHOLD": 5 * MiB,
+            "S3_MULTIPART_CHUNK_SIZE": 5 * MiB,
+        }.items():
+            patch.setattr(settings, name, value)
+        S3Backend(BUCKET).client.create_bucket(Bucket=BUCKET)
+        yield
+    server.stop()
+
+
+@pytest.fixture
+def backend(s3_endpoint, request):
+    return S3Backend(BUCKET, prefix=f"{request.node.name}/")
+
+
+def put_bytes(backend: S3Backend, tmp_path, key: str, data: bytes) -> None:
+    source = tmp_path / key.replace("/", "_")
+    source.write_bytes(data)
+    backend.put(key, str(source))
+    assert not source.exists()
+
+
+def test_put_uses_multipart_above_threshold(backend, tmp_path):
+    data = os.urandom(11 * MiB)
+    put_bytes(backend, tmp_path, "blobs/big.bin", data)
+
+    head = backend.client.head_object(Bucket=BUCKET, Key=backend._key("blobs/big.bin"))
+    # Multipart ETags end in the number of parts
+    assert head["ETag"].strip('"').endswith("-3")
+    assert backend.size("blobs/big.bin") == len(data)
+    assert backend.hash("blobs/big.bin") == hashlib.sha256(data).hexdigest()
+
+
+def test_missing_key(backend):
+    assert backend.size("nope.mp3") is None
+    with pytest.raises(FileNotFoundError):
+        backend.hash("nope.mp3")
+
+
+def test_list_files_stays_under_prefix_and_skips_hidden(backend, tmp_path):
+    for key in ("a.mp3", "dir/b.mp4", ".hidden.mp3", "dir/.tmp/c.mp3", "a.mp3.peaks", "d.mp3.part"):
+        put_bytes(backend, tmp_path, key, b"x" * 10)
+    backend.client.put_object(Bucket=BUCKET, Key="elsewhere/e.mp3", Body=b"x")
+
+    found = backend.list_files((".peaks",))
+    assert set(found) == {"a.mp3", "dir/b.mp4"}
+    assert found["a.mp3"][0] == 10
+
+
+def test_move_and_delete(backend, tmp_path):
+    put_bytes(backend, tmp_path, "flat.mp3", b"payload")
+    backend.move("flat.mp3", "blobs/ab/cd/abcd")
+    assert backend.size("flat.mp3") is None
+    assert backend.size("blobs/ab/cd/abcd") == len(b"payload")
+
+    backend.delete("blobs/ab/cd/abcd")
+    backend.delete("blobs/ab/cd/abcd")  # already gone: not an error
+    assert backend.size("blobs/ab/cd/abcd") is None
+
+
+def test_presigned_download_sets_content_disposition(backend, tmp_path):
+    put_bytes(backend, tmp_path, "song.mp3", b"ID3 bytes")
+    filename = "My Song ü.mp3"
+    with urllib.request.urlopen(backend.download_url("song.mp3", filename)) as response:
+        assert response.read() == b"ID3 bytes"
+        assert response.headers["Content-Disposition"] == content_disposition(filename)
+
+
+def test_probe_reads_presigned_source(backend, tmp_path):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(8000)
+        out.writeframes(b"\0\0" * 16000)
+    put_bytes(backend, tmp_path, "tone.wav", buffer.getvalue())
+
+    result = probe_url(backend.source("tone.wav"))
+    assert result["duration"] == 2.0
+    assert result["sample_rate"] == 8000
+    assert result["channels"] == 1
@@ -0,0 +1,51 @@
+import os
+import uuid
+
+from app.core import telemetry
+from tests.conftest import wait_for_job
+
+
+def data_points(name: str) -> list:
+    points = []
+    for resource_metrics in telemetry.memory_metric_reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                if metric.name == name:
+                    points.extend(metric.data.data_points)
+    return points
+
+
+def test_request_upload_and_scan_are_traced_and_measured(client, admin_headers):
+    telemetry.memory_span_exporter.clear()
+    uploaded_before = sum(point.value for point in data_points("upload.bytes"))
+
+    assert client.get("/api/v1/media/videos").status_code == 200
+    data = os.urandom(8192)
+    response = client.post(
+        "/api/v1/media/upload", headers=admin_headers,
+        data={"media_type": "audio"}, files={"file": (f"{uuid.uuid4().hex}.mp3", data, "audio/mpeg")},
+    )
+    assert response.status_code == 200
+    job = client.post("/api/v1/media/scan", headers=admin_headers).json()
+    assert wait_for_job(client, admin_headers, job)["status"] == "done"
+
+    spans = {span.name: span for span in telemetry.memory_span_exporter.get_finished_spans()}
+    assert "GET /api/v1/media/videos" in spans
+    assert spans["upload.receive"].attributes["upload.bytes"] == len(data)
+    assert "storage.scan" in spans and "job storage.scan" in spans
+    # The SQLAlchemy instrumentation nests queries under the request span
+    listing = spans["GET /api/v1/media/videos"].context.trace_id
+    assert any(
+        span.context.trace_id == listing and span.attributes.get("db.system") == "sqlite"
+        for span in telemetry.memory_span_exporter.get_finished_spans()
+    )
+
+    queries = {
+        point.attributes["http.route"]: point
+        for point in data_points("http.server.db_queries")
+        if point.attributes["http.request.method"] == "GET"
+    }
+    assert queries["/api/v1/media/videos"].count >= 1
+    assert queries["/api/v1/media/videos"].sum >= 1
+
+    assert sum(point.value for point in data_points("upload.bytes")) - uploaded_before == len(data)
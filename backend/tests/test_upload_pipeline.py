@@ -0,0 +1,38 @@
+import os
+import uuid
+
+from app.core.config import settings
+from app.services.upload_pipeline import MAX_FIELD_SIZE
+
+
+def post(client, headers, name: str, data: bytes, **fields):
+    return client.post(
+        "/api/v1/media/upload", headers=headers,
+        data={"media_type": "audio", **fields}, files={"file": (name, data, "audio/mpeg")},
+    )
+
+
+def temp_files() -> list:
+    return [name for name in os.listdir(settings.UPLOAD_DIR) if name.startswith(".upload-")]
+
+
+def test_oversized_form_field_rejected(client, admin_headers):
+    response = post(client, admin_headers, f"{uuid.uuid4().hex}.mp3", b"x" * 100, title="t" * (MAX_FIELD_SIZE + 1))
+    assert response.status_code == 400
+    assert "title" in response.json()["detail"]
+
+
+def test_taken_name_is_never_overwritten(client, admin_headers):
+    name = f"{uuid.uuid4().hex}.mp3"
+    assert post(client, admin_headers, name, b"first").status_code == 200
+    assert post(client, admin_headers, name, b"second").status_code == 409
+
+    # A file no Media row knows of yet, e.g. from an upload that is committing right now
+    name = f"{uuid.uuid4().hex}.mp3"
+    path = os.path.join(settings.UPLOAD_DIR, name)
+    with open(path, "wb") as f:
+        f.write(b"in flight")
+    assert post(client, admin_headers, name, b"late").status_code == 409
+    with open(path, "rb") as f:
+        assert f.read() == b"in flight"
+    assert temp_files() == []
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import uuid
+
+from app.api.v1.endpoints import uploads
+from tests.test_storage import load
+
+
+def start(client, headers, size: int, media_type: str = "audio"):
+    return client.post("/api/v1/uploads/", headers=headers, json={
+        "filename": f"{uuid.uuid4().hex}.mp3", "media_type": media_type, "total_size": size,
+    })
+
+
+def put(client, headers, upload_id: str, offset: int, data: bytes, checksum: str = None):
+    headers = {**headers, "X-Chunk-SHA256": checksum or hashlib.sha256(data).hexdigest()}
+    return client.put(f"/api/v1/uploads/{upload_id}?offset={offset}", headers=headers, content=data)
+
+
+def test_unknown_media_type_rejected(client, admin_headers):
+    assert start(client, admin_headers, 10, media_type="image").status_code == 422
+
+
+def test_chunked_upload_is_hashed(client, admin_headers):
+    data = os.urandom(3000)
+    upload_id = start(client, admin_headers, len(data)).json()["id"]
+    assert put(client, admin_headers, upload_id, 0, data[:1000]).status_code == 200
+    # A rejected chunk must not leak into the running hash
+    assert put(client, admin_headers, upload_id, 1000, data[1000:2000], checksum="0" * 64).status_code == 422
+    assert put(client, admin_headers, upload_id, 1000, data[1000:2000]).status_code == 200
+    assert put(client, admin_headers, upload_id, 2000, data[2000:]).status_code == 200
+
+    media = client.post(f"/api/v1/uploads/{upload_id}/complete", headers=admin_headers).json()
+    assert load(media["id"]).sha256 == hashlib.sha256(data).hexdigest()
+    assert upload_id not in uploads._upload_digests
+
+
+def test_chunked_upload_without_running_hash_is_hashed_from_disk(client, admin_headers):
+    data = os.urandom(2000)
+    upload_id = start(client, admin_headers, len(data)).json()["id"]
+    assert put(client, admin_headers, upload_id, 0, data[:1000]).status_code == 200
+    # As if the first chunk had gone to another worker
+    del uploads._upload_digests[upload_id]
+    assert put(client, admin_headers, upload_id, 1000, data[1000:]).status_code == 200
+
+    media = client.post(f"/api/v1/uploads/{upload_id}/complete", headers=admin_headers).json()
+    assert load(media["id"]).sha256 == hashlib.sha256(data).hexdigest()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { VideoGrid } from './components/VideoGrid'
 import { Login } from './components/Login'
 import { Upload } from './components/Upload'
@@ -7,6 +7,7 @@ import { SettingsModal } from './components/SettingsModal'
 import { MusicPlayer } from './components/MusicPlayer'
 import { ErrorBoundary } from './components/ErrorBoundary'
 import { VideoItem } from './types'
+import { Library, syncLibrary } from './api'
 import { jwtDecode } from "jwt-decode";
 import { LogOut, Settings } from 'lucide-react';
 import './styles/index.css'
@@ -24,6 +25,7 @@ function App() {
     const [audios, setAudios] = useState<VideoItem[]>([]);
     const [isSettingsOpen, setIsSettingsOpen] = useState(false);
     const [activeMediaType, setActiveMediaType] = useState<'audio' | 'video' | 'none'>('none');
+    const library = useRef<Library | null>(null);
 
     useEffect(() => {
         if (token) {
@@ -40,13 +42,12 @@ function App() {
     const fetchMedia = async () => {
         const token = localStorage.getItem('token');
         try {
-            const [vidRes, audRes] = await Promise.all([
-                fetch('/api/v1/media/videos', { headers: { 'Authorization': `Bearer ${token}` } }),
-                fetch('/api/v1/media/audio', { headers: { 'Authorization': `Bearer ${token}` } })
-            ]);
+            const synced = await syncLibrary(library.current, token);
+            if (synced === library.current) return;
+            library.current = synced;
 
-            if (vidRes.ok) setVideos(await vidRes.json());
-            if (audRes.ok) setAudios(await audRes.json());
+            setVideos(synced.videos);
+            setAudios(synced.audio);
 
         } catch (e) {
             console.error("Fetch failed", e);
@@ -0,0 +1,152 @@
+import { VideoItem } from './types'
+
+export interface MediaPage {
+    items: VideoItem[];
+    // Pass back as `cursor` for the next page; null on the last one
+    nextCursor: string | null;
+}
+
+// One page of a paginated media listing. Callers ask for the next page when the user
+// needs it (scrolling, "load more"), never for the whole library up front.
+export const fetchMediaPage = async (
+    path: string,
+    token: string | null,
+    options: { cursor?: string | null; titlePrefix?: string; limit?: number } = {}
+): Promise<MediaPage> => {
+    const params = new URLSearchParams({ limit: String(options.limit ?? 50) });
+    if (options.cursor) params.set('cursor', options.cursor);
+    if (options.titlePrefix) params.set('title_prefix', options.titlePrefix);
+    const res = await fetch(`${path}?${params}`, { headers: { 'Authorization': `Bearer ${token}` } });
+    if (!res.ok) throw new Error(`Failed to fetch ${path}`);
+    return { items: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
+};
+
+// The listing order of the API. created_at is an ISO timestamp without zone, so it sorts as a string.
+const newestFirst = (a: VideoItem, b: VideoItem) =>
+    a.created_at === b.created_at ? b.id - a.id : (a.created_at < b.created_at ? 1 : -1);
+
+export interface Library {
+    version: number;
+    videos: VideoItem[];
+    audio: VideoItem[];
+}
+
+// Brings a local library copy up to date through /media/library: a delta when we already
+// hold a version, a full snapshot otherwise. Returns the same object when nothing changed (304).
+export const syncLibrary = async (current: Library | null, token: string | null): Promise<Library> => {
+    const params = current ? `?since=${current.version}` : '';
+    const res = await fetch(`/api/v1/media/library${params}`, { headers: { 'Authorization': `Bearer ${token}` } });
+    if (res.status === 304 && current) return current;
+    if (!res.ok) throw new Error('Failed to fetch library');
+    const data = await res.json();
+    if (data.full || !current) {
+        return { version: data.version, videos: data.videos, audio: data.audio };
+    }
+
+    const removed = new Set<number>([...data.deleted, ...data.changed.map((item: VideoItem) => item.id)]);
+    // Changed rows go back where the server would list them: newest first, by created_at then id
+    const apply = (items: VideoItem[], mediaType: string) => [
+        ...items.filter(item => !removed.has(item.id)),
+        ...data.changed.filter((item: VideoItem) => item.media_type === mediaType),
+    ].sort(newestFirst);
+    return { version: data.version, videos: apply(current.videos, 'video'), audio: apply(current.audio, 'audio') };
+};
+
+export interface ResumableUploadMeta {
+    media_type: string;
+    title?: string;
+    genre?: string;
+    related_to_id?: number;
+}
+
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+const sha256Hex = async (data: ArrayBuffer): Promise<string | null> => {
+    // crypto.subtle is only available in secure contexts; the checksum is optional server-side
+    if (!window.crypto?.subtle) return null;
+    const digest = await window.crypto.subtle.digest('SHA-256', data);
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Uploads a file in chunks through /api/v1/uploads, resuming from the server offset after failures.
+export const uploadResumable = async (
+    file: File,
+    meta: ResumableUploadMeta,
+    token: string,
+    onProgress: (percent: number) => void
+): Promise<VideoItem> => {
+    const auth = { 'Authorization': `Bearer ${token}` };
+    const createRes = await fetch('/api/v1/uploads/', {
+        method: 'POST',
+        headers: { ...auth, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...meta, filename: file.name, total_size: file.size })
+    });
+    if (!createRes.ok) throw new Error((await createRes.json()).detail || 'Upload failed');
+    const upload = await createRes.json();
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = await file.slice(offset, offset + CHUNK_SIZE).arrayBuffer();
+        const checksum = await sha256Hex(chunk);
+        try {
+            const res = await fetch(`/api/v1/uploads/${upload.id}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { ...auth, 'Content-Type': 'application/octet-stream', ...(checksum ? { 'X-Chunk-SHA256': checksum } : {}) },
+                body: chunk
+            });
+            if (!res.ok && res.status !== 409 && res.status !== 422) throw new Error((await res.json()).detail);
+            const serverOffset = res.headers.get('Upload-Offset');
+            offset = serverOffset !== null ? parseInt(serverOffset, 10) : offset;
+            if (res.ok) retries = 0;
+        } catch (e) {
+            if (++retries > MAX_CHUNK_RETRIES) throw e;
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const statusRes = await fetch(`/api/v1/uploads/${upload.id}`, { headers: auth });
+            if (statusRes.ok) offset = (await statusRes.json()).offset;
+        }
+        onProgress(Math.round((offset * 100) / file.size));
+    }
+
+    const completeRes = await fetch(`/api/v1/uploads/${upload.id}/complete`, { method: 'POST', headers: auth });
+    if (!completeRes.ok) throw new Error((await completeRes.json()).detail || 'Upload failed');
+    return completeRes.json();
+};
+
+export interface Peaks {
+    bits: number;
+    // Interleaved min/max pairs, signed, full scale at 2^(bits-1)
+    data: Int8Array | Int16Array;
+}
+
+// Precomputed waveform of a track, or null while the server has none. `resolution` is roughly
+// the number of bars to draw; the versioned URL lets the browser cache the response for good.
+export const fetchPeaks = async (item: VideoItem, resolution: number): Promise<Peaks | null> => {
+    if (!item.peaks_version) return null;
+    const res = await fetch(`/api/v1/media/${item.id}/peaks?resolution=${resolution}&v=${item.peaks_version}`);
+    if (!res.ok) return null;
+    const bits = Number(res.headers.get('X-Peaks-Bits') || 8);
+    const buffer = await res.arrayBuffer();
+    return { bits, data: bits === 16 ? new Int16Array(buffer) : new Int8Array(buffer) };
+};
+
+export interface Job {
+    id: string;
+    type: string;
+    status: 'pending' | 'running' | 'done' | 'failed';
+    progress: Record<string, unknown> | null;
+    result: { message?: string } & Record<string, unknown> | null;
+    error: string | null;
+}
+
+// Polls /jobs/{id} until a background job queued by an admin endpoint is done or failed.
+export const waitForJob = async (job: Job, token: string | null, intervalMs = 1000): Promise<Job> => {
+    while (job.status === 'pending' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const res = await fetch(`/api/v1/jobs/${job.id}`, { headers: { 'Authorization': `Bearer ${token}` } });
+        if (!res.ok) throw new Error('Failed to fetch job status');
+        job = await res.json();
+    }
+    return job;
+};
@@ -50,6 +50,37 @@ export const GuestManager: React.FC = () => {
         }
     };
 
+    const handleImport = async (e: React.ChangeEvent<HTMLInputElement>) => {
+        const file = e.target.files?.[0];
+        e.target.value = '';
+        if (!file) return;
+        setLoading(true);
+        const token = localStorage.getItem('token');
+        try {
+            const res = await fetch('/api/v1/guests/import', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': file.name.endsWith('.json') ? 'application/json' : 'text/csv',
+                    'Authorization': `Bearer ${token}`
+                },
+                body: file
+            });
+            const report = await res.json();
+            if (!res.ok) {
+                alert(`Import failed: ${report.detail || 'Unknown error'}`);
+                return;
+            }
+            fetchGuests();
+            const problems = report.rows
+                .filter((row: { status: string }) => row.status !== 'created')
+                .slice(0, 10)
+                .map((row: { row: number; email: string; detail: string }) => `Row ${row.row} (${row.email}): ${row.detail}`);
+            alert(`Imported ${report.created} guests. Already registered: ${report.exists}, duplicates: ${report.duplicate}, invalid: ${report.invalid}.${problems.length ? '\n\n' + problems.join('\n') : ''}`);
+        } finally {
+            setLoading(false);
+        }
+    };
+
     const handleDelete = async (id: number) => {
         if (!confirm('Revoke access for this guest?')) return;
         const token = localStorage.getItem('token');
@@ -83,6 +114,10 @@ export const GuestManager: React.FC = () => {
                 <button type="submit" className="neon-btn" disabled={loading}>
                     {loading ? 'SENDING...' : 'INVITE'}
                 </button>
+                <label className="neon-btn neon-btn-secondary" style={{ cursor: 'pointer' }}>
+                    IMPORT CSV
+                    <input type="file" accept=".csv,.json" onChange={handleImport} disabled={loading} style={{ display: 'none' }} />
+                </label>
             </form>
 
             <div style={{ display: 'grid', gap: '1rem' }}>
@@ -23,6 +23,11 @@ export const Login: React.FC<LoginProps> = ({ onLogin }) => {
                 body: JSON.stringify({ pin }),
             });
 
+            if (response.status === 429) {
+                setError(`Too many attempts, retry in ${response.headers.get('Retry-After') || 60}s`);
+                setPin('');
+                return;
+            }
             if (!response.ok) {
                 throw new Error('Invalid PIN');
             }
@@ -2,6 +2,8 @@ import React, { useState, useRef, useEffect } from 'react';
 import { VideoItem } from '../types';
 import { Play, Pause, SkipBack, SkipForward, Volume2, VolumeX, Maximize2, Minimize2, ListMusic, Trash2, Link as LinkIcon } from 'lucide-react';
 import axios from 'axios';
+import { fetchPeaks, Peaks } from '../api';
+import { Waveform } from './Waveform';
 
 interface MusicPlayerProps {
     audios: VideoItem[];
@@ -38,6 +40,18 @@ export const MusicPlayer: React.FC<MusicPlayerProps> = ({ audios: initialAudios,
     const hasAudio = audios && audios.length > 0;
     const currentTrack = hasAudio ? audios[currentTrackIndex] : null;
 
+    // Waveform of the current track, when the server has computed one
+    const [peaks, setPeaks] = useState<Peaks | null>(null);
+    useEffect(() => {
+        setPeaks(null);
+        if (!currentTrack) return;
+        let cancelled = false;
+        fetchPeaks(currentTrack, 2000).then(result => {
+            if (!cancelled) setPeaks(result);
+        });
+        return () => { cancelled = true; };
+    }, [currentTrack?.id, currentTrack?.peaks_version]);
+
     // Check admin role
     const isAdmin = role === 'admin';
 
@@ -171,7 +185,7 @@ export const MusicPlayer: React.FC<MusicPlayerProps> = ({ audios: initialAudios,
     // Auto-play when track changes if already playing
     useEffect(() => {
         if (audioRef.current && currentTrack) {
-            audioRef.current.src = currentTrack.url;
+            audioRef.current.src = `/api/v1/media/${currentTrack.id}/stream`;
             if (isPlaying) {
                 audioRef.current.play().catch(e => console.error("Playback failed", e));
             }
@@ -197,6 +211,11 @@ export const MusicPlayer: React.FC<MusicPlayerProps> = ({ audios: initialAudios,
             boxShadow: '0 -5px 20px rgba(0,0,0,0.5)'
         }}>
             {/* Progress Bar (Full Width Top) */}
+            {peaks && (
+                <div style={{ padding: '0 3rem', marginBottom: '0.25rem' }}>
+                    <Waveform peaks={peaks} progress={duration ? currentTime / duration : 0} />
+                </div>
+            )}
             <div style={{ width: '100%', display: 'flex', alignItems: 'center', marginBottom: '0.5rem', gap: '10px', fontSize: '0.8rem', color: '#aaa' }}>
                 <span>{formatTime(currentTime)}</span>
                 <input
@@ -318,7 +337,13 @@ export const MusicPlayer: React.FC<MusicPlayerProps> = ({ audios: initialAudios,
                         >
                             <div style={{ display: 'flex', alignItems: 'center', gap: '1rem', flex: 1 }}>
                                 <span style={{ width: '20px', fontSize: '0.8rem', opacity: 0.5 }}>{index + 1}</span>
-                                <span style={{ flex: 1 }}>{track.title || track.filename}</span>
+                                <span style={{ flex: 1 }}>
+                                    {track.title || track.filename}
+                                    {track.artist && <span style={{ opacity: 0.5 }}> · {track.artist}</span>}
+                                </span>
+                                {track.duration != null && (
+                                    <span style={{ fontSize: '0.8rem', opacity: 0.5 }}>{formatTime(track.duration)}</span>
+                                )}
                                 {track.related_to_id && (
                                     <span style={{ fontSize: '0.7rem', color: 'var(--neon-purple)', background: 'rgba(255,255,255,0.05)', padding: '2px 6px', borderRadius: '4px' }}>
                                         Linked
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { X, Save } from 'lucide-react';
+import { waitForJob } from '../api';
 
 interface SettingsModalProps {
     isOpen: boolean;
@@ -48,8 +49,9 @@ export const SettingsModal: React.FC<SettingsModalProps> = ({ isOpen, onClose })
                 headers: { 'Authorization': `Bearer ${token}` }
             });
             if (res.ok) {
-                const data = await res.json();
-                alert(data.message);
+                // The scan runs as a background job; poll until it finishes
+                const job = await waitForJob(await res.json(), token);
+                alert(job.status === 'done' ? job.result?.message : `Scan failed: ${job.error}`);
             } else {
                 alert("Scan failed");
             }
@@ -2,6 +2,10 @@ import React, { useRef, useState, useEffect } from 'react';
 import axios from 'axios';
 import { Upload as UploadIcon } from 'lucide-react';
 import { VideoItem } from '../types';
+import { fetchMediaPage, uploadResumable, waitForJob } from '../api';
+
+// Files above this size go through the chunked, resumable upload API
+const RESUMABLE_THRESHOLD = 32 * 1024 * 1024;
 
 interface UploadProps {
     onUploadSuccess: () => void;
@@ -15,24 +19,26 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
     const [title, setTitle] = useState('');
     const [genre, setGenre] = useState('');
     const [videos, setVideos] = useState<VideoItem[]>([]);
+    const [videosCursor, setVideosCursor] = useState<string | null>(null);
+    const [videoFilter, setVideoFilter] = useState('');
 
     const [uploading, setUploading] = useState(false);
     const [uploadProgress, setUploadProgress] = useState(0);
 
-    // Fetch videos to populate dropdown for Audio linking
+    // Videos for the audio link dropdown: the first page, narrowed by the title filter;
+    // further pages only when asked for
     useEffect(() => {
-        if (mediaType === 'audio') {
-            fetchVideos();
-        }
-    }, [mediaType]);
+        if (mediaType !== 'audio') return;
+        const timer = setTimeout(() => fetchVideos(null), 300);
+        return () => clearTimeout(timer);
+    }, [mediaType, videoFilter]);
 
-    const fetchVideos = async () => {
+    const fetchVideos = async (cursor: string | null) => {
         const token = localStorage.getItem('token');
         try {
-            const res = await axios.get('/api/v1/media/videos', {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            setVideos(res.data);
+            const page = await fetchMediaPage('/api/v1/media/videos', token, { cursor, titlePrefix: videoFilter.trim() || undefined });
+            setVideos(prev => cursor ? [...prev, ...page.items] : page.items);
+            setVideosCursor(page.nextCursor);
         } catch (e) {
             console.error("Failed to fetch videos");
         }
@@ -52,7 +58,8 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
             const res = await axios.post('/api/v1/media/reindex-audio', {}, {
                 headers: { 'Authorization': `Bearer ${token}` }
             });
-            alert(res.data.message);
+            const job = await waitForJob(res.data, token);
+            alert(job.status === 'done' ? job.result?.message : `Failed to sync genres: ${job.error}`);
             onUploadSuccess();
         } catch (e: any) { // eslint-disable-line @typescript-eslint/no-explicit-any
             console.error(e);
@@ -67,8 +74,8 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
         setUploading(true);
         setUploadProgress(0);
 
+        // Metadata goes before the file so the server can apply the per-type size limit while streaming
         const formData = new FormData();
-        formData.append('file', file);
         formData.append('media_type', mediaType);
         if (title) formData.append('title', title);
         if (genre) formData.append('genre', genre);
@@ -76,19 +83,29 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
         if (mediaType === 'audio' && relatedToId) {
             formData.append('related_to_id', relatedToId);
         }
+        formData.append('file', file);
 
         try {
-            await axios.post('/api/v1/media/upload', formData, {
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    'Content-Type': 'multipart/form-data'
-                },
-                onUploadProgress: (progressEvent) => {
-                    const total = progressEvent.total || file.size;
-                    const percent = Math.round((progressEvent.loaded * 100) / total);
-                    setUploadProgress(percent);
-                }
-            });
+            if (file.size > RESUMABLE_THRESHOLD) {
+                await uploadResumable(file, {
+                    media_type: mediaType,
+                    title: title || undefined,
+                    genre: genre || undefined,
+                    related_to_id: mediaType === 'audio' && relatedToId ? parseInt(relatedToId, 10) : undefined
+                }, token, setUploadProgress);
+            } else {
+                await axios.post('/api/v1/media/upload', formData, {
+                    headers: {
+                        'Authorization': `Bearer ${token}`,
+                        'Content-Type': 'multipart/form-data'
+                    },
+                    onUploadProgress: (progressEvent) => {
+                        const total = progressEvent.total || file.size;
+                        const percent = Math.round((progressEvent.loaded * 100) / total);
+                        setUploadProgress(percent);
+                    }
+                });
+            }
             // Reset
             setFile(null);
             setTitle('');
@@ -101,7 +118,7 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
         } catch (error: any) { // eslint-disable-line @typescript-eslint/no-explicit-any
             console.error(error);
             setUploading(false);
-            const msg = error.response?.data?.detail || 'Upload failed';
+            const msg = error.response?.data?.detail || error.message || 'Upload failed';
             alert(msg);
         }
     };
@@ -149,6 +166,14 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
             {mediaType === 'audio' && (
                 <div style={{ marginBottom: '1rem' }}>
                     <label style={{ display: 'block', marginBottom: '0.5rem', color: 'var(--text-secondary)' }}>Link to Video (Optional):</label>
+                    <input
+                        type="text"
+                        placeholder="Filter videos by title"
+                        value={videoFilter}
+                        onChange={(e) => { setVideoFilter(e.target.value); setRelatedToId(''); }}
+                        className="input-glass"
+                        style={{ textAlign: 'left', letterSpacing: '1px', marginBottom: '0.5rem' }}
+                    />
                     <select
                         value={relatedToId}
                         onChange={(e) => setRelatedToId(e.target.value)}
@@ -157,9 +182,18 @@ export const Upload: React.FC<UploadProps> = ({ onUploadSuccess }) => {
                     >
                         <option value="" style={{ color: '#000' }}>-- Independent Audio --</option>
                         {videos.map(v => (
-                            <option key={v.id} value={v.id} style={{ color: '#000' }}>{v.filename}</option>
+                            <option key={v.id} value={v.id} style={{ color: '#000' }}>{v.title || v.filename}</option>
                         ))}
                     </select>
+                    {videosCursor && (
+                        <button
+                            className="neon-btn neon-btn-secondary"
+                            style={{ width: '100%', marginTop: '0.5rem', opacity: 0.8 }}
+                            onClick={() => fetchVideos(videosCursor)}
+                        >
+                            Load more videos
+                        </button>
+                    )}
                 </div>
             )}
 
@@ -1,6 +1,7 @@
 import React, { useState, useMemo, useRef, useEffect } from 'react';
+import type Hls from 'hls.js';
 import { VideoItem } from '../types';
-import { ChevronDown, ChevronUp, Download, Music, Search, Edit2, Trash2, Link as LinkIcon, X, Save, Layers, FilterX } from 'lucide-react';
+import { ChevronDown, ChevronUp, Download, Music, Search, Edit2, Trash2, Link as LinkIcon, X, Save, Layers, FilterX, Play } from 'lucide-react';
 
 interface VideoGridProps {
     videos: VideoItem[];
@@ -11,6 +12,59 @@ interface VideoGridProps {
     onPlay?: () => void;
 }
 
+// Poster with a sprite-sheet scrub preview on hover; stands in for the <video> element
+// until the card is played, so the grid only loads small images.
+const VideoPreview: React.FC<{ video: VideoItem; onActivate: () => void }> = ({ video, onActivate }) => {
+    const [hoverFraction, setHoverFraction] = useState<number | null>(null);
+    const [tileAspect, setTileAspect] = useState<number | null>(null);
+    const version = video.thumbnails_version;
+    const columns = video.sprite_columns || 0;
+    const rows = video.sprite_rows || 0;
+    const spriteUrl = `/api/v1/media/${video.id}/sprite?v=${version}`;
+
+    // Tile size is only known once the sprite is loaded; fetched on first hover
+    useEffect(() => {
+        if (hoverFraction === null || tileAspect !== null || !columns || !rows) return;
+        const image = new Image();
+        image.onload = () => setTileAspect((image.naturalWidth / columns) / (image.naturalHeight / rows));
+        image.src = spriteUrl;
+    }, [hoverFraction, tileAspect, columns, rows, spriteUrl]);
+
+    const tile = hoverFraction === null ? 0 : Math.min(columns * rows - 1, Math.floor(hoverFraction * columns * rows));
+    const showSprite = hoverFraction !== null && tileAspect !== null;
+
+    return (
+        <div
+            onClick={onActivate}
+            onMouseMove={e => {
+                const rect = e.currentTarget.getBoundingClientRect();
+                setHoverFraction(Math.max(0, Math.min(1, (e.clientX - rect.left) / rect.width)));
+            }}
+            onMouseLeave={() => setHoverFraction(null)}
+            style={{ width: '100%', height: '100%', cursor: 'pointer', display: 'flex', alignItems: 'center', justifyContent: 'center', position: 'relative' }}
+        >
+            {showSprite ? (
+                <div style={{
+                    height: '100%',
+                    maxWidth: '100%',
+                    aspectRatio: `${tileAspect}`,
+                    backgroundImage: `url(${spriteUrl})`,
+                    backgroundSize: `${columns * 100}% ${rows * 100}%`,
+                    backgroundPosition: `${columns > 1 ? (tile % columns) / (columns - 1) * 100 : 0}% ${rows > 1 ? Math.floor(tile / columns) / (rows - 1) * 100 : 0}%`
+                }} />
+            ) : (
+                <img
+                    src={`/api/v1/media/${video.id}/poster?v=${version}`}
+                    alt={video.title || video.filename}
+                    loading="lazy"
+                    style={{ width: '100%', height: '100%', objectFit: 'contain' }}
+                />
+            )}
+            <Play size={48} color="#fff" style={{ position: 'absolute', opacity: 0.8, pointerEvents: 'none' }} />
+        </div>
+    );
+};
+
 // Internal VideoCard Component to handle refs and playback control
 const VideoCard: React.FC<{
     video: VideoItem;
@@ -26,10 +80,46 @@ const VideoCard: React.FC<{
     onFilterFamily: (id: number) => void;
 }> = ({ video, audios, isPlaying, onPlay, isAdmin, onEdit, onDelete, parentVideo, childVideos, onFilterFamily }) => {
     const videoRef = useRef<HTMLVideoElement>(null);
+    const [isActivated, setIsActivated] = useState(!video.thumbnails_version);
     const [isExpanded, setIsExpanded] = useState(false);
     const [isVersionsExpanded, setIsVersionsExpanded] = useState(false);
     const linkedAudio = audios.find(a => a.related_to_id === video.id);
 
+    // Adaptive HLS once the video has been packaged; the original file until then.
+    // Safari plays HLS natively, elsewhere hls.js is loaded on demand.
+    useEffect(() => {
+        const element = videoRef.current;
+        if (!isActivated || !element) return;
+        const streamUrl = `/api/v1/media/${video.id}/stream`;
+        if (!video.hls_version) {
+            element.src = streamUrl;
+            return;
+        }
+        const hlsUrl = `/api/v1/media/${video.id}/hls/${video.hls_version}/master.m3u8`;
+        if (element.canPlayType('application/vnd.apple.mpegurl')) {
+            element.src = hlsUrl;
+            return;
+        }
+        let hls: Hls | null = null;
+        let cancelled = false;
+        import('hls.js').then(({ default: HlsPlayer }) => {
+            if (cancelled) return;
+            if (!HlsPlayer.isSupported()) {
+                element.src = streamUrl;
+                return;
+            }
+            hls = new HlsPlayer();
+            hls.loadSource(hlsUrl);
+            hls.attachMedia(element);
+        }).catch(() => {
+            if (!cancelled) element.src = streamUrl;
+        });
+        return () => {
+            cancelled = true;
+            hls?.destroy();
+        };
+    }, [isActivated, video.id, video.hls_version]);
+
     // Stop video if not playing
     useEffect(() => {
         if (!isPlaying && videoRef.current && !videoRef.current.paused) {
@@ -57,13 +147,18 @@ const VideoCard: React.FC<{
                     justifyContent: 'center',
                     position: 'relative'
                 }}>
-                    <video
-                        ref={videoRef}
-                        src={video.url}
-                        controls
-                        style={{ width: '100%', height: '100%', objectFit: 'contain', background: '#000' }}
-                        onPlay={() => onPlay(video.id)}
-                    />
+                    {isActivated ? (
+                        <video
+                            ref={videoRef}
+                            controls
+                            autoPlay={!!video.thumbnails_version}
+                            preload="metadata"
+                            style={{ width: '100%', height: '100%', objectFit: 'contain', background: '#000' }}
+                            onPlay={() => onPlay(video.id)}
+                        />
+                    ) : (
+                        <VideoPreview video={video} onActivate={() => setIsActivated(true)} />
+                    )}
 
                     {/* Admin Controls Overlay */}
                     {isAdmin && (
@@ -212,11 +307,11 @@ const VideoCard: React.FC<{
 
                             <div style={{ display: 'grid', gap: '0.8rem' }}>
                                 {linkedAudio && (
-                                    <a href={linkedAudio.url} download={linkedAudio.filename} className="neon-btn" style={{ display: 'flex', justifyContent: 'center', gap: '0.5rem', fontSize: '0.9rem', padding: '0.6rem', background: 'var(--neon-purple)', color: '#fff', textDecoration: 'none' }}>
+                                    <a href={`/api/v1/media/${linkedAudio.id}/stream?download=true`} download={linkedAudio.filename} className="neon-btn" style={{ display: 'flex', justifyContent: 'center', gap: '0.5rem', fontSize: '0.9rem', padding: '0.6rem', background: 'var(--neon-purple)', color: '#fff', textDecoration: 'none' }}>
                                         <Music size={18} /> Download Audio
                                     </a>
                                 )}
-                                <a href={video.url} download={video.filename} className="neon-btn neon-btn-secondary" style={{ display: 'flex', justifyContent: 'center', gap: '0.5rem', fontSize: '0.9rem', padding: '0.6rem', textDecoration: 'none' }}>
+                                <a href={`/api/v1/media/${video.id}/stream?download=true`} download={video.filename} className="neon-btn neon-btn-secondary" style={{ display: 'flex', justifyContent: 'center', gap: '0.5rem', fontSize: '0.9rem', padding: '0.6rem', textDecoration: 'none' }}>
                                     <Download size={18} /> Download Video
                                 </a>
                             </div>
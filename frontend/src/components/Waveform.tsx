@@ -0,0 +1,47 @@
+import React, { useEffect, useRef } from 'react';
+import { Peaks } from '../api';
+
+interface WaveformProps {
+    peaks: Peaks;
+    progress: number; // 0..1
+    height?: number;
+}
+
+// Draws min/max peaks as one bar per pixel column; the played part is highlighted.
+export const Waveform: React.FC<WaveformProps> = ({ peaks, progress, height = 32 }) => {
+    const canvasRef = useRef<HTMLCanvasElement>(null);
+
+    useEffect(() => {
+        const canvas = canvasRef.current;
+        const ctx = canvas?.getContext('2d');
+        if (!canvas || !ctx) return;
+
+        const ratio = window.devicePixelRatio || 1;
+        const width = canvas.clientWidth * ratio;
+        canvas.width = width;
+        canvas.height = height * ratio;
+
+        const styles = getComputedStyle(canvas);
+        const played = styles.getPropertyValue('--neon-purple').trim() || '#bc13fe';
+        const pending = 'rgba(255,255,255,0.25)';
+        const scale = (canvas.height / 2) / (1 << (peaks.bits - 1));
+        const middle = canvas.height / 2;
+        const pairs = peaks.data.length / 2;
+
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        for (let x = 0; x < width; x++) {
+            const start = Math.floor(x * pairs / width);
+            const end = Math.max(start + 1, Math.floor((x + 1) * pairs / width));
+            let low = 0;
+            let high = 0;
+            for (let i = start; i < end && i < pairs; i++) {
+                low = Math.min(low, peaks.data[2 * i]);
+                high = Math.max(high, peaks.data[2 * i + 1]);
+            }
+            ctx.fillStyle = x / width < progress ? played : pending;
+            ctx.fillRect(x, middle - high * scale, 1, Math.max(1, (high - low) * scale));
+        }
+    }, [peaks, progress, height]);
+
+    return <canvas ref={canvasRef} style={{ width: '100%', height: `${height}px`, display: 'block' }} />;
+};
@@ -6,6 +6,19 @@ export interface VideoItem {
     related_to_id?: number;
     title?: string;
     genre?: string;
+    // Filled in by the server-side analysis once the file has been probed
+    duration?: number;
+    bitrate?: number;
+    audio_codec?: string;
+    video_codec?: string;
+    artist?: string;
+    album?: string;
+    peaks_version?: number;
+    thumbnails_version?: number;
+    sprite_columns?: number;
+    sprite_rows?: number;
+    hls_version?: number;
+    hls_renditions?: string;
 }
 
 export interface Guest {